@@ -0,0 +1,85 @@
+# benchmarks/levenshtein_benchmark.py
+"""
+编辑距离基准：在 test_code 语料的所有文件对上对比 DPLevenshteinMetric（旧的完整动态规划实现）
+与 LevenshteinMetric（整数Token序列上的位并行实现），
+1. 检查两者对每一对文件给出的相似度完全一致；
+2. 检查带截断的判定 (is_within) 与精确距离的结论一致；
+3. 测量平均每对耗时，并据此估算 1000 个文件（约 50 万对）时该指标的总耗时；
+4. 不一致或加速比低于 --min-speedup 时以非零状态退出。
+
+用法：
+    python benchmarks/levenshtein_benchmark.py [--corpus test_code] [--rounds 3] [--min-speedup 10]
+"""
+
+import argparse
+import sys
+import time
+from itertools import combinations
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from model.similarity.metrics import DPLevenshteinMetric, LevenshteinMetric
+from model.similarity.preprocessors import Tokenizer
+from model.similarity.profile import build_profile
+
+def per_pair_time(metric, pairs, rounds: int) -> float:
+    """取最快一轮的平均每对耗时（秒）。"""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for tokens_a, tokens_b in pairs:
+            metric.calculate(tokens_a, tokens_b)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pairs)
+
+def main():
+    parser = argparse.ArgumentParser(description="编辑距离指标基准")
+    parser.add_argument("--corpus", default=str(REPO_ROOT / "test_code"))
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--min-speedup", type=float, default=10.0, help="位并行实现要求达到的加速比")
+    args = parser.parse_args()
+
+    tokenizer = Tokenizer()
+    paths = sorted(Path(args.corpus).rglob("*.py"))
+    profiles = [build_profile(tokenizer, str(path), path.read_bytes()) for path in paths]
+    # 旧实现比较字符串Token，新实现比较驻留后的整数Token
+    string_pairs = [(a.tokens_for_calc, b.tokens_for_calc) for a, b in combinations(profiles, 2)]
+    id_pairs = [(a.token_ids, b.token_ids) for a, b in combinations(profiles, 2)]
+
+    legacy = DPLevenshteinMetric()
+    myers = LevenshteinMetric()
+    mismatched = 0
+    cutoff_mismatched = 0
+    for (strings_a, strings_b), (ids_a, ids_b) in zip(string_pairs, id_pairs):
+        expected = legacy.calculate(strings_a, strings_b)
+        if myers.calculate(ids_a, ids_b) != expected:
+            mismatched += 1
+        # 用若干阈值检查截断判定：距离不超过阈值 <=> 相似度不低于对应值
+        longest = max(len(ids_a), len(ids_b))
+        distance = round((1.0 - expected) * longest)
+        for k in (0, distance - 1, distance, distance + 1, longest // 4):
+            if k >= 0 and myers.is_within(ids_a, ids_b, k) != (distance <= k):
+                cutoff_mismatched += 1
+
+    legacy_time = per_pair_time(legacy, string_pairs, args.rounds)
+    myers_time = per_pair_time(myers, id_pairs, args.rounds)
+    speedup = legacy_time / myers_time
+    average_tokens = sum(len(p.token_ids) for p in profiles) / len(profiles)
+    projected_pairs = 1000 * 999 // 2
+
+    print(f"语料: {len(paths)} 个文件，{len(id_pairs)} 对，平均每个文件 {average_tokens:.0f} 个Token")
+    print(f"旧实现: {legacy_time * 1000:.3f}ms/对")
+    print(f"位并行实现: {myers_time * 1000:.3f}ms/对 ({speedup:.1f}x)")
+    print(f"按同等文件规模估算 1000 个文件: 旧实现 {legacy_time * projected_pairs:.0f}s，"
+          f"位并行实现 {myers_time * projected_pairs:.0f}s")
+    print(f"相似度与旧实现一致: {'是' if not mismatched else f'否（{mismatched} 对不一致）'}")
+    print(f"截断判定与精确距离一致: {'是' if not cutoff_mismatched else f'否（{cutoff_mismatched} 处不一致）'}")
+
+    ok = not mismatched and not cutoff_mismatched and speedup >= args.min_speedup
+    print("通过" if ok else "未通过")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
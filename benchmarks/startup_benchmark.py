@@ -0,0 +1,101 @@
+# benchmarks/startup_benchmark.py
+"""
+冷启动基准：在独立子进程中启动主窗口，测量
+1. 从进程启动到主窗口首次绘制的耗时（受 --budget 约束）；
+2. 历史记录在后台加载并填充到视图的耗时；
+并检查 networkx / matplotlib 没有在启动阶段被导入。
+
+用法：
+    python benchmarks/startup_benchmark.py [--sessions 50] [--results 2000] [--budget 1.5]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CHILD_CODE = r'''
+import sys, time, json
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+from view.main_window import MainWindow
+from controller.main_controller import MainController
+
+app = QApplication(sys.argv)
+controller = MainController()
+window = MainWindow(controller)
+window.show()
+app.processEvents()
+first_paint = time.perf_counter() - start
+
+expected = int(sys.argv[1])
+deadline = time.perf_counter() + 120
+while window.left_panel.history_view.session_list.count() < expected and time.perf_counter() < deadline:
+    app.processEvents()
+    time.sleep(0.001)
+populated = time.perf_counter() - start
+
+print(json.dumps({
+    "first_paint": first_paint,
+    "populated": populated,
+    "heavy_modules": sorted(m for m in ("networkx", "matplotlib") if m in sys.modules),
+}))
+'''
+
+def write_history(directory: Path, sessions: int, results: int):
+    """生成一份合成的历史文件。"""
+    now = datetime.now().isoformat()
+    data = {'sessions': [], 'last_updated': now}
+    for s in range(sessions):
+        data['sessions'].append({
+            'session_id': f"bench-{s}",
+            'directory': f"从 bench{s} 导入",
+            'analysis_time': now,
+            'login_time': now,
+            'results': [{
+                'file_a': f"/submissions/{s}/a{r}.py",
+                'file_b': f"/submissions/{s}/b{r}.py",
+                'scores': {"综合可疑度": (r % 100) / 100},
+                'segments': [],
+                'analysis_time': now,
+                'is_plagiarism': r % 50 == 0,
+                'plagiarism_notes': "",
+            } for r in range(results)]
+        })
+    history_dir = directory / "history"
+    history_dir.mkdir()
+    with open(history_dir / "analysis_history.json", 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="主窗口冷启动基准")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--results", type=int, default=2000)
+    parser.add_argument("--budget", type=float, default=1.5, help="首次绘制的时间预算（秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_history(Path(tmp), args.sessions, args.results)
+        env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), QT_QPA_PLATFORM="offscreen")
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE, str(args.sessions)],
+            cwd=tmp, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    stats = json.loads(output.strip().splitlines()[-1])
+
+    print(f"首次绘制: {stats['first_paint']:.3f}s (预算 {args.budget:.3f}s)")
+    print(f"历史视图填充完成: {stats['populated']:.3f}s")
+    print(f"启动阶段导入的绘图库: {stats['heavy_modules'] or '无'}")
+
+    ok = stats['first_paint'] <= args.budget and not stats['heavy_modules']
+    print("通过" if ok else "未通过")
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
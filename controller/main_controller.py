@@ -1,18 +1,54 @@
 # controller/main_controller.py
 
+import os
 import uuid
 from pathlib import Path
-from typing import List, Tuple, Any
+from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
-from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtCore import QObject, QThread, QTimer, Qt, pyqtSignal, pyqtSlot
 
 from model.file_manager import FileManager
 from model.similarity import CodeAnalyzer, ComparisonResult
 from model.similarity.result import AnalysisSession
+from model.similarity.score_index import ScoreIndex
+from model.similarity.clones import SubtreeIndex
+from model.similarity.ast_handler import SubtreeHash
+from model.similarity.scheduler import BlockScheduler, ProfileStore
+from model.similarity.score_stats import ScoreStatistics, SessionStatistics
 from model.history_manager import HistoryManager
 from view.panels.center_panel import CenterPanel
 from view.detail_view import DetailView
 from model.graph_handler import GraphHandler
+from model.chart_handler import DistributionChart
+from model.cluster_service import ClusterService, Cluster
+from model.watcher import WatchSession
+
+class ImportWorker(QObject):
+    """
+    在后台线程中扫描目录并读取文件。进度与完成都以信号通知，
+    接收者位于GUI线程，因此经由排队连接在GUI线程中处理。
+    """
+    # (阶段, 已完成数, 总数)，阶段为 "scan"（目录）或 "read"（文件）
+    progress = pyqtSignal(str, int, int)
+    # 导入失败时为错误信息，成功时为空字符串
+    finished = pyqtSignal(str)
+
+    def __init__(self, file_manager: FileManager):
+        super().__init__()
+        self.file_manager = file_manager
+
+    @pyqtSlot(str, object)
+    def run(self, kind: str, source):
+        try:
+            if kind == 'dir':
+                self.file_manager.load_directory(source, lambda done, total: self.progress.emit("read", done, total),
+                                                 lambda done, total: self.progress.emit("scan", done, total))
+            else:
+                self.file_manager.load_files(source, lambda done, total: self.progress.emit("read", done, total))
+        except Exception as e:
+            self.finished.emit(str(e) or type(e).__name__)
+        else:
+            self.finished.emit("")
 
 class MainController(QObject):
     """
@@ -21,56 +57,122 @@ class MainController(QObject):
     """
     # 定义一个信号，用于通知MainWindow显示弹窗
     show_auto_mark_dialog_requested = pyqtSignal()
+    # 导入进度信号：(阶段, 已完成数, 总数)，阶段为 "scan"（已扫描/已发现的目录数）或 "read"（已读取/待读取的文件数）
+    import_progress = pyqtSignal(str, int, int)
+    # 后台导入结束：是否成功
+    import_finished = pyqtSignal(bool)
+    # 把导入请求投递给导入线程中的 ImportWorker：(来源类型, 目录或文件列表)
+    _import_requested = pyqtSignal(str, object)
+    # 分块分析进度信号：(已完成块数, 总块数)
+    analysis_progress = pyqtSignal(int, int)
+    # 监视模式发现新的高可疑度代码对时发出
+    watch_pairs_found = pyqtSignal(list)
+    # 历史记录的细粒度变化（HistoryEvent），视图据此增量更新
+    history_changed = pyqtSignal(object)
 
     def __init__(self):
         super().__init__()
         # 模型
         self.file_manager = FileManager()
+        # 导入在单独的线程中执行，GUI线程只接收进度与完成信号
+        self._import_thread = QThread(self)
+        self._import_worker = ImportWorker(self.file_manager)
+        self._import_worker.moveToThread(self._import_thread)
+        self._import_requested.connect(self._import_worker.run, Qt.QueuedConnection)
+        self._import_worker.progress.connect(self.import_progress, Qt.QueuedConnection)
+        self._import_worker.finished.connect(self._on_import_finished, Qt.QueuedConnection)
+        self._import_thread.start()
+        self._pending_import: Optional[Tuple[str, Any]] = None
         self.analyzer = CodeAnalyzer()
-        self.history_manager = HistoryManager()
+        self.history_manager = HistoryManager(load_in_background=True)
+        self.history_manager.add_listener(self.history_changed.emit)
         self.graph_handler = GraphHandler()
+        self.distribution_chart = DistributionChart()
         
         # 当前会话
         self.current_session: AnalysisSession = None
+        # 当前会话结果上的聚类服务与分数索引，会话切换时重建
+        self.cluster_service: ClusterService = None
+        self.score_index: ScoreIndex = None
+        # 当前会话文件的子树结构倒排索引，首次查询结构克隆时建立
+        self.structure_index: SubtreeIndex = None
         self.login_time = datetime.now()
 
         # 自动标记功能的状态变量
         self.auto_marking_enabled = True
         self.suppress_auto_mark_popup = False
+        # 自动标记与关系图共用的综合可疑度阈值
+        self.auto_mark_threshold = 0.80
+
+        # 整文件比较按块调度并逐块写入检查点，每块最多包含的文件数
+        self.checkpoint_block_files = 100
+        # 文件数达到该值时视为大规模语料，预处理结果存放在磁盘上，内存占用受预算限制
+        self.large_corpus_files = 2000
+        self.block_memory_budget_mb = 256
+        # 大规模语料只保留综合可疑度不低于该值的代码对
+        self.block_min_score = 0.5
+        # 只有大规模语料才把单项指标分给工作进程计算；普通规模下启动进程池的开销得不偿失
+        self.large_corpus_workers = os.cpu_count() or 1
+        self.analyzer.workers = 1
 
         # 用于追踪导入来源的状态列表
         self.import_sources: List[Tuple[str, Any]] = []
 
+        # 导入或分析进行中（导入在后台线程中进行，分析期间会重绘进度条），监视轮询需要让路
+        self.busy = False
+
+        # 监视模式
+        self.watch_session: WatchSession = None
+        self._watch_timer = QTimer(self)
+        self._watch_timer.timeout.connect(self.poll_watch)
+
+        # 调整权重后延迟保存历史记录，连续调整只写一次文件
+        self.history_save_delay_ms = 3000
+        self._history_save_timer = QTimer(self)
+        self._history_save_timer.setSingleShot(True)
+        self._history_save_timer.timeout.connect(self.history_manager.save_if_dirty)
+
         # 视图（在 MainWindow 中注入）
         self.result_view: CenterPanel = None     # type: ignore
         self.detail_view: DetailView = None      # type: ignore
 
     def import_directory(self, directory: str) -> None:
         """
-        加载指定目录下所有的 .py 文件。
+        在后台线程中加载指定目录下所有的 .py 文件，完成后发出 import_finished。
         """
-        try:
-            self.file_manager.load_directory(directory)
-            self.import_sources.append(('dir', directory))
-        except Exception as e:
-            print(f"加载目录失败: {e}")
+        self._start_import('dir', directory)
 
     def import_files(self, file_paths: List[str]) -> None:
         """
-        加载指定路径的单个或多个 .py 文件。
-        并将结果通知日志，由 MainWindow 接管显示。
+        在后台线程中加载指定路径的单个或多个 .py 文件，完成后发出 import_finished，
+        由 MainWindow 接管显示。
         """
-        try:
-            self.file_manager.load_files(file_paths)
-            self.import_sources.append(('files', file_paths))
-        except Exception as e:
-            print(f"加载目录失败: {e}")
+        self._start_import('files', list(file_paths))
+
+    def _start_import(self, kind: str, source):
+        # 导入期间 busy 为真：界面已禁用，监视轮询与分析都不会读写 file_manager
+        self.busy = True
+        self._pending_import = (kind, source)
+        self._import_requested.emit(kind, source)
+
+    def _on_import_finished(self, error: str):
+        kind, source = self._pending_import
+        self._pending_import = None
+        self.busy = False
+        if error:
+            print(f"加载{'目录' if kind == 'dir' else '文件'}失败: {error}")
+        else:
+            self.import_sources.append((kind, source))
+        # 即使导入失败，之前已读入的部分文件也可能更新了内容
+        self._invalidate_details()
+        self.import_finished.emit(not error)
 
     def remove_file(self, file_path: Path):
         """
         移除一个文件。
         """
         self.file_manager.remove_file(file_path)
+        self._invalidate_details([str(file_path)])
 
     def clear_all_files(self):
         """
@@ -78,6 +180,7 @@ class MainController(QObject):
         """
         self.file_manager.clear_all()
         self.import_sources.clear()
+        self._invalidate_details()
 
     # 用于从UI更新弹窗状态
     def set_auto_marking_enabled(self, enabled: bool):
@@ -86,6 +189,21 @@ class MainController(QObject):
     def set_suppress_popup(self, suppress: bool):
         self.suppress_auto_mark_popup = suppress
 
+    def set_granularity(self, granularity: str):
+        """设置比较粒度："file" 为整文件比较，"function" 为函数级比较。"""
+        self.analyzer.granularity = granularity
+
+    def set_template_files(self, paths: List[str]):
+        """设置模板（起始代码）文件，下次查重时其中的代码不计入相似度与匹配片段。"""
+        self.analyzer.template_files = [str(p) for p in paths]
+
+    def set_frequency_filter(self, enabled: bool, max_df: float = 0.5):
+        """
+        开启/关闭按文档频率识别样板：出现在超过 max_df 比例文件中的片段不计入相似度。
+        只在语料足够大（analyzer.boilerplate_min_files）时生效；归一化后完全相同的文件不受影响。
+        """
+        self.analyzer.boilerplate_max_df = max_df if enabled else None
+
     def clear_all_markings(self):
         """
         清除当前会话中所有结果的抄袭标记。
@@ -97,7 +215,7 @@ class MainController(QObject):
             result.is_plagiarism = False
             result.plagiarism_notes = ""
         
-        self.history_manager.reset_result_plagiarism_status(self.current_session)
+        self.history_manager.reset_result_plagiarism_status(self.current_session.session_id)
 
     def clear_all_histories(self):
         """
@@ -111,6 +229,8 @@ class MainController(QObject):
         将结果传递给 ResultListView 更新显示。
         """
         files = [str(p) for p in self.file_manager.sorted_files]
+        # 新的分析结果可能基于已变化的文件内容，详细视图缓存的源码与高亮全部作废
+        self._invalidate_details()
         if not files:
             if self.result_view:
                 self.result_view.set_data([])
@@ -134,16 +254,48 @@ class MainController(QObject):
         )
 
         # 执行匹配分析
-        results = self.analyzer.run_analysis(files)
+        if self.analyzer.granularity == "file":
+            results = self._run_checkpointed_analysis(self.current_session, files)
+        else:
+            results = self.analyzer.run_analysis(files, self.file_manager.get_sources())
+            self.current_session.statistics = self.analyzer.statistics
+            self.history_manager.add_session(self.current_session, self.file_manager.get_file_info())
+
+        self._finish_analysis(results)
+
+        # 分析完成后清空本次的导入来源记录
+        if hasattr(self, 'import_source'):
+            self.import_sources.clear()
         
+        return True
+
+    def resume_session(self, session_id: str) -> bool:
+        """
+        从检查点继续一个未完成的会话，跳过已经计算过的代码对。
+        """
+        session = self.history_manager.get_session_by_id(session_id)
+        if not session or not session.is_in_progress():
+            return False
+        files = [path for path in session.analysis_files if Path(path).exists()]
+        if not files:
+            return False
+
+        self.current_session = session
+        results = self._run_checkpointed_analysis(session, files, resume=True)
+        self._finish_analysis(results)
+        return True
+
+    def _finish_analysis(self, results: List[ComparisonResult]):
+        """建立索引、执行自动标记，并把结果写入当前会话和历史记录。"""
+        self._index_results(results)
+
         # 执行自动标记
         auto_marked_count = 0
         if self.auto_marking_enabled:
-            for result in results:
+            for result in self.score_index.results_above("综合可疑度", self.auto_mark_threshold):
                 # 只标记之前未被标记过的
-                if not result.is_plagiarism and result.scores.get("综合可疑度", 0) >= 0.80:
-                    result.is_plagiarism = True
-                    result.plagiarism_notes = "自动标记 (可疑度 >= 80%)"
+                if not result.is_plagiarism:
+                    self._auto_mark(result)
                     auto_marked_count += 1
         
         # 检查是否需要弹窗
@@ -152,20 +304,260 @@ class MainController(QObject):
 
         # 将结果添加到当前会话
         if self.current_session:
+            self.current_session.results = []
             for result in results:
                 self.current_session.add_result(result)
             # 保存到历史记录
-            self.history_manager.add_session(self.current_session)
+            self.history_manager.add_session_files(self.current_session, self._file_info(self.current_session))
+            # 会话已完整保存，检查点不再需要
+            self.history_manager.discard_work_directory(self.current_session.session_id)
         
         # 更新列表视图
         if self.result_view:
-            self.result_view.set_data(results)
-        
-        # 分析完成后清空本次的导入来源记录
-        if hasattr(self, 'import_source'):
-            self.import_sources.clear()
-        
-        return True
+            self.result_view.set_data(results, self.current_session.get_statistics())
+
+    def _file_info(self, session: AnalysisSession):
+        """会话涉及文件的 {路径: (内容哈希, 大小, 修改时间)}；恢复的会话中未导入的文件以路径登记。"""
+        loaded = self.file_manager.get_file_info()
+        return {path: loaded[path] for path in session.get_file_paths() if path in loaded}
+
+    def _run_checkpointed_analysis(self, session: AnalysisSession, files: List[str],
+                                   resume: bool = False) -> List[ComparisonResult]:
+        """
+        整文件比较的分块分析：会话先以“未完成”状态写入历史记录，
+        代码对按块调度，每完成一块就把结果追加到历史目录中该会话的结果文件，并把进度落盘到工作目录。
+        运行期间结果不在内存中累积，历史文件也不保存结果本身；完成后结果从结果文件按需读入。
+        中途退出后可通过 resume_session 从最后完成的块继续。
+        文件数少于 large_corpus_files 时预处理结果取自分析器的内存缓存，并与 run_analysis 一样按相同文件分组；
+        达到该值时预处理结果写入磁盘仓库、按内存预算分块，并只保留超过 block_min_score 的代码对。
+        """
+        large = len(files) >= self.large_corpus_files
+        self.analyzer.workers = self.large_corpus_workers if large else 1
+        if not large:
+            self.analyzer.shutdown()
+        if session.results_file is None:
+            results_path = self.history_manager.results_path(session.session_id)
+            # 旧版本中断的会话把已完成块的结果留在工作目录中，继续之前移到结果文件的位置
+            legacy = self.history_manager.work_directory(session.session_id) / "results.jsonl"
+            if resume and legacy.exists():
+                results_path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(legacy, results_path)
+            session.attach_results_file(results_path)
+        scheduler = BlockScheduler(
+            self.analyzer,
+            ProfileStore(self.history_manager.profile_directory()) if large else None,
+            self.history_manager.work_directory(session.session_id),
+            memory_budget_mb=self.block_memory_budget_mb,
+            min_score=self.block_min_score if large else 0.0,
+            max_block_size=None if large else self.checkpoint_block_files,
+            results_path=session.results_file
+        )
+        if not resume:
+            session.status = AnalysisSession.STATUS_IN_PROGRESS
+            session.analysis_files = files
+            self.history_manager.add_session(session, self.file_manager.get_file_info())
+
+        sources = self.file_manager.get_sources()
+        hashes = scheduler.prepare(files, lambda path: sources.get(path) or Path(path).read_bytes())
+        scheduler.run(files, hashes, self.analysis_progress.emit)
+        # 统计覆盖全部已比较的代码对，包括大规模语料中因低于 block_min_score 而未保存的部分
+        session.statistics = scheduler.statistics
+
+        session.status = AnalysisSession.STATUS_COMPLETED
+        session.analysis_files = []
+        # 结果文件已由调度器逐块写完，从中读入（按综合可疑度降序）用于展示
+        session.attach_results_file(session.results_file)
+        return session.results
+
+    def _index_results(self, results: List[ComparisonResult]):
+        """为当前会话的结果建立分数索引和聚类服务。"""
+        self.score_index = ScoreIndex(results)
+        self.cluster_service = ClusterService(results)
+        self.structure_index = None
+
+    def set_weights(self, weights: Dict[str, float]) -> int:
+        """
+        修改各指标的权重（归一化为和为 1），之后的查重使用新权重；
+        当前会话直接用按列存储的单项分数重新计算综合可疑度、重新排序并重新应用自动标记，无需重新查重。
+        人工标记不受影响。返回自动标记发生变化的结果数量。
+        注意：大规模语料只保存了原综合可疑度超过 block_min_score 的代码对，调整权重不会找回被丢弃的代码对。
+        """
+        total = sum(weights.values())
+        if total <= 0:
+            return 0
+        self.analyzer.weights = {name: value / total for name, value in weights.items()}
+        if not self.current_session or not self.score_index or \
+           not self.score_index.table.has_weighted_metrics(self.analyzer.weights):
+            return 0
+
+        session = self.current_session
+        index = self.score_index
+        index.table.apply(self.analyzer.weights)
+        index.reindex("综合可疑度")
+        rows, scores = index.ranking("综合可疑度")
+        self.cluster_service.rescore(rows, scores)
+        statistics = session.get_statistics()
+        composite = statistics.get("综合可疑度")
+        if composite is not None and composite.count == len(scores):
+            statistics.rebuild("综合可疑度", scores)
+        else:
+            # 大规模语料中低于 block_min_score 的代码对没有保存，无法按新权重重建全部代码对的分布
+            statistics.discard("综合可疑度")
+        session.weights = dict(self.analyzer.weights)
+
+        def write_back():
+            # 把新的综合可疑度写回各结果，并按其降序重排会话结果
+            index.table.write_back()
+            order, _ = index.ranking("综合可疑度")
+            session.results[:] = [index.results[i] for i in order.tolist()]
+        # 逐个结果的写回推迟到下次读取会话结果时（例如刷新列表或保存）
+        session.defer_update(write_back)
+
+        # 自动标记只涉及新阈值以上的结果和原有的自动标记，分数取自索引（结果的 scores 尚未写回）
+        changed = []
+        if self.auto_marking_enabled:
+            threshold = self.auto_mark_threshold
+            for result in self.history_manager.marked_results(session.session_id):
+                if self._is_auto_marked(result) and index.score(result, "综合可疑度") < threshold:
+                    result.is_plagiarism = False
+                    result.plagiarism_notes = ""
+                    changed.append(result)
+            for result in index.results_above("综合可疑度", threshold):
+                if not result.is_plagiarism:
+                    self._auto_mark(result)
+                    changed.append(result)
+
+        # 不在这里写整个历史文件：只更新标记索引，稍后统一保存
+        self.history_manager.session_marks_changed(session, changed, save=False)
+        self._history_save_timer.start(self.history_save_delay_ms)
+        return len(changed)
+
+    def _auto_mark(self, result: ComparisonResult):
+        result.is_plagiarism = True
+        result.plagiarism_notes = f"自动标记 (可疑度 >= {self.auto_mark_threshold:.0%})"
+
+    @staticmethod
+    def _is_auto_marked(result: ComparisonResult) -> bool:
+        return result.is_plagiarism and result.plagiarism_notes.startswith("自动标记")
+
+    def count_pairs_above(self, threshold: float) -> int:
+        """当前会话中综合可疑度 >= threshold 的代码对数量。"""
+        if not self.score_index:
+            return 0
+        return self.score_index.count_above("综合可疑度", threshold)
+
+    def count_clusters_above(self, threshold: float) -> int:
+        """当前会话在给定阈值下的抄袭小组数量（规模不少于 2 的连通分量）。"""
+        if not self.cluster_service:
+            return 0
+        return self.cluster_service.cluster_count(threshold)
+
+    def set_auto_mark_threshold(self, threshold: float) -> int:
+        """
+        修改阈值并在当前会话上重新应用自动标记。
+        只处理新旧阈值之间的结果：阈值降低时补充标记，阈值升高时撤销此区间内的自动标记，
+        人工标记不受影响。返回发生变化的结果数量。
+        """
+        old_threshold = self.auto_mark_threshold
+        self.auto_mark_threshold = threshold
+        if not self.score_index or not self.auto_marking_enabled or threshold == old_threshold:
+            return 0
+
+        changed = 0
+        if threshold < old_threshold:
+            for result in self.score_index.results_between("综合可疑度", threshold, old_threshold):
+                if not result.is_plagiarism:
+                    self._auto_mark(result)
+                    changed += 1
+        else:
+            for result in self.score_index.results_between("综合可疑度", old_threshold, threshold):
+                if self._is_auto_marked(result):
+                    result.is_plagiarism = False
+                    result.plagiarism_notes = ""
+                    changed += 1
+
+        if changed:
+            self.history_manager.session_marks_changed(self.current_session)
+        return changed
+
+    def start_watch(self, directory: str, interval_ms: int = 2000) -> None:
+        """
+        开始监视目录：新到达或被修改的文件会被增量分析，并加入一个“监视”会话。
+        """
+        self.watch_session = WatchSession(directory, self.file_manager, self.analyzer)
+        self.current_session = AnalysisSession(
+            session_id=str(uuid.uuid4()),
+            directory=f"监视 {Path(directory).name}",
+            login_time=self.login_time
+        )
+        self.current_session.statistics = SessionStatistics()
+        self.history_manager.add_session(self.current_session)
+        self._index_results(self.current_session.results)
+        if self.result_view:
+            self.result_view.set_data(self.current_session.results, self.current_session.statistics)
+        self._watch_timer.start(interval_ms)
+
+    def stop_watch(self) -> None:
+        """停止监视目录。"""
+        self._watch_timer.stop()
+        self.watch_session = None
+
+    def is_watching(self) -> bool:
+        return self.watch_session is not None
+
+    def poll_watch(self) -> None:
+        """
+        轮询一次监视目录，把增量结果并入当前监视会话，并推送新的高可疑度代码对。
+        """
+        if self.busy or not self.watch_session or not self.current_session:
+            return
+        update = self.watch_session.poll()
+        if update is None:
+            return
+        results, stale = update
+
+        # 丢弃涉及已修改/已删除文件的旧结果
+        session = self.current_session
+        statistics = session.get_statistics()
+        kept = []
+        for r in session.results:
+            if r.file_a in stale or r.file_b in stale:
+                statistics.remove(r.scores)
+            else:
+                kept.append(r)
+        session.results = kept
+        statistics.merge(self.analyzer.statistics)
+        self._invalidate_details(stale)
+
+        high_score_pairs = []
+        for result in results:
+            if result.scores.get("综合可疑度", 0) >= self.auto_mark_threshold:
+                high_score_pairs.append(result)
+                if self.auto_marking_enabled:
+                    self._auto_mark(result)
+            session.add_result(result)
+
+        session.results.sort(key=lambda r: r.scores.get("综合可疑度", 0), reverse=True)
+        self._index_results(session.results)
+        self.history_manager.add_session_files(session, self.file_manager.get_file_info())
+        if self.result_view:
+            self.result_view.set_data(session.results, session.get_statistics())
+        self.watch_pairs_found.emit(high_score_pairs)
+
+    def get_structural_clones(self, result: ComparisonResult) -> List[Tuple[SubtreeHash, SubtreeHash, int]]:
+        """
+        返回代码对共享的极大相同子树 (A中的子树, B中的子树, 当前会话中含此结构的文件数)。
+        """
+        if not self.current_session:
+            return []
+        if self.structure_index is None:
+            sources = self.file_manager.get_sources()
+            files = [path for path in self.current_session.get_file_paths()
+                     if path in sources or Path(path).exists()]
+            self.structure_index = self.analyzer.structure_index(files, sources)
+        index = self.structure_index
+        return [(subtree_a, subtree_b, len(index.files_with(subtree_a.digest)))
+                for subtree_a, subtree_b in index.clones_between(result.file_a, result.file_b)]
 
     def show_detail(self, comparison: ComparisonResult) -> None:
         """
@@ -174,6 +566,31 @@ class MainController(QObject):
         if self.detail_view:
             self.detail_view.show(comparison)
 
+    def prefetch_details(self, comparisons: List[ComparisonResult]) -> None:
+        """在后台预取列表中接下来的代码对的源码与高亮，使打开详细对比时无需等待读盘。"""
+        if self.detail_view:
+            self.detail_view.prefetch(comparisons)
+
+    def shutdown(self):
+        """程序退出时调用：保存尚未写入的历史变化，停止监视，关闭分析器的工作进程池和详细视图的预取线程。"""
+        self._history_save_timer.stop()
+        self.history_manager.save_if_dirty()
+        self._import_thread.quit()
+        self._import_thread.wait()
+        self.stop_watch()
+        self.analyzer.shutdown()
+        if self.detail_view:
+            self.detail_view.cache.shutdown()
+
+    def _invalidate_details(self, paths: List[str] = None):
+        """丢弃详细视图缓存中指定文件（为 None 时全部）的源码与高亮。"""
+        if self.detail_view:
+            self.detail_view.cache.invalidate(paths)
+
+    def detail_source(self, path: str):
+        """已导入文件直接使用内存中的内容。"""
+        return self.file_manager.contents.get(Path(path))
+
     def get_login_time(self) -> datetime:
         """
         获取登录时间
@@ -193,10 +610,22 @@ class MainController(QObject):
         session = self.history_manager.get_session_by_id(session_id)
         if session:
             self.current_session = session
+            self._index_results(session.results)
             if self.result_view:
-                self.result_view.set_data(session.results)
+                self.result_view.set_data(session.results, session.get_statistics())
         return session
 
+    def is_session_in_progress(self, session_id: str) -> bool:
+        """会话是否为上次中断、尚未完成的分析"""
+        session = self.history_manager.get_session_by_id(session_id)
+        return bool(session and session.is_in_progress())
+
+    def get_sessions_for_file(self, file_path: str):
+        """
+        获取包含该文件（按内容识别）的所有历史会话
+        """
+        return self.history_manager.get_sessions_for_file(file_path)
+
     def mark_plagiarism(self, file_a: str, file_b: str, is_plagiarism: bool, notes: str = ""):
         """
         标记抄袭状态
@@ -213,11 +642,11 @@ class MainController(QObject):
         """
         return self.history_manager.export_plagiarism_report(output_file)
 
-    def export_plagiarism_files(self, output_dir: str) -> bool:
+    def export_plagiarism_files(self, output_dir: str, as_zip: bool = False) -> bool:
         """
         导出抄袭文件
         """
-        return self.history_manager.export_plagiarism_files(output_dir)
+        return self.history_manager.export_plagiarism_files(output_dir, as_zip=as_zip)
 
     def get_plagiarism_sessions(self):
         """
@@ -225,10 +654,59 @@ class MainController(QObject):
         """
         return self.history_manager.get_plagiarism_sessions()
 
+    def get_marked_count(self, session_id: str) -> int:
+        """会话中被标记为抄袭的结果数量"""
+        return self.history_manager.marked_count(session_id)
+
+    def get_marked_results(self, session_id: str) -> List[ComparisonResult]:
+        """会话中被标记为抄袭的结果"""
+        return self.history_manager.marked_results(session_id)
+
+    def get_plagiarism_clusters(self, threshold: float = None, weighted: bool = False) -> List[Cluster]:
+        """
+        返回当前会话在给定阈值（默认为自动标记阈值）下的抄袭小组。
+        weighted 为真时使用带权社区划分，否则为连通分量。
+        """
+        if not self.cluster_service:
+            return []
+        self.cluster_service.set_threshold(self.auto_mark_threshold if threshold is None else threshold)
+        if weighted:
+            return self.cluster_service.communities()
+        return self.cluster_service.clusters()
+
+    def get_score_statistics(self, metric: str = "综合可疑度") -> Optional[ScoreStatistics]:
+        """当前会话某个指标的分数分布统计（直接取自会话保存的流式统计）。"""
+        if not self.current_session:
+            return None
+        return self.current_session.get_statistics().get(metric)
+
+    def threshold_from_distribution(self, kind: str, value: float, metric: str = "综合可疑度") -> Optional[float]:
+        """
+        按分数分布给出阈值：kind 为 "z" 时取 均值 + value 个标准差，为 "top" 时取排名前 value 比例的分界分数。
+        """
+        stats = self.get_score_statistics(metric)
+        if not stats or not stats.count:
+            return None
+        if kind == "z":
+            return min(1.0, stats.mean + value * stats.std)
+        return stats.quantile(1.0 - value)
+
+    def describe_score(self, result: ComparisonResult, metric: str = "综合可疑度") -> Optional[Tuple[float, float]]:
+        """某个结果在会话分布中的 (z 分数, 百分位)。"""
+        stats = self.get_score_statistics(metric)
+        if not stats or not stats.count:
+            return None
+        score = result.scores.get(metric, 0)
+        return stats.z_score(score), stats.percentile_rank(score)
+
+    def view_score_distribution(self, metric: str = "综合可疑度") -> bool:
+        """显示当前会话某个指标的分数分布图。"""
+        return self.distribution_chart.draw(self.get_score_statistics(metric), metric, self.auto_mark_threshold)
+
     def view_plagiarism_graph(self):
         """创建并显示抄袭关系图。"""
         if self.current_session and self.current_session.results:
-            graph = self.graph_handler.create_graph(self.current_session.results)
+            graph = self.graph_handler.create_graph(self.current_session.results, self.auto_mark_threshold)
             self.graph_handler.draw_graph(graph)
         else:
             print("没有可用于生成图表的查重结果。")
@@ -236,6 +714,13 @@ class MainController(QObject):
     def export_plagiarism_graph(self, file_path: str) -> bool:
         """创建并导出抄袭关系图。"""
         if self.current_session and self.current_session.results:
-            graph = self.graph_handler.create_graph(self.current_session.results)
+            graph = self.graph_handler.create_graph(self.current_session.results, self.auto_mark_threshold)
             return self.graph_handler.draw_graph(graph, output_path=file_path)
-        return False
\ No newline at end of file
+        return False
+
+    def export_plagiarism_graph_lod(self, output_dir: str) -> bool:
+        """分层导出抄袭关系图（小组概览图 + 每个小组的详细图）。"""
+        if self.current_session and self.current_session.results:
+            graph = self.graph_handler.create_graph(self.current_session.results, self.auto_mark_threshold)
+            return self.graph_handler.export_graph_lod(graph, output_dir)
+        return False
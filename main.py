@@ -1,12 +1,82 @@
-from PyQt5.QtWidgets import QApplication
-from view.main_window import MainWindow
-from controller.main_controller import MainController
-
+import argparse
 import sys
+import time
+
+def run_gui():
+    from PyQt5.QtWidgets import QApplication
+    from view.main_window import MainWindow
+    from controller.main_controller import MainController
 
-if __name__ == '__main__':
     app = QApplication(sys.argv)
     controller = MainController()
+    app.aboutToQuit.connect(controller.shutdown)
     window = MainWindow(controller)
     window.show()
-    sys.exit(app.exec_())
\ No newline at end of file
+    sys.exit(app.exec_())
+
+def run_watch(directory: str, interval: float, threshold: float):
+    """命令行监视模式：不启动界面，持续输出新的高可疑度代码对。"""
+    from model.file_manager import FileManager
+    from model.similarity import CodeAnalyzer
+    from model.watcher import WatchSession
+
+    analyzer = CodeAnalyzer()
+    session = WatchSession(directory, FileManager(), analyzer)
+    print(f"正在监视 {directory}（阈值 {threshold:.0%}），按 Ctrl+C 退出")
+    try:
+        while True:
+            update = session.poll()
+            if update:
+                results, _ = update
+                for r in results:
+                    score = r.scores.get("综合可疑度", 0)
+                    if score >= threshold:
+                        print(f"{score:.2%}  {r.file_a}  <->  {r.file_b}", flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("已停止监视")
+    finally:
+        analyzer.shutdown()
+
+def run_serve(host: str, port: int, unix_socket: str, workers: int, template_files: list):
+    """本地服务模式：通过 HTTP（TCP 或 Unix 套接字）接收提交并排队查重。"""
+    import asyncio
+    from model.history_manager import HistoryManager
+    from service import AnalysisService, ServiceServer
+
+    async def serve():
+        service = AnalysisService(HistoryManager(), workers=workers, template_files=template_files)
+        server = ServiceServer(service, host, port, unix_socket)
+        await server.start()
+        print(f"查重服务已启动: {server.address}，按 Ctrl+C 退出", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+            await service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("服务已停止")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Python 代码查重工具")
+    parser.add_argument("--watch", metavar="DIR", help="以命令行监视模式运行，增量分析目录中新到达的文件")
+    parser.add_argument("--interval", type=float, default=2.0, help="监视模式的轮询间隔（秒）")
+    parser.add_argument("--threshold", type=float, default=0.80, help="监视模式输出的综合可疑度阈值")
+    parser.add_argument("--serve", action="store_true", help="以本地服务模式运行，接收外部系统提交的查重作业")
+    parser.add_argument("--host", default="127.0.0.1", help="服务模式监听的地址")
+    parser.add_argument("--port", type=int, default=8765, help="服务模式监听的端口")
+    parser.add_argument("--socket", metavar="PATH", help="服务模式改为监听 Unix 套接字")
+    parser.add_argument("--workers", type=int, default=None, help="服务模式的工作进程数（默认等于CPU数）")
+    parser.add_argument("--template", metavar="FILE", action="append", default=[],
+                        help="服务模式的模板（起始代码）文件，可重复指定")
+    args, _ = parser.parse_known_args()
+
+    if args.serve:
+        run_serve(args.host, args.port, args.socket, args.workers, args.template)
+    elif args.watch:
+        run_watch(args.watch, args.interval, args.threshold)
+    else:
+        run_gui()
@@ -0,0 +1,57 @@
+# model/chart_handler.py
+
+from typing import Optional
+
+from .graph_handler import _plotting
+from .similarity.score_stats import ScoreStatistics
+
+class DistributionChart:
+    """
+    绘制会话中某个指标的分数分布图，数据直接取自会话保存的流式统计，不需要遍历结果。
+    """
+    def __init__(self, buckets: int = 50):
+        self.buckets = buckets
+
+    def draw(self, stats: ScoreStatistics, metric: str, threshold: Optional[float] = None,
+             output_path: str = None) -> bool:
+        """
+        绘制直方图，并标出均值、均值 + 2σ / 3σ 以及当前阈值。
+        """
+        if not stats or not stats.count:
+            print("没有可用于生成分布图的分数统计。")
+            return False
+        _, plt = _plotting()
+
+        counts = stats.histogram(self.buckets)
+        width = 1.0 / len(counts)
+        plt.figure(figsize=(10, 6))
+        plt.bar([i * width for i in range(len(counts))], counts, width=width, align='edge',
+                color='#4c72b0', edgecolor='white')
+
+        markers = [(stats.mean, '均值', 'green'),
+                   (stats.mean + 2 * stats.std, '均值+2σ', 'orange'),
+                   (stats.mean + 3 * stats.std, '均值+3σ', 'red')]
+        if threshold is not None:
+            markers.append((threshold, '当前阈值', 'black'))
+        for value, label, color in markers:
+            if value <= 1.0:
+                plt.axvline(value, color=color, linestyle='--', label=f"{label} {value:.0%}")
+
+        plt.title(f"{metric} 分布（{stats.count} 对，μ={stats.mean:.1%}，σ={stats.std:.1%}，"
+                  f"P95={stats.quantile(0.95):.1%}，P99={stats.quantile(0.99):.1%}）")
+        plt.xlabel(metric)
+        plt.ylabel("代码对数量")
+        plt.xlim(0, 1)
+        plt.legend()
+
+        if output_path:
+            try:
+                plt.savefig(output_path, bbox_inches='tight', dpi=150)
+                return True
+            except Exception as e:
+                print(f"导出分布图失败: {e}")
+                return False
+            finally:
+                plt.close()
+        plt.show()
+        return True
@@ -0,0 +1,191 @@
+# model/cluster_service.py
+
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .similarity.result import ComparisonResult
+
+class UnionFind:
+    """
+    带路径压缩和按大小合并的并查集。
+    """
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> bool:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+class Cluster:
+    """
+    一个“抄袭小组”：成员文件、规模以及组内边密度。
+    """
+    def __init__(self, members: List[str], edge_count: int):
+        self.members = members
+        self.size = len(members)
+        self.edge_count = edge_count
+        possible = self.size * (self.size - 1) / 2
+        self.density = edge_count / possible if possible else 0.0
+
+class ClusterService:
+    """
+    不依赖绘图库的聚类服务。
+    按分数降序保存所有边，阈值变化时只在并查集上增量合并新越过阈值的边，
+    不需要重新构建图。
+    边排好序后（首次查询时）按降序合并一遍，记下每个切点处的小组数量，
+    拖动阈值时 cluster_count 只需一次二分查找，阈值升降都不必重放边。
+    """
+    def __init__(self, results: List[ComparisonResult], score_key: str = "综合可疑度"):
+        self.score_key = score_key
+        self.files: List[str] = []
+        index: Dict[str, int] = {}
+        edges: List[Tuple[float, int, int]] = []
+        for r in results:
+            for path in (r.file_a, r.file_b):
+                if path not in index:
+                    index[path] = len(self.files)
+                    self.files.append(path)
+            edges.append((r.scores.get(score_key, 0), index[r.file_a], index[r.file_b]))
+        # 按 results 顺序保存每个代码对的两端，分数变化后据此重新排列边
+        self._row_a = np.array([a for _, a, _ in edges], dtype=np.intp)
+        self._row_b = np.array([b for _, _, b in edges], dtype=np.intp)
+
+        # 按分数降序排列
+        edges.sort(key=lambda e: e[0], reverse=True)
+        self._set_edges([score for score, _, _ in edges],
+                        [a for _, a, _ in edges], [b for _, _, b in edges])
+
+    def _set_edges(self, scores: List[float], ends_a: List[int], ends_b: List[int]):
+        """按分数降序保存边；两端分别存放在并列的列表中，重新排列时不必为每条边创建元组。"""
+        # 取负后升序，便于二分查找
+        self._neg_scores = np.negative(scores, dtype=float).tolist()
+        self._edge_a = ends_a
+        self._edge_b = ends_b
+        self.threshold = float('inf')
+        self._cut = 0
+        self._uf = UnionFind(len(self.files))
+
+        # 各切点处的小组数量，首次查询时才计算（调整权重后未必会拖动阈值）
+        self._cluster_counts: List[int] = None
+
+    def rescore(self, rows: np.ndarray, scores: np.ndarray):
+        """
+        分数变化后（例如调整了指标权重）重新排列边，不重新登记文件。
+        rows 为按新分数降序排列的行号（对应构造时 results 的顺序），scores 为对应的新分数。
+        """
+        threshold = self.threshold
+        rows = np.asarray(rows, dtype=np.intp)
+        self._set_edges(scores, self._row_a[rows].tolist(), self._row_b[rows].tolist())
+        if threshold != float('inf'):
+            self.set_threshold(threshold)
+
+    def set_threshold(self, threshold: float):
+        """
+        调整阈值。阈值降低时只合并新增的边；阈值升高时从头重放剩余的边。
+        """
+        cut = bisect_right(self._neg_scores, -threshold)
+        if cut < self._cut:
+            self._uf = UnionFind(len(self.files))
+            self._cut = 0
+        for a, b in zip(self._edge_a[self._cut:cut], self._edge_b[self._cut:cut]):
+            self._uf.union(a, b)
+        self._cut = cut
+        self.threshold = threshold
+
+    def cluster_count(self, threshold: float) -> int:
+        """给定阈值下规模不少于 2 的小组数量，不改变当前阈值。"""
+        if self._cluster_counts is None:
+            self._cluster_counts = self._count_clusters()
+        return self._cluster_counts[bisect_right(self._neg_scores, -threshold)]
+
+    def _count_clusters(self) -> List[int]:
+        """按分数降序逐条合并边，第 i 项为只保留前 i 条边时规模不少于 2 的连通分量数。"""
+        uf = UnionFind(len(self.files))
+        size = uf.size
+        clusters = 0
+        counts = [0]
+        for a, b in zip(self._edge_a, self._edge_b):
+            root_a, root_b = uf.find(a), uf.find(b)
+            if root_a != root_b:
+                # 两个孤立文件合并新增一个小组，两个小组合并减少一个
+                clusters += 1 - (size[root_a] > 1) - (size[root_b] > 1)
+                uf.union(root_a, root_b)
+            counts.append(clusters)
+        return counts
+
+    def edge_count(self) -> int:
+        """当前阈值下的边数（超过阈值的代码对数量）。"""
+        return self._cut
+
+    def clusters(self, min_size: int = 2) -> List[Cluster]:
+        """
+        返回当前阈值下的连通分量，按规模降序排列。
+        """
+        members: Dict[int, List[str]] = defaultdict(list)
+        for idx, path in enumerate(self.files):
+            members[self._uf.find(idx)].append(path)
+
+        edge_counts: Dict[int, int] = defaultdict(int)
+        for a in self._edge_a[:self._cut]:
+            edge_counts[self._uf.find(a)] += 1
+
+        result = [Cluster(paths, edge_counts[root])
+                  for root, paths in members.items() if len(paths) >= min_size]
+        result.sort(key=lambda c: c.size, reverse=True)
+        return result
+
+    def communities(self, min_size: int = 2, max_iterations: int = 20) -> List[Cluster]:
+        """
+        在当前阈值的边上做带权标签传播，进一步拆分大的连通分量。
+        """
+        neighbours: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+        cut = self._cut
+        for neg_score, a, b in zip(self._neg_scores[:cut], self._edge_a[:cut], self._edge_b[:cut]):
+            neighbours[a].append((b, -neg_score))
+            neighbours[b].append((a, -neg_score))
+
+        labels = list(range(len(self.files)))
+        for _ in range(max_iterations):
+            changed = False
+            for node in sorted(neighbours):
+                weights: Dict[int, float] = defaultdict(float)
+                for other, score in neighbours[node]:
+                    weights[labels[other]] += score
+                # 权重最大的标签胜出，平局时取较小的标签以保证结果确定
+                best = min(weights, key=lambda label: (-weights[label], label))
+                if best != labels[node]:
+                    labels[node] = best
+                    changed = True
+            if not changed:
+                break
+
+        members: Dict[int, List[int]] = defaultdict(list)
+        for idx, label in enumerate(labels):
+            members[label].append(idx)
+
+        edge_counts: Dict[int, int] = defaultdict(int)
+        for a, b in zip(self._edge_a[:cut], self._edge_b[:cut]):
+            if labels[a] == labels[b]:
+                edge_counts[labels[a]] += 1
+
+        result = [Cluster([self.files[i] for i in idxs], edge_counts[label])
+                  for label, idxs in members.items() if len(idxs) >= min_size]
+        result.sort(key=lambda c: c.size, reverse=True)
+        return result
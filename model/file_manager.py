@@ -1,42 +1,153 @@
 # model/file_manager.py
 
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from pathlib import Path
-from typing import List, Set
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from .similarity.profile import decode_source
+
+# 进度回调：(已完成数, 总数)
+ProgressCallback = Callable[[int, int], None]
 
 class FileManager:
-    def __init__(self):
+    def __init__(self, max_workers: int = 8):
         # 存储所有待查重的文件路径
         self.files: Set[Path] = set()
+        # 导入时一次性读入的文件内容与内容哈希，供后续分析直接使用
+        self.contents: Dict[Path, bytes] = {}
+        self.hashes: Dict[Path, str] = {}
+        self.mtimes: Dict[Path, float] = {}
+        # 目录遍历与文件读取的最大并行度
+        self.max_workers = max_workers
 
-    def load_directory(self, directory: str) -> None:
+    def load_directory(self, directory: str, progress_callback: Optional[ProgressCallback] = None,
+                       scan_callback: Optional[ProgressCallback] = None) -> None:
         """
         扫描指定目录，将所有 .py 文件添加到现有文件集合中。
+        目录遍历与文件读取都在线程池中并行进行；scan_callback 汇报扫描进度，progress_callback 汇报读取进度。
         """
         dir_path = Path(directory)
         if not dir_path.is_dir():
             raise NotADirectoryError(f"{directory} 不是有效目录")
         # 递归搜索 .py 文件
-        new_files = {p for p in dir_path.rglob('*.py') if p.is_file()}
-        
-        self.files.update(new_files)
+        new_files = self.scan_directory(dir_path, scan_callback)
+
+        self._ingest(new_files, progress_callback)
 
-    def load_files(self, file_paths: List[str]) -> None:
+    def load_files(self, file_paths: List[str], progress_callback: Optional[ProgressCallback] = None) -> None:
         """
         接收一个文件路径列表，验证后添加到现有文件集合中。
         """
+        new_files = []
         for file_path in file_paths:
             p = Path(file_path)
             # 确保是文件、存在且是.py文件
             if p.is_file() and p.suffix == '.py':
-                self.files.add(p)
+                new_files.append(p)
+
+        self._ingest(new_files, progress_callback)
+
+    def scan_directory(self, root: Path, progress_callback: Optional[ProgressCallback] = None) -> List[Path]:
+        """
+        使用 os.scandir 并行遍历目录树，每个子目录作为一个独立任务提交到线程池。
+        与 rglob 一致，不跟随指向目录的符号链接。
+        每扫描完一个目录汇报一次 (已扫描的目录数, 已发现的目录数)，总数随遍历增长。
+        """
+        found: List[Path] = []
+        scanned, discovered = 0, 1
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {pool.submit(self._scan_one, root)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    found.extend(files)
+                    for subdir in subdirs:
+                        pending.add(pool.submit(self._scan_one, subdir))
+                    scanned += 1
+                    discovered += len(subdirs)
+                    if progress_callback:
+                        progress_callback(scanned, discovered)
+        return found
+
+    @staticmethod
+    def _scan_one(directory: Path) -> Tuple[List[Path], List[Path]]:
+        """扫描单层目录，返回 (.py 文件列表, 子目录列表)。"""
+        files, subdirs = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(Path(entry.path))
+                        elif entry.name.endswith('.py') and entry.is_file():
+                            files.append(Path(entry.path))
+                    except OSError:
+                        continue
+        except OSError as e:
+            print(f"扫描目录 {directory} 失败: {e}")
+        return files, subdirs
+
+    def _ingest(self, paths: List[Path], progress_callback: Optional[ProgressCallback] = None) -> None:
+        """
+        在有界线程池中并发读取并哈希文件内容，逐个汇报进度。
+        已导入且修改时间未变的文件不会重复读取。
+        """
+        pending = [p for p in paths if not self._is_cached(p)]
+        total = len(pending)
+        if progress_callback:
+            progress_callback(0, total)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._read_and_hash, p): p for p in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    data, digest, mtime = future.result()
+                except OSError as e:
+                    print(f"读取文件 {path} 失败: {e}")
+                else:
+                    self.files.add(path)
+                    self.contents[path] = data
+                    self.hashes[path] = digest
+                    self.mtimes[path] = mtime
+                if progress_callback:
+                    progress_callback(done, total)
+
+        # 已缓存的文件直接加入集合
+        self.files.update(p for p in paths if p in self.contents)
+
+    def _is_cached(self, path: Path) -> bool:
+        """文件内容已缓存，且磁盘上的修改时间与读取时一致。"""
+        if path not in self.contents:
+            return False
+        try:
+            return path.stat().st_mtime == self.mtimes.get(path)
+        except OSError:
+            return False
+
+    @staticmethod
+    def _read_and_hash(path: Path) -> Tuple[bytes, str, float]:
+        """读取文件的原始字节，计算内容哈希并记录修改时间。"""
+        mtime = path.stat().st_mtime
+        data = path.read_bytes()
+        return data, hashlib.sha1(data).hexdigest(), mtime
 
     def remove_file(self, file_path_to_remove: Path) -> None:
         """从集合中移除指定的文件路径。"""
         self.files.discard(file_path_to_remove)
+        self.contents.pop(file_path_to_remove, None)
+        self.hashes.pop(file_path_to_remove, None)
+        self.mtimes.pop(file_path_to_remove, None)
 
     def clear_all(self) -> None:
         """清空所有已导入的文件。"""
         self.files.clear()
+        self.contents.clear()
+        self.hashes.clear()
+        self.mtimes.clear()
 
     @property
     def sorted_files(self) -> List[Path]:
@@ -45,11 +156,27 @@ class FileManager:
         """
         return sorted(list(self.files))
 
+    def get_sources(self) -> Dict[str, bytes]:
+        """
+        返回 {文件路径字符串: 原始字节} 映射，交给分析器的预处理阶段直接使用。
+        """
+        return {str(p): data for p, data in self.contents.items() if p in self.files}
+
+    def get_file_info(self) -> Dict[str, Tuple[str, int, float]]:
+        """
+        返回 {文件路径字符串: (内容哈希, 大小, 修改时间)}，供历史记录的文件注册表使用。
+        """
+        return {str(p): (self.hashes[p], len(self.contents[p]), self.mtimes[p])
+                for p in self.files if p in self.hashes}
+
     def read_file(self, filepath: Path) -> str:
         """
-        读取指定文件的源码内容。
+        读取指定文件的源码内容，优先使用导入时缓存的字节。
         """
         try:
-            return filepath.read_text(encoding='utf-8')
+            data = self.contents.get(filepath)
+            if data is None:
+                data = filepath.read_bytes()
+            return decode_source(data)
         except Exception as e:
-            raise IOError(f"读取文件 {filepath} 失败: {e}")
\ No newline at end of file
+            raise IOError(f"读取文件 {filepath} 失败: {e}")
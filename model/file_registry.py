@@ -0,0 +1,122 @@
+# model/file_registry.py
+
+import hashlib
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+class FileEntry:
+    """
+    注册表中的一个文件：以内容哈希标识，记录它出现过的所有路径（别名）。
+    """
+    def __init__(self,
+                 file_id: str,
+                 content_hash: Optional[str],
+                 aliases: List[str] = None,
+                 size: int = 0,
+                 mtime: float = 0.0,
+                 profile_key: Optional[str] = None):
+        self.file_id = file_id
+        self.content_hash = content_hash
+        self.aliases = aliases or []
+        self.size = size
+        self.mtime = mtime
+        # 预处理结果缓存中的键（内容哈希），用于跨会话复用 FileProfile
+        self.profile_key = profile_key
+
+    def to_dict(self) -> Dict:
+        """转换为字典格式"""
+        return {
+            'hash': self.content_hash,
+            'aliases': self.aliases,
+            'size': self.size,
+            'mtime': self.mtime,
+            'profile': self.profile_key
+        }
+
+    @classmethod
+    def from_dict(cls, file_id: str, data: Dict) -> 'FileEntry':
+        """从字典格式创建实例"""
+        return cls(
+            file_id=file_id,
+            content_hash=data.get('hash'),
+            aliases=list(data.get('aliases', [])),
+            size=data.get('size', 0),
+            mtime=data.get('mtime', 0.0),
+            profile_key=data.get('profile')
+        )
+
+class FileRegistry:
+    """
+    跨会话的文件身份注册表。
+    会话只保存紧凑的 (文件ID, 别名下标) 引用，同一份内容无论出现在多少个会话、多少个路径下都只登记一次，
+    并维护“文件ID -> 会话ID”的倒排索引。
+    """
+    ID_LENGTH = 16
+
+    def __init__(self):
+        self.entries: Dict[str, FileEntry] = {}
+        self._id_by_path: Dict[str, str] = {}
+        self._sessions_by_file: Dict[str, Set[str]] = defaultdict(set)
+
+    @classmethod
+    def make_id(cls, content_hash: Optional[str], path: str) -> str:
+        """由内容哈希生成文件ID；内容未知时退化为按路径生成。"""
+        if content_hash is None:
+            content_hash = hashlib.sha1(f"path:{path}".encode('utf-8')).hexdigest()
+        return content_hash[:cls.ID_LENGTH]
+
+    def register(self, path: str, content_hash: Optional[str] = None,
+                 size: int = 0, mtime: float = 0.0) -> Tuple[str, int]:
+        """
+        登记一个路径，返回 (文件ID, 别名下标)。
+        未提供内容哈希时，沿用该路径最近一次登记的文件。
+        """
+        if content_hash is None and path in self._id_by_path:
+            file_id = self._id_by_path[path]
+        else:
+            file_id = self.make_id(content_hash, path)
+
+        entry = self.entries.get(file_id)
+        if entry is None:
+            entry = FileEntry(file_id, content_hash, size=size, mtime=mtime, profile_key=content_hash)
+            self.entries[file_id] = entry
+        elif content_hash is not None:
+            entry.size, entry.mtime = size, mtime
+
+        if path not in entry.aliases:
+            entry.aliases.append(path)
+        self._id_by_path[path] = file_id
+        return file_id, entry.aliases.index(path)
+
+    def resolve(self, file_id: str, alias_index: int) -> str:
+        """将 (文件ID, 别名下标) 还原为路径。"""
+        return self.entries[file_id].aliases[alias_index]
+
+    def file_id_for_path(self, path: str) -> Optional[str]:
+        """路径最近一次登记对应的文件ID。"""
+        return self._id_by_path.get(path)
+
+    def index_session(self, session_id: str, file_ids: Iterable[str]):
+        """记录某个会话引用了哪些文件。"""
+        for file_id in file_ids:
+            self._sessions_by_file[file_id].add(session_id)
+
+    def unindex_all(self):
+        """清空会话倒排索引（清空历史时使用）。"""
+        self._sessions_by_file.clear()
+
+    def sessions_for_file(self, file_id: str) -> Set[str]:
+        """引用了该文件的所有会话ID。"""
+        return set(self._sessions_by_file.get(file_id, ()))
+
+    def to_dict(self) -> Dict:
+        """转换为字典格式"""
+        return {file_id: entry.to_dict() for file_id, entry in self.entries.items()}
+
+    def load_dict(self, data: Dict):
+        """从字典格式恢复注册表内容"""
+        for file_id, entry_data in data.items():
+            entry = FileEntry.from_dict(file_id, entry_data)
+            self.entries[file_id] = entry
+            for alias in entry.aliases:
+                self._id_by_path[alias] = file_id
@@ -1,95 +1,161 @@
 # model/graph_handler.py
 
-from typing import List
-import networkx as nx
-import matplotlib.pyplot as plt
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Set, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from datetime import datetime
 import math
 
-# 解决matplotlib中文显示问题
-plt.rcParams['font.sans-serif'] = ['SimHei']
-plt.rcParams['axes.unicode_minus'] = False
-
 from .similarity.result import ComparisonResult
 
+if TYPE_CHECKING:
+    import networkx as nx
+
+@lru_cache(maxsize=None)
+def _plotting():
+    """
+    按需导入 networkx 和 matplotlib，只有真正需要画图时才承担它们的导入开销。
+    """
+    import networkx as nx
+    import matplotlib.pyplot as plt
+
+    # 解决matplotlib中文显示问题
+    plt.rcParams['font.sans-serif'] = ['SimHei']
+    plt.rcParams['axes.unicode_minus'] = False
+    return nx, plt
+
 class GraphHandler:
     """
     负责创建、绘制和导出抄袭关系网络图。
     """
-    def create_graph(self, results: List[ComparisonResult], threshold: float = 0.8) -> nx.Graph:
+    # 连通分量按规模选择布局：小分量用力导向布局，中等分量用谱布局（向量化），超大分量用环形布局（线性）
+    SPRING_LAYOUT_MAX_NODES = 50
+    # networkx 从 500 个节点起改用 scipy 稀疏求解器计算谱布局，而 scipy 不在依赖中
+    SPECTRAL_LAYOUT_MAX_NODES = 499
+    # 分量超过该规模时不再绘制文本标签
+    LABEL_MAX_NODES = 30
+    # 布局缓存保留的分量布局数：拖动阈值时每个阈值都会产生新的边集合，超出后淘汰最久未用的布局
+    LAYOUT_CACHE_SIZE = 256
+
+    def __init__(self):
+        # 布局缓存（LRU）：以分量的边集合为键，边集合不变时直接复用上次的布局
+        self._layout_cache: "OrderedDict[FrozenSet, Dict[str, Tuple[float, float]]]" = OrderedDict()
+
+    def create_graph(self, results: List[ComparisonResult], threshold: float = 0.8) -> 'nx.Graph':
         """
         根据查重结果和相似度阈值创建图。
+        图中只包含至少有一条超过阈值的边的文件；绘制时本就略去的孤立文件不建节点，
+        只把数量记在图属性 singletons 中。
         """
-        graph = nx.Graph()
-        
-        all_files = set()
-        for r in results:
-            all_files.add(Path(r.file_a).name)
-            all_files.add(Path(r.file_b).name)
-        graph.add_nodes_from(list(all_files))
+        nx, _ = _plotting()
+        graph = nx.Graph(threshold=threshold)
 
+        all_paths = set()
         for r in results:
+            all_paths.add(r.file_a)
+            all_paths.add(r.file_b)
             score = r.scores.get("综合可疑度", 0)
             if score >= threshold:
-                file_a_name = Path(r.file_a).name
-                file_b_name = Path(r.file_b).name
-                graph.add_edge(file_a_name, file_b_name, weight=score)
-        
+                graph.add_edge(Path(r.file_a).name, Path(r.file_b).name, weight=score)
+
+        all_files = {Path(path).name for path in all_paths}
+        graph.graph['singletons'] = len(all_files) - sum(1 for name in all_files if name in graph)
         return graph
 
-    def draw_graph(self, graph: nx.Graph, output_path: str = None):
+    def _clusters(self, graph: 'nx.Graph') -> Tuple[List[Set[str]], int]:
         """
-        绘制图形，采用分层布局优化视觉效果。
+        返回按规模降序排列的非孤立连通分量，以及被略去的孤立节点数（含建图时未建节点的孤立文件）。
         """
-        if not graph.nodes():
-            print("图中没有节点，无法绘制。")
-            return False # 返回布尔值以方便controller判断
+        nx, _ = _plotting()
+        components = []
+        singletons = graph.graph.get('singletons', 0)
+        for component in nx.connected_components(graph):
+            if len(component) > 1:
+                components.append(component)
+            else:
+                singletons += 1
+        components.sort(key=len, reverse=True)
+        return components, singletons
 
-        plt.figure(figsize=(12, 8))
-        
-        # 找出所有独立的“抄袭小组”（连通分量）
-        components = list(nx.connected_components(graph))
-        
-        if not components:
-            pos = {}
+    def _component_layout(self, graph: 'nx.Graph', component: Set[str]) -> Dict[str, Tuple[float, float]]:
+        """
+        计算单个连通分量的布局，按边集合缓存。
+        """
+        nx, _ = _plotting()
+        subgraph = graph.subgraph(component)
+        key = frozenset(frozenset(edge) for edge in subgraph.edges())
+        cached = self._layout_cache.get(key)
+        if cached is not None:
+            self._layout_cache.move_to_end(key)
+            return cached
+
+        size = len(component)
+        if size <= self.SPRING_LAYOUT_MAX_NODES:
+            pos = nx.spring_layout(subgraph, k=0.8, iterations=50)
+        elif size <= self.SPECTRAL_LAYOUT_MAX_NODES:
+            pos = nx.spectral_layout(subgraph)
         else:
-            num_components = len(components)
-            cols = math.ceil(math.sqrt(num_components))
-            rows = math.ceil(num_components / cols)
-            
-            final_pos = {}
-            grid_x, grid_y = 0, rows - 1 # 从左上角开始排列
-            
-            for component in components:
-                subgraph = graph.subgraph(component)
-                pos_sub = nx.spring_layout(subgraph, k=0.8, iterations=50) 
-                
-                for node, (x, y) in pos_sub.items():
-                    final_pos[node] = (x + grid_x * 2.5, y + grid_y * 2.5)
-                
-                # 更新下一个网格位置
-                grid_x += 1
-                if grid_x >= cols:
-                    grid_x = 0
-                    grid_y -= 1
-            pos = final_pos
-
-        # 绘制节点
-        nx.draw_networkx_nodes(graph, pos, node_color='skyblue', node_size=1000)
-        
-        # 绘制节点标签
-        nx.draw_networkx_labels(graph, pos, font_size=10, font_family='sans-serif')
-        
+            pos = nx.circular_layout(subgraph)
+
+        layout = {node: (float(x), float(y)) for node, (x, y) in pos.items()}
+        self._layout_cache[key] = layout
+        if len(self._layout_cache) > self.LAYOUT_CACHE_SIZE:
+            self._layout_cache.popitem(last=False)
+        return layout
+
+    def _grid_layout(self, graph: 'nx.Graph', components: List[Set[str]]) -> Dict[str, Tuple[float, float]]:
+        """把各个分量的布局按网格排列到同一画布上。"""
+        num_components = len(components)
+        cols = math.ceil(math.sqrt(num_components))
+        rows = math.ceil(num_components / cols)
+
+        final_pos = {}
+        grid_x, grid_y = 0, rows - 1 # 从左上角开始排列
+
+        for component in components:
+            for node, (x, y) in self._component_layout(graph, component).items():
+                final_pos[node] = (x + grid_x * 2.5, y + grid_y * 2.5)
+
+            # 更新下一个网格位置
+            grid_x += 1
+            if grid_x >= cols:
+                grid_x = 0
+                grid_y -= 1
+        return final_pos
+
+    def _draw_components(self, graph: 'nx.Graph', components: List[Set[str]], title: str,
+                         label_all: bool = False):
+        """在当前画布上绘制给定的分量。"""
+        nx, plt = _plotting()
+        nodes = set().union(*components)
+        subgraph = graph.subgraph(nodes)
+        pos = self._grid_layout(graph, components)
+
+        # 节点越多，节点越小
+        node_size = max(60, int(1000 / math.sqrt(max(1.0, len(nodes) / 20))))
+        nx.draw_networkx_nodes(subgraph, pos, node_color='skyblue', node_size=node_size)
+
+        # 默认只为较小的分量绘制节点标签
+        labels = {node: node for component in components
+                  if label_all or len(component) <= self.LABEL_MAX_NODES for node in component}
+        if labels:
+            nx.draw_networkx_labels(subgraph, pos, labels=labels, font_size=10, font_family='sans-serif')
+
         # 绘制边
-        edges = graph.edges(data=True)
+        edges = subgraph.edges(data=True)
         if edges:
             edge_colors = [d['weight'] for u, v, d in edges]
-            nx.draw_networkx_edges(graph, pos, width=2, edge_color=edge_colors, 
-                                   edge_cmap=plt.cm.coolwarm, edge_vmin=0.8, edge_vmax=1.0)
+            nx.draw_networkx_edges(subgraph, pos, width=2, edge_color=edge_colors,
+                                   edge_cmap=plt.cm.coolwarm,
+                                   edge_vmin=graph.graph.get('threshold', 0.8), edge_vmax=1.0)
 
-        plt.title("抄袭关系网络图", size=20)
+        plt.title(title, size=20)
         plt.axis('off')
 
+    def _finish(self, output_path: str = None) -> bool:
+        """保存或显示当前画布。"""
+        _, plt = _plotting()
         if output_path:
             try:
                 plt.savefig(output_path, bbox_inches='tight', dpi=150)
@@ -102,3 +168,73 @@ class GraphHandler:
         else:
             plt.show()
             return True
+
+    def draw_graph(self, graph: 'nx.Graph', output_path: str = None):
+        """
+        绘制图形，采用分层布局优化视觉效果。
+        孤立节点不参与布局和绘制，只在标题中汇总其数量。
+        """
+        _, plt = _plotting()
+        if not graph.nodes() and not graph.graph.get('singletons'):
+            print("图中没有节点，无法绘制。")
+            return False # 返回布尔值以方便controller判断
+
+        plt.figure(figsize=(12, 8))
+
+        # 找出所有独立的“抄袭小组”（连通分量）
+        components, singletons = self._clusters(graph)
+        title = "抄袭关系网络图"
+        if singletons:
+            title += f"（另有 {singletons} 个无关联文件未显示）"
+
+        if components:
+            self._draw_components(graph, components, title)
+        else:
+            plt.title(title, size=20)
+            plt.text(0.5, 0.5, "没有超过阈值的代码对", ha='center', va='center', size=16)
+            plt.axis('off')
+
+        return self._finish(output_path)
+
+    def export_graph_lod(self, graph: 'nx.Graph', output_dir: str) -> bool:
+        """
+        分层导出关系图：一张所有“抄袭小组”的概览图，外加每个小组一张详细图。
+        """
+        nx, plt = _plotting()
+        components, singletons = self._clusters(graph)
+        if not components:
+            print("没有超过阈值的代码对，无法导出关系图。")
+            return False
+
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+        # 概览图：每个小组一个节点，节点大小与成员数成正比
+        summary = nx.Graph()
+        for index, component in enumerate(components, start=1):
+            summary.add_node(f"小组{index} ({len(component)})", size=len(component))
+        cols = math.ceil(math.sqrt(len(components)))
+        pos = {node: (i % cols, -(i // cols)) for i, node in enumerate(summary.nodes())}
+        largest = len(components[0])
+        sizes = [300 + 2000 * d['size'] / largest for _, d in summary.nodes(data=True)]
+
+        plt.figure(figsize=(12, 8))
+        nx.draw_networkx_nodes(summary, pos, node_color='skyblue', node_size=sizes)
+        nx.draw_networkx_labels(summary, pos, font_size=10, font_family='sans-serif')
+        title = f"抄袭小组概览（共 {len(components)} 个小组）"
+        if singletons:
+            title += f"（另有 {singletons} 个无关联文件）"
+        plt.title(title, size=20)
+        plt.axis('off')
+        if not self._finish(str(output_path / f"{timestamp}_summary.png")):
+            return False
+
+        # 详细图：每个小组单独绘制，保留全部节点标签
+        for index, component in enumerate(components, start=1):
+            plt.figure(figsize=(12, 8))
+            self._draw_components(graph, [component], f"抄袭小组 {index}（{len(component)} 个文件）",
+                                  label_all=True)
+            if not self._finish(str(output_path / f"{timestamp}_cluster_{index:03d}.png")):
+                return False
+        return True
@@ -1,38 +1,127 @@
 # model/history_manager.py
 
+import csv
 import json
+import hashlib
 import os
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from pathlib import Path
 from .similarity.result import AnalysisSession, ComparisonResult
+from .file_registry import FileRegistry
+
+class HistoryEvent:
+    """
+    历史记录的细粒度变化事件，视图据此只更新受影响的条目。
+    """
+    SESSION_ADDED = "session_added"        # 新增会话
+    SESSION_UPDATED = "session_updated"    # 会话的状态或一批标记发生变化
+    RESULT_MARKED = "result_marked"        # 单个结果被标记为抄袭（或修改了备注）
+    RESULT_UNMARKED = "result_unmarked"    # 单个结果的抄袭标记被取消
+    CLEARED = "cleared"                    # 全部历史被清空
+
+    def __init__(self, kind: str, session: Optional[AnalysisSession] = None,
+                 result: Optional[ComparisonResult] = None):
+        self.kind = kind
+        self.session = session
+        self.result = result
 
 class HistoryManager:
     """
     管理分析历史记录，负责保存和加载分析会话。
+    同时维护每个会话中被标记为抄袭的结果索引，并在历史变化时通知监听者。
     """
-    def __init__(self, history_file: str = "history/analysis_history.json"):
+    def __init__(self, history_file: str = "history/analysis_history.json", load_in_background: bool = False):
         self.history_file = Path(history_file)
         self.history_file.parent.mkdir(exist_ok=True)
-        self.sessions: List[AnalysisSession] = []
-        self.load_history()
+        self._sessions: List[AnalysisSession] = []
+        # 跨会话的文件注册表，会话中只保存文件ID引用
+        self.registry = FileRegistry()
+        # 会话ID -> {(文件A, 文件B): 被标记为抄袭的结果}
+        self._marked: Dict[str, Dict[Tuple[str, str], ComparisonResult]] = {}
+        self._listeners: List[Callable[[HistoryEvent], None]] = []
+        # 有尚未写入历史文件的变化（见 session_marks_changed 的 save 参数）
+        self._dirty = False
+        self._loaded = threading.Event()
+        if load_in_background:
+            # 在后台线程中解析历史文件，首次访问 sessions 时才需要等待
+            threading.Thread(target=self.load_history, daemon=True).start()
+        else:
+            self.load_history()
+
+    @property
+    def sessions(self) -> List[AnalysisSession]:
+        self._loaded.wait()
+        return self._sessions
+
+    @sessions.setter
+    def sessions(self, sessions: List[AnalysisSession]):
+        self._sessions = sessions
+
+    def is_loaded(self) -> bool:
+        """历史记录是否已加载完成"""
+        return self._loaded.is_set()
+
+    def profile_directory(self) -> Path:
+        """分块分析时磁盘预处理结果仓库所在目录"""
+        return self.history_file.parent / "profiles"
+
+    def work_directory(self, session_id: str) -> Path:
+        """分块分析时某个会话的进度清单与分块结果所在目录"""
+        return self.history_file.parent / "blocks" / session_id
+
+    def results_directory(self) -> Path:
+        """分块分析的会话逐块写入结果的目录，每个会话一个 JSON Lines 文件"""
+        return self.history_file.parent / "results"
+
+    def results_path(self, session_id: str) -> Path:
+        """某个会话的结果文件"""
+        return self.results_directory() / f"{session_id}.jsonl"
+
+    def discard_work_directory(self, session_id: str):
+        """删除会话的分块工作目录（会话完成并保存后调用）"""
+        shutil.rmtree(self.work_directory(session_id), ignore_errors=True)
 
     def load_history(self):
         """从文件加载历史记录"""
-        if self.history_file.exists():
-            try:
-                with open(self.history_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.sessions = [AnalysisSession.from_dict(session_data) 
-                                   for session_data in data.get('sessions', [])]
-            except Exception as e:
-                self.sessions = []
+        try:
+            if self.history_file.exists():
+                try:
+                    with open(self.history_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                        registry = FileRegistry()
+                        registry.load_dict(data.get('files', {}))
+                        sessions = [AnalysisSession.from_dict(session_data, registry, self.results_directory())
+                                    for session_data in data.get('sessions', [])]
+                        marked = {}
+                        for session in sessions:
+                            self._index_session(session, registry)
+                            marked[session.session_id] = self._collect_marks(session)
+                        self.registry = registry
+                        self._marked = marked
+                        self._sessions = sessions
+                except Exception as e:
+                    self.registry = FileRegistry()
+                    self._sessions = []
+        finally:
+            self._loaded.set()
 
     def save_history(self):
         """保存历史记录到文件"""
+        self._dirty = False
         try:
+            # 结果集合有变化的会话先重写各自的结果文件（只有标记变化时不会重写）
+            for session in self.sessions:
+                session.save_results_file()
+            # 先序列化会话：其中登记的新文件必须出现在随后写出的注册表中
+            sessions = [session.to_dict(self.registry) for session in self.sessions]
             data = {
-                'sessions': [session.to_dict() for session in self.sessions],
+                'files': self.registry.to_dict(),
+                'sessions': sessions,
                 'last_updated': datetime.now().isoformat()
             }
             with open(self.history_file, 'w', encoding='utf-8') as f:
@@ -40,10 +129,111 @@ class HistoryManager:
         except Exception as e:
             print(f"保存历史记录失败: {e}")
 
-    def add_session(self, session: AnalysisSession):
-        """添加新的分析会话"""
+    @staticmethod
+    def _index_session(session: AnalysisSession, registry: FileRegistry, refresh: Iterable[str] = ()):
+        """
+        在注册表中登记会话涉及的文件，并更新文件到会话的索引。
+        会话已有的文件身份保持不变（路径的最新内容可能属于其他会话），refresh 中的路径改用最新登记的内容。
+        """
+        refresh = set(refresh)
+        refs = {}
+        for path in session.get_file_paths():
+            ref = session.file_refs.get(path)
+            if ref is None or path in refresh:
+                ref = registry.register(path)
+            refs[path] = ref
+        session.file_refs = refs
+        registry.index_session(session.session_id, [file_id for file_id, _ in refs.values()])
+
+    def add_listener(self, listener: Callable[[HistoryEvent], None]):
+        """注册历史变化的监听者，每次变化以 HistoryEvent 调用"""
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, session: AnalysisSession = None, result: ComparisonResult = None):
+        event = HistoryEvent(kind, session, result)
+        for listener in self._listeners:
+            listener(event)
+
+    @staticmethod
+    def _collect_marks(session: AnalysisSession) -> Dict[Tuple[str, str], ComparisonResult]:
+        return {(r.file_a, r.file_b): r for r in session.get_plagiarism_results()}
+
+    def add_session(self, session: AnalysisSession,
+                    file_info: Dict[str, Tuple[str, int, float]] = None):
+        """
+        添加新的分析会话。
+        file_info 为 {路径: (内容哈希, 大小, 修改时间)}，用于以内容哈希登记文件。
+        """
+        for path, (content_hash, size, mtime) in (file_info or {}).items():
+            self.registry.register(path, content_hash, size, mtime)
         self.sessions.append(session)
+        self._index_session(session, self.registry)
+        self._marked[session.session_id] = self._collect_marks(session)
         self.save_history()
+        self._notify(HistoryEvent.SESSION_ADDED, session)
+
+    def add_session_files(self, session: AnalysisSession,
+                          file_info: Dict[str, Tuple[str, int, float]] = None):
+        """会话结果发生增量变化（如监视模式）后，重新登记文件并保存"""
+        for path, (content_hash, size, mtime) in (file_info or {}).items():
+            self.registry.register(path, content_hash, size, mtime)
+        self._index_session(session, self.registry, refresh=(file_info or {}).keys())
+        self.session_marks_changed(session)
+
+    def session_marks_changed(self, session: AnalysisSession,
+                              changed: Iterable[ComparisonResult] = None, save: bool = True):
+        """
+        会话中一批结果的标记已被直接修改（如自动标记、调整阈值或权重）后调用：
+        更新该会话的标记索引（给出 changed 时只更新这些结果，否则整体重建）、保存，并通知监听者整体更新这个会话。
+        save 为 False 时不写文件，只记下有未保存的变化，由调用方稍后调用 save_if_dirty。
+        """
+        if changed is None:
+            self._marked[session.session_id] = self._collect_marks(session)
+        else:
+            marks = self._marked.setdefault(session.session_id, {})
+            for result in changed:
+                if result.is_plagiarism:
+                    marks[(result.file_a, result.file_b)] = result
+                else:
+                    marks.pop((result.file_a, result.file_b), None)
+        if save:
+            self.save_history()
+        else:
+            self._dirty = True
+        self._notify(HistoryEvent.SESSION_UPDATED, session)
+
+    def save_if_dirty(self):
+        """有尚未保存的变化时保存历史记录"""
+        if self._dirty:
+            self.save_history()
+
+    def marked_count(self, session_id: str) -> int:
+        """会话中被标记为抄袭的结果数量"""
+        return len(self._marked.get(session_id, {}))
+
+    def marked_results(self, session_id: str) -> List[ComparisonResult]:
+        """会话中被标记为抄袭的结果"""
+        return list(self._marked.get(session_id, {}).values())
+
+    def get_sessions_for_file(self, path: str) -> List[AnalysisSession]:
+        """通过注册表索引查找包含该文件（按内容识别）的所有会话"""
+        file_id = self.registry.file_id_for_path(path)
+        if file_id is None:
+            return []
+        session_ids = self.registry.sessions_for_file(file_id)
+        return [session for session in self.sessions if session.session_id in session_ids]
+
+    def get_flagged_sessions_for_file(self, path: str) -> List[AnalysisSession]:
+        """该文件（按内容识别）被判定为抄袭的所有会话"""
+        file_id = self.registry.file_id_for_path(path)
+        flagged = []
+        for session in self.get_sessions_for_file(path):
+            for result in self.marked_results(session.session_id):
+                if file_id in (session.file_refs.get(result.file_a, (None,))[0],
+                               session.file_refs.get(result.file_b, (None,))[0]):
+                    flagged.append(session)
+                    break
+        return flagged
 
     def get_all_sessions(self) -> List[AnalysisSession]:
         """获取所有分析会话"""
@@ -58,23 +248,36 @@ class HistoryManager:
 
     def get_plagiarism_sessions(self) -> List[AnalysisSession]:
         """获取包含抄袭判定的会话"""
-        return [session for session in self.sessions 
-                if session.get_plagiarism_results()]
+        return [session for session in self.sessions
+                if self.marked_count(session.session_id)]
 
     def update_result_plagiarism_status(self, session_id: str, 
                                       file_a: str, file_b: str, 
                                       is_plagiarism: bool, notes: str = ""):
         """更新特定结果的抄袭状态"""
         session = self.get_session_by_id(session_id)
-        if session:
-            for result in session.results:
-                if (result.file_a == file_a and result.file_b == file_b) or \
-                   (result.file_a == file_b and result.file_b == file_a):
-                    result.is_plagiarism = is_plagiarism
-                    result.plagiarism_notes = notes
-                    break
-            self.save_history()
-    
+        if not session:
+            return
+        # 已标记的结果（取消标记、修改备注）直接从索引中取得，否则在会话结果中查找
+        marks = self._marked.setdefault(session_id, {})
+        result = marks.get((file_a, file_b)) or marks.get((file_b, file_a))
+        if result is None:
+            result = next((r for r in session.results
+                           if (r.file_a, r.file_b) in ((file_a, file_b), (file_b, file_a))), None)
+        if result is None:
+            return
+
+        result.is_plagiarism = is_plagiarism
+        result.plagiarism_notes = notes
+        key = (result.file_a, result.file_b)
+        if is_plagiarism:
+            marks[key] = result
+        else:
+            marks.pop(key, None)
+        self.save_history()
+        self._notify(HistoryEvent.RESULT_MARKED if is_plagiarism else HistoryEvent.RESULT_UNMARKED,
+                     session, result)
+
     def reset_result_plagiarism_status(self, session_id: str):
         """重置特定会话的抄袭状态"""
         session = self.get_session_by_id(session_id)
@@ -82,74 +285,137 @@ class HistoryManager:
             for result in session.results:
                 result.is_plagiarism = False
                 result.plagiarism_notes = ""
-        self.save_history()
+            self.session_marks_changed(session)
 
-    def export_plagiarism_report(self, output_file: str) -> bool:
-        """导出所有抄袭判定的报告"""
-        try:
-            plagiarism_results = []
-            for session in self.sessions:
-                for result in session.get_plagiarism_results():
-                    plagiarism_results.append({
+    def iter_plagiarism_records(self) -> Iterator[Dict]:
+        """逐条生成所有被判定为抄袭的记录，不在内存中汇总"""
+        for session in self.sessions:
+            analysis_time = session.analysis_time.isoformat()
+            for result in session.get_plagiarism_results():
+                if result.is_plagiarism:
+                    yield {
                         'session_id': session.session_id,
-                        'analysis_time': session.analysis_time.isoformat(),
+                        'analysis_time': analysis_time,
                         'file_a': result.file_a,
                         'file_b': result.file_b,
                         'scores': result.scores,
                         'notes': result.plagiarism_notes
-                    })
-            
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(plagiarism_results, f, ensure_ascii=False, indent=2)
+                    }
+
+    def export_plagiarism_report(self, output_file: str) -> bool:
+        """
+        导出所有抄袭判定的报告，按文件后缀选择格式：
+        .jsonl 为 JSON Lines，.csv 为 CSV，其余为 JSON 数组。三种格式都逐条写出。
+        """
+        suffix = Path(output_file).suffix.lower()
+        try:
+            with open(output_file, 'w', encoding='utf-8', newline='') as f:
+                records = self.iter_plagiarism_records()
+                if suffix == '.jsonl':
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False))
+                        f.write('\n')
+                elif suffix == '.csv':
+                    writer = csv.writer(f)
+                    writer.writerow(['session_id', 'analysis_time', 'file_a', 'file_b',
+                                     '综合可疑度', 'notes', 'scores'])
+                    for record in records:
+                        writer.writerow([
+                            record['session_id'], record['analysis_time'],
+                            record['file_a'], record['file_b'],
+                            record['scores'].get('综合可疑度', 0), record['notes'],
+                            json.dumps(record['scores'], ensure_ascii=False)
+                        ])
+                else:
+                    f.write('[')
+                    for index, record in enumerate(records):
+                        f.write(',\n' if index else '\n')
+                        f.write(json.dumps(record, ensure_ascii=False, indent=2))
+                    f.write('\n]\n')
             return True
         except Exception as e:
             print(f"导出抄袭报告失败: {e}")
             return False
 
-    def export_plagiarism_files(self, output_dir: str) -> bool:
-        """导出所有被判定抄袭的代码文件"""
+    def export_plagiarism_files(self, output_dir: str, as_zip: bool = False, max_workers: int = 8) -> bool:
+        """
+        导出所有被判定抄袭的代码文件。
+        文件先在线程池中按内容哈希去重，再以 shutil.copyfile 批量复制（Linux 上走 sendfile），
+        as_zip 为真时打包为单个 zip 文件。
+        """
         try:
             output_path = Path(output_dir)
             output_path.mkdir(exist_ok=True)
-            
-            exported_files = set()
-            for session in self.sessions:
-                for result in session.get_plagiarism_results():
-                    # 导出文件A
-                    if result.file_a not in exported_files:
-                        self._export_file(result.file_a, output_path)
-                        exported_files.add(result.file_a)
-                    
-                    # 导出文件B
-                    if result.file_b not in exported_files:
-                        self._export_file(result.file_b, output_path)
-                        exported_files.add(result.file_b)
-            
+
+            source_files = []
+            seen = set()
+            for record in self.iter_plagiarism_records():
+                for source_file in (record['file_a'], record['file_b']):
+                    if source_file not in seen:
+                        seen.add(source_file)
+                        source_files.append(source_file)
+
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                digests = list(pool.map(self._hash_file, source_files))
+
+                # 按内容哈希去重，并分配不冲突的导出文件名
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                targets: Dict[str, Tuple[Path, str]] = {}
+                used_names = set()
+                for source_file, digest in zip(source_files, digests):
+                    if digest is None or digest in targets:
+                        continue
+                    source_path = Path(source_file)
+                    # 创建带时间戳的文件名以避免冲突
+                    filename = f"{timestamp}_{source_path.name}"
+                    if filename in used_names:
+                        filename = f"{timestamp}_{digest[:8]}_{source_path.name}"
+                    used_names.add(filename)
+                    targets[digest] = (source_path, filename)
+
+                if as_zip:
+                    zip_path = output_path / f"plagiarism_files_{timestamp}.zip"
+                    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+                        for source_path, filename in targets.values():
+                            archive.write(source_path, arcname=filename)
+                else:
+                    copies = [pool.submit(self._export_file, source_path, output_path / filename)
+                              for source_path, filename in targets.values()]
+                    for future in copies:
+                        future.result()
+
             return True
         except Exception as e:
             print(f"导出抄袭文件失败: {e}")
             return False
 
-    def _export_file(self, source_file: str, output_dir: Path):
+    @staticmethod
+    def _hash_file(source_file: str) -> Optional[str]:
+        """分块计算文件内容哈希，文件不存在时返回 None"""
+        try:
+            hasher = hashlib.sha1()
+            with open(source_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+            return hasher.hexdigest()
+        except OSError as e:
+            print(f"读取文件 {source_file} 失败: {e}")
+            return None
+
+    @staticmethod
+    def _export_file(source_path: Path, target_path: Path):
         """导出单个文件"""
         try:
-            source_path = Path(source_file)
-            if source_path.exists():
-                # 创建带时间戳的文件名以避免冲突
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"{timestamp}_{source_path.name}"
-                target_path = output_dir / filename
-                
-                # 复制文件内容
-                with open(source_path, 'r', encoding='utf-8') as src:
-                    content = src.read()
-                
-                with open(target_path, 'w', encoding='utf-8') as dst:
-                    dst.write(content)
+            shutil.copyfile(source_path, target_path)
         except Exception as e:
-            print(f"导出文件 {source_file} 失败: {e}")
+            print(f"导出文件 {source_path} 失败: {e}")
 
     def clear_history(self):
-        """清空历史记录"""
+        """清空历史记录，同时删除分块分析留下的预处理仓库、工作目录与结果文件"""
         self.sessions = []
-        self.save_history() 
\ No newline at end of file
+        self.registry = FileRegistry()
+        self._marked = {}
+        for directory in (self.profile_directory(), self.history_file.parent / "blocks", self.results_directory()):
+            shutil.rmtree(directory, ignore_errors=True)
+        self.save_history()
+        self._notify(HistoryEvent.CLEARED) 
\ No newline at end of file
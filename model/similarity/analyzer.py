@@ -1,112 +1,507 @@
 # model/similarity/analyzer.py
 
-import ast
+import hashlib
+import os
+from collections import OrderedDict, defaultdict
 from pathlib import Path
 import tokenize
-from typing import List, Dict, Tuple
-from difflib import SequenceMatcher
+from typing import List, Dict, Tuple, Optional
 from datetime import datetime
 
 from .preprocessors import Tokenizer
+from .profile import FileProfile, build_profile
+from .segments import SegmentFinder
+from .units import CodeUnit, UnitIndex, extract_units
+from .clones import SubtreeIndex
+from .boilerplate import BoilerplateFilter
+from .score_stats import SessionStatistics
 from .result import ComparisonResult
-from .metrics import (JaccardMetric, LCSMetric, SequenceSimilarityMetric, 
+from .parallel import ParallelScorer, ProfileView
+from .metrics import (JaccardMetric, LCSMetric, SequenceSimilarityMetric, LevenshteinMetric,
                       ASTFingerprintMetric, ASTHistogramMetric)
 
 class CodeAnalyzer:
     """
     代码分析器，负责协调整个查重流程。
     """
+    DEFAULT_WEIGHTS = {
+        "逻辑顺序相似度": 0.40,
+        "序列匹配度": 0.10,
+        "编辑距离相似度": 0.10,
+        "结构指纹相似度": 0.20,
+        "词汇重合度": 0.10,
+        "语法构成相似度": 0.10
+    }
+
     def __init__(self):
         self.tokenizer = Tokenizer()
+        self.segment_finder = SegmentFinder(min_match_length=5)
         self.metrics = {
-            # "编辑距离相似度": LevenshteinMetric(),
             "逻辑顺序相似度": LCSMetric(),
             "序列匹配度": SequenceSimilarityMetric(),
+            "编辑距离相似度": LevenshteinMetric(),
             "结构指纹相似度": ASTFingerprintMetric(),
             "词汇重合度": JaccardMetric(),
             "语法构成相似度": ASTHistogramMetric()
         }
-        self.weights = {
-            "逻辑顺序相似度": 0.40,
-            "序列匹配度": 0.20,
-            "结构指纹相似度": 0.20,
-            "词汇重合度": 0.10,
-            "语法构成相似度": 0.10
-        }
+        self.weights = dict(self.DEFAULT_WEIGHTS)
+        # 以内容哈希为键的预处理结果缓存，相同内容的文件在多次分析之间复用
+        self.profile_cache: "OrderedDict[str, FileProfile]" = OrderedDict()
+        self.profile_cache_size = 2000
+        # 归一化Token数少于该值的文件视为空文件/桩文件，跳过指标计算
+        self.stub_token_threshold = 10
+        # 比较粒度："file" 为整文件两两比较，"function" 为按函数/方法建立索引后检索匹配
+        self.granularity = "file"
+        self.unit_min_tokens = 20
+        self.unit_kgram_size = 8
+        self.unit_match_threshold = 0.8
+        # 样板代码过滤：模板（起始代码）文件，以及判定为样板的 k-gram 文档频率比例。
+        # 按文档频率过滤需要显式开启（默认 None，只按模板过滤）：多数学生互相抄袭时，共有代码同样会超过比例
+        self.template_files: List[str] = []
+        self.boilerplate_max_df: Optional[float] = None
+        self.boilerplate_min_files = 20
+        self.boilerplate: Optional[BoilerplateFilter] = None
+        # 最近一次 run_analysis / run_incremental 产生的结果的分数分布统计
+        self.statistics = SessionStatistics()
+        # 待计算的代码对不少于 parallel_min_pairs 时分给 workers 个工作进程；workers 不大于 1 时串行计算
+        self.workers = os.cpu_count() or 1
+        self.parallel_min_pairs = 200
+        self._scorer: Optional[ParallelScorer] = None
 
-    def run_analysis(self, files: List[str]) -> List[ComparisonResult]:
+    def run_analysis(self, files: List[str], sources: Optional[Dict[str, bytes]] = None) -> List[ComparisonResult]:
         """
         对所有文件两两计算相似度。
+        sources 为导入阶段已读入的 {路径: 原始字节}，提供时不再重复读取磁盘。
         """
+        if self.granularity == "function":
+            return self._run_unit_analysis(files, sources)
+
         results: List[ComparisonResult] = []
+        self.statistics = SessionStatistics()
         n = len(files)
 
-        for i in range(n):
-            for j in range(i + 1, n):
-                path_a, path_b = files[i], files[j]
-
-                code_a = Path(path_a).read_text(encoding='utf-8')
-                code_b = Path(path_b).read_text(encoding='utf-8')
-
-                tokens_for_calc_a, tokens_for_highlight_a = self.tokenizer.process_source(code_a)
-                tokens_for_calc_b, tokens_for_highlight_b = self.tokenizer.process_source(code_b)
-
-                tree_a, tree_b = None, None
-                try:
-                    tree_a = ast.parse(code_a)
-                    tree_b = ast.parse(code_b)
-                except SyntaxError as e:
-                    print(f"AST解析失败，跳过AST指标计算: {e}")
-
-                current_scores = {}
-                for name, metric_calculator in self.metrics.items():
-                    score = 0.0
-                    if isinstance(metric_calculator, (ASTFingerprintMetric, ASTHistogramMetric)):
-                        score = metric_calculator.calculate(tree_a, tree_b)
-                    else:
-                        score = metric_calculator.calculate(tokens_for_calc_a, tokens_for_calc_b)
-                    current_scores[name] = score
-                
-                # 将综合分也存入分数字典
-                composite_score = 0.0
-                for name, score in current_scores.items():
-                    composite_score += score * self.weights.get(name, 0)
-                
-                current_scores["综合可疑度"] = composite_score
-
-                # 匹配应高亮的部分
-                highlight_strings_a = [tok.string for tok in tokens_for_highlight_a]
-                highlight_strings_b = [tok.string for tok in tokens_for_highlight_b]
-                
-                matcher = SequenceMatcher(None, highlight_strings_a, highlight_strings_b)
-                segments = []
-                for block in matcher.get_matching_blocks():
-                     if block.size > 0:
-                        # 现在 block.a 和 block.b 的索引可以直接用于 tokens_for_highlight 列表
-                        start_token_a = tokens_for_highlight_a[block.a]
-                        end_token_a = tokens_for_highlight_a[block.a + block.size - 1]
-                        
-                        start_token_b = tokens_for_highlight_b[block.b]
-                        end_token_b = tokens_for_highlight_b[block.b + block.size - 1]
-                        
-                        segments.append((
-                            start_token_a.start, end_token_a.end,
-                            start_token_b.start, end_token_b.end
-                        ))
-                
-                result = ComparisonResult(
-                    file_a=path_a,
-                    file_b=path_b,
-                    scores=current_scores,
-                    segments=segments,
-                    analysis_time=datetime.now()
-                )
-                results.append(result)
+        # 预处理阶段：每个文件只做一次词法分析和AST解析
+        profiles = [self.build_profile(path, (sources or {}).get(path)) for path in files]
+        self._fit_boilerplate(profiles)
+
+        # 分组阶段：内容相同或归一化Token相同的文件归为一组，空文件/桩文件不参与分组
+        groups, group_of = self._group_plan(profiles)
+        coords = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        compared = self._compare_grouped(profiles, groups, group_of, coords, {})
+
+        for (i, j), (current_scores, segments) in zip(coords, compared):
+            result = ComparisonResult(
+                file_a=files[i],
+                file_b=files[j],
+                scores=current_scores,
+                segments=segments,
+                analysis_time=datetime.now()
+            )
+            results.append(result)
+            self.statistics.add(current_scores)
 
         default_sort_key = "综合可疑度"
         results.sort(key=lambda x: x.scores.get(default_sort_key, 0), reverse=True)        
         return results
 
+    def run_incremental(self, new_files: List[str], existing_files: List[str],
+                        sources: Optional[Dict[str, bytes]] = None) -> List[ComparisonResult]:
+        """
+        增量分析：只计算涉及新增/修改文件的代码对（新文件之间、新文件与已有文件之间）。
+        已有文件的预处理结果通常直接命中缓存。
+        """
+        if self.granularity == "function":
+            return self._run_unit_analysis(list(new_files) + list(existing_files), sources,
+                                           focus=set(new_files))
+
+        sources = sources or {}
+        new_profiles = [self.build_profile(path, sources.get(path)) for path in new_files]
+        existing_profiles = [self.build_profile(path, sources.get(path)) for path in existing_files]
+        self._fit_boilerplate(new_profiles + existing_profiles)
+
+        path_pairs = []
+        profile_pairs = []
+        for idx, (path_a, profile_a) in enumerate(zip(new_files, new_profiles)):
+            others = list(zip(new_files[idx + 1:], new_profiles[idx + 1:])) + \
+                     list(zip(existing_files, existing_profiles))
+            for path_b, profile_b in others:
+                path_pairs.append((path_a, path_b))
+                profile_pairs.append((profile_a, profile_b))
+
+        results: List[ComparisonResult] = []
+        self.statistics = SessionStatistics()
+        for (path_a, path_b), (current_scores, segments) in zip(path_pairs, self._compare_pairs(profile_pairs)):
+            self.statistics.add(current_scores)
+            results.append(ComparisonResult(
+                file_a=path_a,
+                file_b=path_b,
+                scores=current_scores,
+                segments=segments,
+                analysis_time=datetime.now()
+            ))
+
+        results.sort(key=lambda x: x.scores.get("综合可疑度", 0), reverse=True)
+        return results
+
+    def _run_unit_analysis(self, files: List[str], sources: Optional[Dict[str, bytes]] = None,
+                           focus: Optional[set] = None) -> List[ComparisonResult]:
+        """
+        函数级比较：把每个文件切分为函数/方法单元并建立索引，只为存在匹配单元的文件对生成结果。
+        文件对的“函数级匹配度”取两侧被匹配单元的Token覆盖率（按相似度加权）中较大的一个，
+        因此从大文件中抄袭单个函数的情况同样会得到高分。
+        focus 非空时只保留至少涉及其中一个文件的代码对（增量分析）。
+        """
+        sources = sources or {}
+        order = {path: idx for idx, path in enumerate(files)}
+        profiles = [self.build_profile(path, sources.get(path)) for path in files]
+        self._fit_boilerplate(profiles)
+        stop_kgrams = self.boilerplate.stop_kgrams if self.boilerplate else set()
+        index = UnitIndex(match_threshold=self.unit_match_threshold, stop_kgrams=stop_kgrams)
+        unit_tokens: Dict[str, int] = {}
+        for path, profile in zip(files, profiles):
+            # 完全由样板 k-gram 组成的单元（模板中提供的函数）不参与匹配
+            units = [unit for unit in self._units_of(profile)
+                     if not (unit.kgrams and unit.kgrams <= stop_kgrams)]
+            unit_tokens[path] = sum(len(unit.tokens) for unit in units)
+            for unit in units:
+                index.add(path, unit)
+
+        pair_matches: Dict[Tuple[str, str], List[Tuple[CodeUnit, CodeUnit, float]]] = defaultdict(list)
+        for path_a, unit_a, path_b, unit_b, similarity in index.matches():
+            if focus and path_a not in focus and path_b not in focus:
+                continue
+            if order[path_a] > order[path_b]:
+                path_a, unit_a, path_b, unit_b = path_b, unit_b, path_a, unit_a
+            pair_matches[(path_a, path_b)].append((unit_a, unit_b, similarity))
+
+        results: List[ComparisonResult] = []
+        # 函数级比较只统计存在匹配单元的代码对
+        self.statistics = SessionStatistics()
+        for (path_a, path_b), matches in pair_matches.items():
+            matches.sort(key=lambda m: m[2], reverse=True)
+            # 每个单元只按其最佳匹配计入覆盖率
+            best_a: Dict[int, float] = {}
+            best_b: Dict[int, float] = {}
+            for unit_a, unit_b, similarity in matches:
+                best_a.setdefault(id(unit_a), len(unit_a.tokens) * similarity)
+                best_b.setdefault(id(unit_b), len(unit_b.tokens) * similarity)
+            score = min(1.0, max(sum(best_a.values()) / unit_tokens[path_a],
+                                 sum(best_b.values()) / unit_tokens[path_b]))
+
+            results.append(ComparisonResult(
+                file_a=path_a,
+                file_b=path_b,
+                scores={"函数级匹配度": score, "综合可疑度": score},
+                segments=[(unit_a.start, unit_a.end, unit_b.start, unit_b.end)
+                          for unit_a, unit_b, _ in matches],
+                analysis_time=datetime.now(),
+                unit_matches=[{'a': unit_a.name, 'b': unit_b.name,
+                               'lines_a': list(unit_a.lines), 'lines_b': list(unit_b.lines),
+                               'similarity': similarity}
+                              for unit_a, unit_b, similarity in matches]
+            ))
+            self.statistics.add(results[-1].scores)
+
+        results.sort(key=lambda x: x.scores.get("综合可疑度", 0), reverse=True)
+        return results
+
+    def _units_of(self, profile: FileProfile) -> List[CodeUnit]:
+        """取出（必要时切分）文件的函数级代码单元，结果随预处理缓存一起保存。"""
+        if profile.units is None:
+            profile.units = extract_units(profile, self.unit_min_tokens, self.unit_kgram_size)
+        return profile.units
+
+    def _compare_profiles(self, profile_a: FileProfile, profile_b: FileProfile) -> Tuple[Dict[str, float], List]:
+        """
+        比较单个代码对，同样走空文件与相同文件的快速路径。
+        """
+        return self._compare_pairs([(profile_a, profile_b)])[0]
+
+    def _compare_pairs(self, pairs: List[Tuple[FileProfile, FileProfile]],
+                       fast_paths: bool = True) -> List[Tuple[Dict[str, float], List]]:
+        """
+        批量比较多个代码对，返回与 pairs 一一对应的 (分数, 匹配片段)。
+        分数按第二个文件分组计算，使序列匹配器为该文件建立的索引在整列比较中复用；
+        匹配片段按第一个文件分组计算，使片段引擎为该文件建立的后缀自动机在整行比较中复用。
+        两者都不改变每个代码对的比较方向，结果与逐对计算完全一致。
+        fast_paths 为 False 时跳过空文件与相同文件的判断（调用方已经分过组），去掉样板后只剩桩代码的判断仍然保留。
+        """
+        scores: List[Optional[Dict[str, float]]] = [None] * len(pairs)
+        segments: List[Optional[List]] = [None] * len(pairs)
+        pending = []
+        for idx, (profile_a, profile_b) in enumerate(pairs):
+            if fast_paths:
+                if self._is_stub(profile_a, raw=True) or self._is_stub(profile_b, raw=True):
+                    scores[idx], segments[idx] = self._uniform_scores(0.0), []
+                    continue
+                if profile_a.content_hash == profile_b.content_hash:
+                    scores[idx] = self._uniform_scores(1.0)
+                    segments[idx] = self._whole_file_segments(profile_a, profile_b)
+                    continue
+                if profile_a.token_hash == profile_b.token_hash:
+                    # 归一化后完全相同的文件不受样板过滤影响
+                    scores[idx] = self._uniform_scores(1.0)
+            if scores[idx] is None and (self._is_stub(profile_a) or self._is_stub(profile_b)):
+                # 去掉样板后只剩桩代码
+                scores[idx], segments[idx] = self._uniform_scores(0.0), []
+                continue
+            pending.append(idx)
+
+        todo = [idx for idx in pending if scores[idx] is None]
+        if self.workers > 1 and len(todo) >= self.parallel_min_pairs:
+            for idx, metric_scores in zip(todo, self._parallel_scores([pairs[k] for k in todo])):
+                metric_scores["综合可疑度"] = self._composite_score(metric_scores)
+                scores[idx] = metric_scores
+        else:
+            for idx in sorted(todo, key=lambda k: id(pairs[k][1])):
+                scores[idx] = self._compute_scores(*pairs[idx])
+        for idx in sorted(pending, key=lambda k: id(pairs[k][0])):
+            segments[idx] = self._find_segments(*pairs[idx])
+        return list(zip(scores, segments))
+
+    def _parallel_scores(self, pairs: List[Tuple[FileProfile, FileProfile]]) -> List[Dict[str, float]]:
+        """
+        在工作进程中计算单项指标。文件数据经共享内存传递，任务只携带下标对；
+        综合可疑度和匹配片段仍在本进程中计算。
+        """
+        if self._scorer is None or self._scorer.workers != self.workers:
+            self.shutdown()
+            self._scorer = ParallelScorer(self.workers)
+        return self._scorer.score(pairs, list(self.metrics), self._metric_view)
+
+    def _metric_view(self, profile: FileProfile) -> ProfileView:
+        """单项指标实际比较的数据（已应用样板过滤），供工作进程使用。"""
+        return ProfileView(self._token_ids(profile), self._fingerprints(profile), profile.histogram, profile.has_ast)
+
+    def shutdown(self):
+        """关闭工作进程池（如果已经创建）。"""
+        if self._scorer is not None:
+            self._scorer.shutdown()
+            self._scorer = None
+
+    def _group_profiles(self, profiles: List[FileProfile]) -> List[List[int]]:
+        """
+        按原始内容哈希和归一化Token哈希对文件分组，返回按首个成员下标排序的分组列表。
+        归一化Token数少于 stub_token_threshold 的文件被视为空文件/桩文件，不属于任何分组。
+        只剩样板的文件仍然参与分组（与其相同的文件判定为完全相同），与其他组比较时按空文件处理。
+        """
+        groups: List[List[int]] = []
+        by_content: Dict[str, int] = {}
+        by_tokens: Dict[str, int] = {}
+        for idx, profile in enumerate(profiles):
+            if self._is_stub(profile, raw=True):
+                continue
+            g = by_content.get(profile.content_hash)
+            if g is None:
+                g = by_tokens.get(profile.token_hash)
+            if g is None:
+                g = len(groups)
+                groups.append([])
+            groups[g].append(idx)
+            by_content[profile.content_hash] = g
+            by_tokens[profile.token_hash] = g
+        return groups
+
+    def _group_plan(self, profiles: List[FileProfile]) -> Tuple[List[List[int]], Dict[int, int]]:
+        """分组结果以及 {文件下标: 组号}，空文件/桩文件不在其中。"""
+        groups = self._group_profiles(profiles)
+        return groups, {idx: g for g, members in enumerate(groups) for idx in members}
+
+    def _compare_grouped(self, profiles: List[FileProfile], groups: List[List[int]], group_of: Dict[int, int],
+                        coords: List[Tuple[int, int]],
+                        rep_results: Dict[Tuple[int, int], Tuple[Dict[str, float], List]]
+                        ) -> List[Tuple[Dict[str, float], List]]:
+        """
+        按分组比较 coords 中的代码对 (i, j)，返回与之一一对应的 (分数, 匹配片段)。
+        每组只取第一个文件作为代表，不同组之间只比较一次代表；代表之间的结果以 (组, 组) 为键
+        缓存在 rep_results 中，分批调用（如按块调度）时跨批次复用。
+        """
+        missing = set()
+        for i, j in coords:
+            g, h = group_of.get(i), group_of.get(j)
+            if g is not None and h is not None and g != h:
+                key = (g, h) if g < h else (h, g)
+                if key not in rep_results:
+                    missing.add(key)
+        rep_keys = sorted(missing)
+        rep_pairs = [(profiles[groups[g][0]], profiles[groups[h][0]]) for g, h in rep_keys]
+        rep_results.update(zip(rep_keys, self._compare_pairs(rep_pairs, fast_paths=False)))
+
+        compared = []
+        for i, j in coords:
+            profile_a, profile_b = profiles[i], profiles[j]
+            if i not in group_of or j not in group_of:
+                # 空文件或桩文件：不计算任何指标
+                current_scores = self._uniform_scores(0.0)
+                segments = []
+            elif group_of[i] == group_of[j]:
+                # 同组文件：直接判定为完全相同
+                current_scores = self._uniform_scores(1.0)
+                if profile_a.content_hash == profile_b.content_hash:
+                    segments = self._whole_file_segments(profile_a, profile_b)
+                else:
+                    segments = self._find_segments(profile_a, profile_b)
+            else:
+                # 不同组文件：复用两组代表之间的比较结果
+                g, h = group_of[i], group_of[j]
+                key = (g, h) if g < h else (h, g)
+                rep_scores, rep_segments = rep_results[key]
+                rep_a, rep_b = profiles[groups[key[0]][0]], profiles[groups[key[1]][0]]
+                if g > h:
+                    rep_a, rep_b = rep_b, rep_a
+                    rep_segments = [(a_start, a_end, b_start, b_end)
+                                    for b_start, b_end, a_start, a_end in rep_segments]
+
+                current_scores = dict(rep_scores)
+                # 仅当两侧都与代表文件字节相同时，高亮位置才可以直接复用
+                if profile_a.content_hash == rep_a.content_hash and \
+                   profile_b.content_hash == rep_b.content_hash:
+                    segments = list(rep_segments)
+                else:
+                    segments = self._find_segments(profile_a, profile_b)
+            compared.append((current_scores, segments))
+        return compared
+
+    def _compute_scores(self, profile_a: FileProfile, profile_b: FileProfile) -> Dict[str, float]:
+        """
+        计算两个文件的全部单项指标以及综合可疑度。
+        """
+        current_scores = self._metric_scores(profile_a, profile_b)
+        # 将综合分也存入分数字典
+        current_scores["综合可疑度"] = self._composite_score(current_scores)
+        return current_scores
+
+    def _metric_scores(self, profile_a: FileProfile, profile_b: FileProfile) -> Dict[str, float]:
+        """
+        计算两个文件的全部单项指标（不含综合可疑度）。
+        只用到整数Token序列、结构指纹和语法直方图，工作进程中的只读视图同样适用。
+        """
+        current_scores = {}
+        # Token类指标统一比较驻留后的整数序列，与比较字符串的结果相同但更快
+        ids_a, ids_b = self._token_ids(profile_a), self._token_ids(profile_b)
+        has_ast = profile_a.has_ast and profile_b.has_ast
+        for name, metric_calculator in self.metrics.items():
+            score = 0.0
+            if isinstance(metric_calculator, ASTFingerprintMetric):
+                # 子树哈希和直方图在预处理阶段已经算好，这里只做集合/向量运算
+                if has_ast:
+                    score = metric_calculator.calculate(self._fingerprints(profile_a), self._fingerprints(profile_b))
+            elif isinstance(metric_calculator, ASTHistogramMetric):
+                if has_ast:
+                    score = metric_calculator.calculate(profile_a.histogram, profile_b.histogram)
+            else:
+                score = metric_calculator.calculate(ids_a, ids_b)
+            current_scores[name] = score
+        return current_scores
+
+    def _token_ids(self, profile: FileProfile) -> List[int]:
+        """指标比较的整数Token序列；启用样板过滤时去掉样板部分。"""
+        if profile.token_ids is None:
+            profile.token_ids = self.tokenizer.intern(profile.tokens_for_calc)
+        if self.boilerplate is not None:
+            return self.boilerplate.token_ids(profile, profile.token_ids)
+        return profile.token_ids
+
+    def _fingerprints(self, profile: FileProfile) -> frozenset:
+        if self.boilerplate is not None:
+            return self.boilerplate.fingerprints(profile)
+        return profile.fingerprints
+
+    def _is_stub(self, profile: FileProfile, raw: bool = False) -> bool:
+        """空文件/桩文件：（raw 为 False 时去掉样板后）剩余的归一化Token数少于 stub_token_threshold。"""
+        if raw:
+            return len(profile.tokens_for_calc) < self.stub_token_threshold
+        return len(self._token_ids(profile)) < self.stub_token_threshold
+
+    def _fit_boilerplate(self, profiles: List[FileProfile]):
+        """按本次分析的语料与模板文件重新建立样板过滤器。"""
+        boilerplate = self.new_boilerplate_filter()
+        if boilerplate is not None:
+            for profile in profiles:
+                boilerplate.observe(profile)
+            boilerplate.finish()
+        self.use_boilerplate(boilerplate)
+
+    def new_boilerplate_filter(self) -> Optional[BoilerplateFilter]:
+        """按当前设置创建（尚未统计语料的）样板过滤器，模板文件已登记；未启用过滤时返回 None。"""
+        if not self.template_files and self.boilerplate_max_df is None:
+            return None
+        boilerplate = BoilerplateFilter(self.unit_kgram_size, self.boilerplate_max_df, self.boilerplate_min_files)
+        for path in self.template_files:
+            boilerplate.add_template(self.build_profile(path))
+        return boilerplate
+
+    def boilerplate_settings(self) -> Optional[Dict]:
+        """样板过滤的设置（模板按内容哈希记录），检查点据此判断已完成的块是否仍然有效。"""
+        if not self.template_files and self.boilerplate_max_df is None:
+            return None
+        return {
+            'templates': sorted(self.build_profile(path).content_hash for path in self.template_files),
+            'kgram_size': self.unit_kgram_size,
+            'max_df': self.boilerplate_max_df,
+            'min_files': self.boilerplate_min_files
+        }
+
+    def use_boilerplate(self, boilerplate: Optional[BoilerplateFilter]):
+        """启用一个已完成统计的样板过滤器（没有任何停用项时等同于不过滤）。"""
+        self.boilerplate = boilerplate if boilerplate is not None and boilerplate.active else None
+        self.segment_finder.set_boilerplate(self.boilerplate)
+
+    def _composite_score(self, scores: Dict[str, float]) -> float:
+        """按权重计算综合可疑度。"""
+        composite_score = 0.0
+        for name, score in scores.items():
+            composite_score += score * self.weights.get(name, 0)
+        return composite_score
+
+    def _uniform_scores(self, value: float) -> Dict[str, float]:
+        """所有单项指标取同一值时的分数字典（用于相同文件和空文件的快速路径）。"""
+        scores = {name: value for name in self.metrics}
+        scores["综合可疑度"] = self._composite_score(scores)
+        return scores
+
+    def _find_segments(self, profile_a: FileProfile, profile_b: FileProfile) -> List[Tuple]:
+        """
+        匹配应高亮的部分，返回 (A起点, A终点, B起点, B终点) 坐标列表。
+        """
+        return self.segment_finder.find_segments(profile_a, profile_b)
+
+    def _whole_file_segments(self, profile_a: FileProfile, profile_b: FileProfile) -> List[Tuple]:
+        """字节完全相同的两个文件：整份文件作为一个高亮片段。"""
+        tokens_a, tokens_b = profile_a.tokens_for_highlight, profile_b.tokens_for_highlight
+        if not tokens_a or not tokens_b:
+            return []
+        return [(tokens_a[0].start, tokens_a[-1].end, tokens_b[0].start, tokens_b[-1].end)]
+
+    def build_profile(self, path: str, source: Optional[bytes] = None) -> FileProfile:
+        """
+        为单个文件构建预处理结果。source 为空时从磁盘读取。
+        内容相同的文件直接复用缓存中的结果（即文件注册表中的 profile_key）。
+        """
+        if source is None:
+            source = Path(path).read_bytes()
+        content_hash = hashlib.sha1(source).hexdigest()
+        profile = self.profile_cache.get(content_hash)
+        if profile is not None:
+            self.profile_cache.move_to_end(content_hash)
+            return profile
+
+        profile = build_profile(self.tokenizer, path, source)
+        self.profile_cache[content_hash] = profile
+        if len(self.profile_cache) > self.profile_cache_size:
+            self.profile_cache.popitem(last=False)
+        return profile
+
+    def structure_index(self, files: List[str], sources: Optional[Dict[str, bytes]] = None) -> SubtreeIndex:
+        """为一组文件建立子树结构哈希的倒排索引（预处理结果优先取自缓存）。"""
+        sources = sources or {}
+        index = SubtreeIndex()
+        for path in files:
+            profile = self.build_profile(path, sources.get(path))
+            # 样板结构不进入索引，倒排表因此保持简短
+            index.add(path, self.boilerplate.subtrees(profile) if self.boilerplate else profile.subtrees)
+        return index
+
     def _create_token_map(self, highlight_tokens: List[tokenize.TokenInfo]) -> List[int]:
         """
         创建一个从计算Token索引到高亮Token索引的映射。
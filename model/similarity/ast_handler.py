@@ -1,39 +1,65 @@
 # model/similarity/ast_handler.py
 
 import ast
-import hashlib
 from collections import Counter
-from typing import Set, Dict
+from hashlib import blake2b
+from typing import Dict, List, NamedTuple, Set
 
-class FingerprintVisitor(ast.NodeVisitor):
+class SubtreeHash(NamedTuple):
+    """一棵非平凡子树的结构哈希、节点数及所在行范围。"""
+    digest: bytes
+    size: int
+    first_line: int
+    last_line: int
+
+# 非平凡子树的最少节点数：更小的子树（如 `x = y + 1`）在任意两份代码中都很常见，不作为结构指纹
+MIN_SUBTREE_SIZE = 10
+
+def _node_label(node: ast.AST) -> bytes:
     """
-    遍历AST，为关键结构节点生成“指纹”。
+    节点自身的标签：只取节点类型，标识符（变量名、函数名、属性名等）全部忽略；
+    常量只保留其类型，不保留具体取值。
     """
-    def __init__(self):
-        self.fingerprints: Set[str] = set()
-        # 我们关心的结构性节点
-        self.target_nodes = (
-            ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
-            ast.For, ast.While, ast.If, ast.With, ast.Try
-        )
+    if isinstance(node, ast.Constant):
+        return f"Constant:{type(node.value).__name__}".encode('utf-8')
+    return type(node).__name__.encode('utf-8')
 
-    def generic_visit(self, node: ast.AST):
-        # 只处理我们关心的目标节点
-        if isinstance(node, self.target_nodes):
-            # 规范化节点类型名称，例如 'FunctionDef' -> 'function'
-            node_type = type(node).__name__.lower().replace('def', '')
-            
-            # 创建一个简单的结构表示
-            # 例如 "function:if:for" 表示一个函数里有一个if和一个for
-            # 这是一个简化的指纹，更复杂的可以包含子节点数量等
-            structure_str = node_type
-            
-            # 生成哈希指纹
-            hasher = hashlib.md5()
-            hasher.update(structure_str.encode('utf-8'))
-            self.fingerprints.add(hasher.hexdigest())
+def subtree_hashes(tree: ast.AST, min_size: int = MIN_SUBTREE_SIZE) -> List[SubtreeHash]:
+    """
+    自底向上（Merkle 式）计算每棵子树的结构哈希：子树哈希 = H(节点标签, 各子节点哈希)。
+    结构相同、仅标识符或常量取值不同的子树得到相同的哈希。
+    只返回节点数不少于 min_size 且带行号（语句或表达式）的子树。
+    哈希使用 blake2b，跨进程稳定，可以随预处理结果一起保存。
+    """
+    hashes: List[SubtreeHash] = []
+    # 栈帧：[节点, 子节点列表, 下一个待处理子节点的下标, 哈希器, 节点数]。
+    # 子节点的结果直接累加到父节点自己的栈帧里；不能按 id(节点) 暂存，
+    # 因为 ast.Sub、ast.And 等运算符节点在 CPython 中是共享的单例。
+    def frame(node):
+        children = [child for child in ast.iter_child_nodes(node)
+                    if not isinstance(child, ast.expr_context)]
+        return [node, children, 0, blake2b(_node_label(node), digest_size=8), 1]
 
-        super().generic_visit(node)
+    stack = [frame(tree)]
+    while stack:
+        top = stack[-1]
+        node, children, index = top[0], top[1], top[2]
+        if index < len(children):
+            top[2] += 1
+            stack.append(frame(children[index]))
+            continue
+
+        stack.pop()
+        digest, size = top[3].digest(), top[4]
+        if stack:
+            parent = stack[-1]
+            parent[3].update(digest)
+            parent[4] += size
+
+        if size >= min_size and hasattr(node, 'lineno'):
+            hashes.append(SubtreeHash(digest, size, node.lineno,
+                                      getattr(node, 'end_lineno', None) or node.lineno))
+    return hashes
 
 class HistogramVisitor(ast.NodeVisitor):
     """
@@ -48,11 +74,9 @@ class HistogramVisitor(ast.NodeVisitor):
         self.histogram[node_type] += 1
         super().generic_visit(node)
 
-def get_ast_fingerprints(tree: ast.AST) -> Set[str]:
-    """辅助函数：获取AST的结构指纹集合。"""
-    visitor = FingerprintVisitor()
-    visitor.visit(tree)
-    return visitor.fingerprints
+def get_ast_fingerprints(tree: ast.AST) -> Set[bytes]:
+    """辅助函数：获取AST中非平凡子树的结构哈希集合。"""
+    return {subtree.digest for subtree in subtree_hashes(tree)}
 
 def get_ast_histogram(tree: ast.AST) -> Dict[str, int]:
     """辅助函数：获取AST的节点类型直方图。"""
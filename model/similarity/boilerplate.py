@@ -0,0 +1,128 @@
+# model/similarity/boilerplate.py
+
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Set
+
+from .ast_handler import SubtreeHash
+from .profile import FileProfile
+from .units import _CALC_EXCLUDED
+
+class BoilerplateFilter:
+    """
+    语料级的样板代码过滤。
+    以归一化Token的 k-gram 为单位统计文档频率：模板（起始代码）文件中的全部 k-gram，
+    以及出现在超过 max_df 比例文件中的 k-gram 构成停用表；结构哈希按同样规则得到停用集合。
+    被停用 k-gram 覆盖的Token不再参与Token类指标和匹配片段，停用的子树不再计入结构指纹与索引。
+    k-gram 的哈希方式与函数级单元（CodeUnit.kgrams）相同，函数级索引可直接使用同一张停用表。
+    """
+    def __init__(self, kgram_size: int = 8, max_df: Optional[float] = 0.5, min_files: int = 5):
+        self.kgram_size = kgram_size
+        # 文档频率超过该比例的 k-gram 视为样板；为 None 时只按模板文件过滤
+        self.max_df = max_df
+        # 语料中的不同文件数少于该值时不按文档频率过滤（样本太少，频率没有意义）
+        self.min_files = min_files
+        self.stop_kgrams: Set[int] = set()
+        self.stop_digests: Set[bytes] = set()
+        self._kgram_df: Counter = Counter()
+        self._digest_df: Counter = Counter()
+        self._seen: Set[str] = set()
+        # 以内容哈希为键的派生结果缓存，保证同一文件每次拿到的是同一个序列对象
+        self._masks: Dict[str, bytearray] = {}
+        self._token_ids: Dict[str, List[int]] = {}
+        self._highlight_ids: Dict[str, List[int]] = {}
+        self._fingerprints: Dict[str, FrozenSet[bytes]] = {}
+        self._next_blank = 0
+
+    def _kgrams(self, tokens: List[str]) -> List[int]:
+        k = self.kgram_size
+        return [hash(tuple(tokens[i:i + k])) for i in range(len(tokens) - k + 1)]
+
+    def add_template(self, profile: FileProfile):
+        """登记一个模板文件：其中的全部 k-gram 和子树结构直接进入停用表。"""
+        self.stop_kgrams.update(self._kgrams(profile.tokens_for_calc))
+        self.stop_digests.update(profile.fingerprints)
+
+    def observe(self, profile: FileProfile):
+        """统计一个语料文件的 k-gram 与子树结构（内容相同的文件只计一次）。"""
+        if profile.content_hash in self._seen:
+            return
+        self._seen.add(profile.content_hash)
+        self._kgram_df.update(set(self._kgrams(profile.tokens_for_calc)))
+        self._digest_df.update(profile.fingerprints)
+
+    def finish(self) -> "BoilerplateFilter":
+        """根据已统计的文档频率补充停用表，并释放计数。"""
+        documents = len(self._seen)
+        if self.max_df is not None and documents >= self.min_files:
+            limit = max(1, int(self.max_df * documents))
+            self.stop_kgrams.update(kgram for kgram, df in self._kgram_df.items() if df > limit)
+            self.stop_digests.update(digest for digest, df in self._digest_df.items() if df > limit)
+        self._kgram_df = Counter()
+        self._digest_df = Counter()
+        return self
+
+    @property
+    def active(self) -> bool:
+        return bool(self.stop_kgrams or self.stop_digests)
+
+    def mask(self, profile: FileProfile) -> bytearray:
+        """计算Token序列中被停用 k-gram 覆盖的位置（1 表示样板）。"""
+        mask = self._masks.get(profile.content_hash)
+        if mask is None:
+            k = self.kgram_size
+            mask = bytearray(len(profile.tokens_for_calc))
+            for i, kgram in enumerate(self._kgrams(profile.tokens_for_calc)):
+                if kgram in self.stop_kgrams:
+                    mask[i:i + k] = b'\x01' * k
+            self._masks[profile.content_hash] = mask
+        return mask
+
+    def token_ids(self, profile: FileProfile, ids: List[int]) -> List[int]:
+        """去掉样板部分后的整数Token序列（ids 与计算Token一一对应）。"""
+        stripped = self._token_ids.get(profile.content_hash)
+        if stripped is None:
+            mask = self.mask(profile)
+            stripped = [token_id for token_id, boilerplate in zip(ids, mask) if not boilerplate]
+            self._token_ids[profile.content_hash] = stripped
+        return stripped
+
+    def highlight_ids(self, profile: FileProfile, ids: List[int]) -> List[int]:
+        """
+        把高亮Token序列中的样板部分替换为互不相同的负数ID，使匹配片段引擎不会在模板代码上铺设瓦片。
+        注释、字符串等不参与计算的Token，前后的计算Token都属于样板时同样视为样板。
+        """
+        blanked = self._highlight_ids.get(profile.content_hash)
+        if blanked is None:
+            mask = self.mask(profile)
+            tokens = profile.tokens_for_highlight
+            calc_index = []
+            count = 0
+            for tok in tokens:
+                calc_index.append(count)
+                if tok.type not in _CALC_EXCLUDED:
+                    count += 1
+            blanked = list(ids)
+            if count == len(mask):
+                for h, tok in enumerate(tokens):
+                    c = calc_index[h]
+                    if tok.type not in _CALC_EXCLUDED:
+                        boilerplate = mask[c]
+                    else:
+                        boilerplate = 0 < c < len(mask) and mask[c - 1] and mask[c]
+                    if boilerplate:
+                        self._next_blank -= 1
+                        blanked[h] = self._next_blank
+            self._highlight_ids[profile.content_hash] = blanked
+        return blanked
+
+    def fingerprints(self, profile: FileProfile) -> FrozenSet[bytes]:
+        """去掉停用结构后的结构指纹。"""
+        fingerprints = self._fingerprints.get(profile.content_hash)
+        if fingerprints is None:
+            fingerprints = profile.fingerprints - self.stop_digests
+            self._fingerprints[profile.content_hash] = fingerprints
+        return fingerprints
+
+    def subtrees(self, profile: FileProfile) -> List[SubtreeHash]:
+        """去掉停用结构后的子树列表（用于结构克隆索引）。"""
+        return [subtree for subtree in profile.subtrees if subtree.digest not in self.stop_digests]
@@ -0,0 +1,64 @@
+# model/similarity/clones.py
+
+from collections import defaultdict
+from itertools import combinations
+from typing import Dict, Iterator, List, Tuple
+
+from .ast_handler import SubtreeHash
+
+class SubtreeIndex:
+    """
+    子树哈希的倒排索引：结构哈希 -> {文件路径: 该文件中的子树}。
+    语料中共享的非平凡子树（结构克隆）通过一次查表即可找到，不需要两两求集合交集。
+    """
+    def __init__(self, max_postings: int = 64):
+        # 出现在过多文件中的子树（常见写法）不参与文件对的统计
+        self.max_postings = max_postings
+        self._postings: Dict[bytes, Dict[str, SubtreeHash]] = defaultdict(dict)
+        self._subtrees: Dict[str, List[SubtreeHash]] = {}
+
+    def add(self, path: str, subtrees: List[SubtreeHash]):
+        """登记一个文件的全部非平凡子树；同一文件中重复出现的结构只记录最先出现的一处。"""
+        self._subtrees[path] = subtrees
+        for subtree in subtrees:
+            self._postings[subtree.digest].setdefault(path, subtree)
+
+    def files_with(self, digest: bytes) -> Dict[str, SubtreeHash]:
+        """包含某个结构的全部文件。"""
+        return self._postings.get(digest, {})
+
+    def clone_classes(self, min_files: int = 2) -> Iterator[Tuple[bytes, Dict[str, SubtreeHash]]]:
+        """产出至少出现在 min_files 个文件中的结构，及其在各文件中的位置。"""
+        for digest, files in self._postings.items():
+            if len(files) >= min_files:
+                yield digest, files
+
+    def shared_counts(self) -> Dict[Tuple[str, str], int]:
+        """
+        每个文件对共享的不同结构数，只统计出现在不超过 max_postings 个文件中的结构。
+        """
+        counts: Dict[Tuple[str, str], int] = defaultdict(int)
+        for files in self._postings.values():
+            if 2 <= len(files) <= self.max_postings:
+                for pair in combinations(sorted(files), 2):
+                    counts[pair] += 1
+        return counts
+
+    def clones_between(self, path_a: str, path_b: str) -> List[Tuple[SubtreeHash, SubtreeHash]]:
+        """
+        两个文件共享的极大子树（不被同一文件中另一个共享子树包含），按规模降序排列。
+        """
+        shared = []
+        for subtree in self._subtrees.get(path_a, []):
+            other = self._postings[subtree.digest].get(path_b)
+            if other is not None:
+                shared.append((subtree, other))
+        shared.sort(key=lambda pair: pair[0].size, reverse=True)
+
+        maximal: List[Tuple[SubtreeHash, SubtreeHash]] = []
+        for subtree_a, subtree_b in shared:
+            contained = any(kept_a.first_line <= subtree_a.first_line and subtree_a.last_line <= kept_a.last_line
+                            for kept_a, _ in maximal)
+            if not contained:
+                maximal.append((subtree_a, subtree_b))
+        return maximal
@@ -1,7 +1,7 @@
 # model/similarity/metrics.py
 
 from difflib import SequenceMatcher
-from typing import List, Dict, Set
+from typing import AbstractSet, List, Dict, Set, Sequence, Optional, Union
 import ast
 import math
 from .ast_handler import get_ast_fingerprints, get_ast_histogram
@@ -55,18 +55,100 @@ class SequenceSimilarityMetric:
     """
     计算序列相似度。
     这与编辑距离相似，衡量的是整体内容的接近程度。
+    SequenceMatcher 会为第二个序列建立 b2j 索引；这里复用同一个匹配器，
+    连续比较同一个 tokens_b 时索引只建立一次（调用方应按第二个文件分组调度）。
     """
+    def __init__(self):
+        self._matcher = SequenceMatcher(None)
+
     def calculate(self, tokens_a: List[str], tokens_b: List[str]) -> float:
         """
         使用SequenceMatcher的ratio()方法计算相似度。
         """
-        matcher = SequenceMatcher(None, tokens_a, tokens_b)
-        return matcher.ratio()
+        # set_seq2 遇到同一个序列对象时直接返回，不会重建索引
+        self._matcher.set_seqs(tokens_a, tokens_b)
+        return self._matcher.ratio()
     
-# Levenshtein开销大，效果和SequenceMatcher重合，暂时不要了
+def myers_distance(seq_a: Sequence, seq_b: Sequence, peq: Optional[Dict] = None,
+                   max_distance: Optional[int] = None) -> int:
+    """
+    Myers/Hyyrö 位并行算法计算两个序列的编辑距离，时间复杂度 O(len(a) * len(b) / 字长)。
+    seq_b 的每个符号对应一个位置掩码（peq，可由调用方缓存复用），逐个扫描 seq_a 的符号。
+    提供 max_distance 时采用 Ukkonen 式截断：一旦确定距离必然超过该值，立即返回 max_distance + 1。
+    """
+    m, n = len(seq_b), len(seq_a)
+    # 距离至少为长度差
+    if max_distance is not None and abs(m - n) > max_distance:
+        return max_distance + 1
+    if m == 0 or n == 0:
+        return max(m, n)
+    if peq is None:
+        peq = build_peq(seq_b)
+
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv = full, 0
+    score = m
+    remaining = n
+    for symbol in seq_a:
+        eq = peq.get(symbol, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+        remaining -= 1
+        # 剩余每一步最多让距离减少 1
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+    if max_distance is not None and score > max_distance:
+        return max_distance + 1
+    return score
+
+def build_peq(seq: Sequence) -> Dict:
+    """为序列中的每个符号建立位置掩码：第 i 位为 1 表示 seq[i] 是该符号。"""
+    peq: Dict = {}
+    for i, symbol in enumerate(seq):
+        peq[symbol] = peq.get(symbol, 0) | (1 << i)
+    return peq
+
 class LevenshteinMetric:
     """
     计算经典的编辑距离（Levenshtein Distance）并转换为相似度比率。
+    使用位并行算法，并缓存最近一次第二个序列的位置掩码：按第二个文件分组调度时，每个文件只建立一次掩码。
+    """
+    def __init__(self):
+        self._peq_source = None
+        self._peq: Dict = {}
+
+    def calculate(self, tokens_a: Sequence, tokens_b: Sequence) -> float:
+        """
+        计算两组Token的Levenshtein相似度比率。
+        """
+        len_a, len_b = len(tokens_a), len(tokens_b)
+        if len_a == 0 or len_b == 0:
+            return 0.0 if len_a != len_b else 1.0
+
+        if self._peq_source is not tokens_b:
+            self._peq = build_peq(tokens_b)
+            self._peq_source = tokens_b
+        distance = myers_distance(tokens_a, tokens_b, self._peq)
+        return 1.0 - (distance / max(len_a, len_b))
+
+    def is_within(self, tokens_a: Sequence, tokens_b: Sequence, max_distance: int) -> bool:
+        """只需判断编辑距离是否不超过 max_distance 时使用，可提前截断。"""
+        return myers_distance(tokens_a, tokens_b, max_distance=max_distance) <= max_distance
+
+class DPLevenshteinMetric:
+    """
+    完整动态规划表实现的编辑距离（旧实现），保留作为位并行实现的正确性参照。
     """
     def calculate(self, tokens_a: List[str], tokens_b: List[str]) -> float:
         """
@@ -110,21 +192,33 @@ class LevenshteinMetric:
 # --- AST-based Metrics (新增) ---
 
 class ASTFingerprintMetric:
-    """计算结构指纹的Jaccard相似度。"""
-    def calculate(self, tree_a: ast.AST, tree_b: ast.AST) -> float:
-        fingerprints_a = get_ast_fingerprints(tree_a)
-        fingerprints_b = get_ast_fingerprints(tree_b)
-        
+    """
+    计算结构指纹的Jaccard相似度。
+    指纹为非平凡子树的 Merkle 哈希（见 ast_handler.subtree_hashes），每个文件只在预处理时计算一次，
+    这里直接比较两个哈希集合；也可以传入AST，此时临时计算。
+    """
+    def calculate(self, fingerprints_a: Union[AbstractSet[bytes], ast.AST],
+                  fingerprints_b: Union[AbstractSet[bytes], ast.AST]) -> float:
+        if isinstance(fingerprints_a, ast.AST):
+            fingerprints_a = get_ast_fingerprints(fingerprints_a)
+        if isinstance(fingerprints_b, ast.AST):
+            fingerprints_b = get_ast_fingerprints(fingerprints_b)
+
         intersection = fingerprints_a.intersection(fingerprints_b)
         union = fingerprints_a.union(fingerprints_b)
 
         return len(intersection) / len(union) if union else 1.0
 
 class ASTHistogramMetric:
-    """计算节点直方图的余弦相似度。"""
-    def calculate(self, tree_a: ast.AST, tree_b: ast.AST) -> float:
-        hist_a = get_ast_histogram(tree_a)
-        hist_b = get_ast_histogram(tree_b)
+    """
+    计算节点直方图的余弦相似度。
+    直方图每个文件只在预处理时统计一次，这里直接比较；也可以传入AST，此时临时统计。
+    """
+    def calculate(self, hist_a: Union[Dict[str, int], ast.AST], hist_b: Union[Dict[str, int], ast.AST]) -> float:
+        if isinstance(hist_a, ast.AST):
+            hist_a = get_ast_histogram(hist_a)
+        if isinstance(hist_b, ast.AST):
+            hist_b = get_ast_histogram(hist_b)
 
         # 构建两个向量的点积和模长
         all_keys = set(hist_a.keys()).union(set(hist_b.keys()))
@@ -0,0 +1,243 @@
+# model/similarity/parallel.py
+
+import atexit
+import json
+import multiprocessing
+import struct
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .profile import FileProfile
+
+# 共享内存段开头的 8 字节保存布局描述（JSON）的长度
+_HEADER = struct.Struct('<Q')
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+class SharedProfileTable:
+    """
+    把一批文件的比较数据排布到同一个共享内存段中，供工作进程以只读方式挂载：
+    - 驻留后的整数Token序列 (tokens) 及每个文件的起止偏移 (token_offsets)；
+    - 结构指纹，8 字节子树哈希按 uint64 存放 (fingerprints / fp_offsets)；
+    - 语法直方图矩阵 (histograms)，每个文件一行，列为全部出现过的节点类型；
+    - AST 是否解析成功 (has_ast)。
+    段首保存各数组的位置和节点类型名，工作进程只凭段名即可挂载，任务只需携带文件下标对。
+    写入的是主进程准备好的 ProfileView（例如已去掉样板代码的Token序列与指纹）。
+    """
+    def __init__(self, profiles: List["ProfileView"]):
+        node_types: Dict[str, int] = {}
+        for profile in profiles:
+            for node_type in profile.histogram:
+                node_types.setdefault(node_type, len(node_types))
+
+        token_offsets = array('q', [0])
+        tokens = array('i')
+        fp_offsets = array('q', [0])
+        fingerprints = array('Q')
+        histograms = array('I', bytes(4 * len(profiles) * len(node_types)))
+        has_ast = array('b')
+        for row, profile in enumerate(profiles):
+            tokens.extend(profile.token_ids)
+            token_offsets.append(len(tokens))
+            fingerprints.extend(int.from_bytes(digest, 'little') for digest in profile.fingerprints)
+            fp_offsets.append(len(fingerprints))
+            base = row * len(node_types)
+            for node_type, count in profile.histogram.items():
+                histograms[base + node_types[node_type]] = count
+            has_ast.append(1 if profile.has_ast else 0)
+
+        sections = {"token_offsets": token_offsets, "tokens": tokens, "fp_offsets": fp_offsets,
+                    "fingerprints": fingerprints, "histograms": histograms, "has_ast": has_ast}
+        # 各数组的偏移相对于头部之后的数据区起点
+        layout = {"count": len(profiles), "node_types": list(node_types), "sections": {}}
+        offset = 0
+        for name, data in sections.items():
+            layout["sections"][name] = [data.typecode, offset, len(data)]
+            offset = _align(offset + len(data) * data.itemsize)
+        header = json.dumps(layout).encode('utf-8')
+        data_start = _align(_HEADER.size + len(header))
+
+        self.layout = layout
+        self.shm = shared_memory.SharedMemory(create=True, size=data_start + offset)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        _HEADER.pack_into(buf, 0, len(header))
+        buf[_HEADER.size:_HEADER.size + len(header)] = header
+        for name, data in sections.items():
+            start = data_start + layout["sections"][name][1]
+            raw = data.tobytes()
+            buf[start:start + len(raw)] = raw
+
+    def close(self):
+        """关闭并删除共享内存段。工作进程只挂载、从不删除，段的生命周期由创建方负责。"""
+        self.shm.close()
+        self.shm.unlink()
+
+class ProfileView:
+    """
+    只包含计算单项指标所需字段（与 FileProfile 同名）的文件视图：
+    主进程用它描述要写入共享内存的数据，工作进程从共享内存中读出同样的视图。
+    """
+    __slots__ = ("token_ids", "fingerprints", "histogram", "has_ast")
+
+    def __init__(self, token_ids: List[int], fingerprints: frozenset, histogram: Dict[str, int], has_ast: bool):
+        self.token_ids = token_ids
+        self.fingerprints = fingerprints
+        self.histogram = histogram
+        self.has_ast = has_ast
+
+class SharedProfileReader:
+    """
+    挂载 SharedProfileTable 创建的共享内存段，按下标取出 ProfileView。
+    最近使用的视图保存在一个小的 LRU 中：任务按第二个文件排好序，
+    同一列比较反复使用同一个视图对象，指标中按对象复用的索引因此继续生效。
+    """
+    def __init__(self, name: str, cache_size: int = 256):
+        self.shm = shared_memory.SharedMemory(name=name)
+        buf = self.shm.buf
+        (header_size,) = _HEADER.unpack_from(buf, 0)
+        layout = json.loads(bytes(buf[_HEADER.size:_HEADER.size + header_size]).decode('utf-8'))
+        data_start = _align(_HEADER.size + header_size)
+        self.node_types: List[str] = layout["node_types"]
+        self._sections = {}
+        for section, (typecode, offset, length) in layout["sections"].items():
+            start = data_start + offset
+            self._sections[section] = buf[start:start + length * array(typecode).itemsize].cast(typecode)
+        self._views: "OrderedDict[int, ProfileView]" = OrderedDict()
+        self.cache_size = cache_size
+
+    def view(self, idx: int) -> ProfileView:
+        view = self._views.get(idx)
+        if view is not None:
+            self._views.move_to_end(idx)
+            return view
+
+        s = self._sections
+        token_ids = s["tokens"][s["token_offsets"][idx]:s["token_offsets"][idx + 1]].tolist()
+        fingerprints = frozenset(s["fingerprints"][s["fp_offsets"][idx]:s["fp_offsets"][idx + 1]].tolist())
+        width = len(self.node_types)
+        row = s["histograms"][idx * width:(idx + 1) * width].tolist()
+        histogram = {node_type: count for node_type, count in zip(self.node_types, row) if count}
+        view = ProfileView(token_ids, fingerprints, histogram, bool(s["has_ast"][idx]))
+
+        self._views[idx] = view
+        if len(self._views) > self.cache_size:
+            self._views.popitem(last=False)
+        return view
+
+    def close(self):
+        # 先释放对共享内存的全部引用，否则 close 会因仍有导出的缓冲区而失败
+        self._views.clear()
+        for section in self._sections.values():
+            section.release()
+        self._sections.clear()
+        self.shm.close()
+
+# ---- 工作进程 ----
+
+_worker_analyzer = None
+_worker_reader: Optional[SharedProfileReader] = None
+
+def _attach(name: str) -> SharedProfileReader:
+    """挂载指定的共享内存段；换成新的段时关闭上一个。"""
+    global _worker_reader
+    if _worker_reader is None or _worker_reader.shm.name != name:
+        if _worker_reader is None:
+            atexit.register(_detach)
+        else:
+            _worker_reader.close()
+        _worker_reader = SharedProfileReader(name)
+    return _worker_reader
+
+def _detach():
+    global _worker_reader
+    if _worker_reader is not None:
+        _worker_reader.close()
+        _worker_reader = None
+
+def _score_chunk(table_name: str, metric_names: List[str], pair_bytes: bytes) -> bytes:
+    """
+    计算一批代码对的单项指标。pair_bytes 为 array('i') 形式的 (i, j) 下标对，
+    返回 array('d')，每对按 metric_names 的顺序占 len(metric_names) 个元素。
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        from .analyzer import CodeAnalyzer
+        _worker_analyzer = CodeAnalyzer()
+    reader = _attach(table_name)
+    indices = array('i')
+    indices.frombytes(pair_bytes)
+    values = array('d')
+    for k in range(0, len(indices), 2):
+        scores = _worker_analyzer._metric_scores(reader.view(indices[k]), reader.view(indices[k + 1]))
+        values.extend(scores[name] for name in metric_names)
+    return values.tobytes()
+
+# ---- 主进程 ----
+
+class ParallelScorer:
+    """
+    用进程池计算大批代码对的单项指标。
+    文件数据只经共享内存传递一次，每个任务只携带段名和一段下标对数组，结果以紧凑的浮点数组返回。
+    进程池在首次使用时创建，并在多次调用（例如分块调度的各个块）之间复用。
+    """
+    def __init__(self, workers: int, chunk_size: int = 64):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 使用 spawn 启动工作进程，避免在带有界面线程的进程中 fork
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def score(self, pairs: List[Tuple[FileProfile, FileProfile]], metric_names: List[str],
+              view_of: Callable[[FileProfile], ProfileView]) -> List[Dict[str, float]]:
+        """
+        返回与 pairs 一一对应的单项指标字典。view_of 给出每个文件写入共享内存的视图。
+        """
+        rows: Dict[int, int] = {}
+        views: List[ProfileView] = []
+        index_pairs = []
+        for profile_a, profile_b in pairs:
+            for profile in (profile_a, profile_b):
+                if id(profile) not in rows:
+                    rows[id(profile)] = len(views)
+                    views.append(view_of(profile))
+            index_pairs.append((rows[id(profile_a)], rows[id(profile_b)]))
+
+        # 按第二个文件排序后切块，使同一列的比较尽量落在同一个任务中
+        order = sorted(range(len(index_pairs)), key=lambda k: index_pairs[k][1])
+        chunk_size = max(self.chunk_size, len(order) // (self.workers * 8) or 1)
+        chunks = [order[start:start + chunk_size] for start in range(0, len(order), chunk_size)]
+
+        table = SharedProfileTable(views)
+        try:
+            futures = []
+            for chunk in chunks:
+                flat = array('i')
+                for k in chunk:
+                    flat.extend(index_pairs[k])
+                futures.append(self._pool().submit(_score_chunk, table.name, metric_names, flat.tobytes()))
+
+            width = len(metric_names)
+            scores: List[Optional[Dict[str, float]]] = [None] * len(pairs)
+            for chunk, future in zip(chunks, futures):
+                values = array('d')
+                values.frombytes(future.result())
+                for n, k in enumerate(chunk):
+                    scores[k] = dict(zip(metric_names, values[n * width:(n + 1) * width]))
+            return scores
+        finally:
+            table.close()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
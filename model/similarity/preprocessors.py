@@ -1,8 +1,10 @@
 # model/similarity/preprocessors.py
 
+import re
+import sys
 import tokenize
 from io import StringIO
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Optional
 import ast
 import keyword
 
@@ -27,20 +29,22 @@ class AstProcessor(ast.NodeVisitor):
             self.roles[node.id] = 'VAR'
         self.generic_visit(node)
 
-class Tokenizer:
+class LegacyTokenizer:
     """
-    负责将源代码字符串转换为用于高亮和计算的Token序列。
+    原始的逐Token分支实现，保留作为 Tokenizer 兼容模式输出一致性和性能对比的参照。
     """
-    def process_source(self, source_code: str) -> Tuple[List[str], List[tokenize.TokenInfo]]:
+    def process_source(self, source_code: str, tree: Optional[ast.AST] = None) -> Tuple[List[str], List[tokenize.TokenInfo]]:
         """
         处理源代码，返回一个元组：
         1. 用于计算的归一化Token字符串列表。
         2. 用于高亮的原始TokenInfo对象列表（不过滤任何东西）。
+        tree 为调用方已解析好的AST，提供时不再重复解析。
         """
         # 使用AST进行符号分析
         roles: Dict[str, str] = {}
         try:
-            tree = ast.parse(source_code)
+            if tree is None:
+                tree = ast.parse(source_code)
             visitor = AstProcessor()
             visitor.visit(tree)
             roles = visitor.roles
@@ -77,3 +81,466 @@ class Tokenizer:
             return [], []
             
         return tokens_for_calc, tokens_for_highlight
+
+
+# 预先计算的Token类型动作表（按 token.type 下标查表，代替逐Token的成员判断）
+_SKIP, _HIGHLIGHT_ONLY, _KEEP, _ROLE = 0, 1, 2, 3
+_TOKEN_ACTIONS = [_KEEP] * (max(tokenize.tok_name) + 1)
+for _type in (tokenize.ENCODING, tokenize.NL, tokenize.NEWLINE, tokenize.ENDMARKER):
+    _TOKEN_ACTIONS[_type] = _SKIP
+for _type in (tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT, tokenize.STRING):
+    _TOKEN_ACTIONS[_type] = _HIGHLIGHT_ONLY
+_TOKEN_ACTIONS[tokenize.NAME] = _ROLE
+
+# 词法分析的结果：(高亮用的TokenInfo列表, 计算Token的文本列表, NAME 在计算Token中的下标, 这些 NAME 的起始位置)
+LexedSource = Tuple[List[tokenize.TokenInfo], List[str], List[int], List[Tuple[int, int]]]
+
+class _IrregularSource(Exception):
+    """快速词法分析遇到了交给标准库处理的情况：错误Token、缩进错误、未闭合的括号或字符串等。"""
+
+# Python 3.12 起 tokenize 由C实现，Token的种类也不同（f-string 被拆成多个Token），直接使用标准库
+_FAST_LEXING = sys.version_info < (3, 12)
+if _FAST_LEXING:
+    _STRING_PREFIXES = '|'.join(sorted((re.escape(prefix) for prefix in tokenize._all_string_prefixes() if prefix),
+                                       key=len, reverse=True))
+    # tokenize 的 PseudoToken 按固定顺序尝试各分支，常见的名字要先失败一百多个分支才能匹配。
+    # 这里在原有分支之前加入几个只在它们不可能被更早的分支匹配时才生效的快捷分支，匹配结果与原表达式相同；
+    # 最后的 error 分支保证 finditer 逐个位置连续匹配，匹配到它时交给标准库处理
+    _PSEUDO_TOKEN = re.compile(
+        tokenize.Whitespace + '(?:'
+        '(?P<name>(?=[A-Za-z_])(?!(?:' + _STRING_PREFIXES + ')[\'"])\\w+)'
+        '|(?P<op>(?=[^\\w\\s\'"#\\\\.])' + tokenize.Funny + ')'
+        '|(?P<newline>\\r?\\n)'
+        '|(?P<number>(?=[0-9])' + tokenize.Number + ')'
+        '|(?P<extra>' + tokenize.PseudoExtras + ')'
+        '|(?P<other_number>' + tokenize.Number + ')'
+        '|(?P<funny>' + tokenize.Funny + ')'
+        '|(?P<contstr>' + tokenize.ContStr + ')'
+        '|(?P<other_name>' + tokenize.Name + ')'
+        '|(?P<error>.))')
+    _END_PATTERNS = {prefix: re.compile(pattern) for prefix, pattern in tokenize.endpats.items() if pattern}
+    _LEADING_WHITESPACE = re.compile(r'[ \t\f]*')
+
+def _lex_with_tokenize(source_code: str) -> LexedSource:
+    """用标准库 tokenize 做词法分析，再按动作表分类。"""
+    actions = _TOKEN_ACTIONS
+    tokens = tokenize.generate_tokens(StringIO(source_code).readline)
+    tokens_for_highlight = [token for token in tokens if actions[token[0]]]
+    calc_tokens = [token for token in tokens_for_highlight if actions[token[0]] >= _KEEP]
+    NAME = tokenize.NAME
+    names = [index for index, token in enumerate(calc_tokens) if token[0] == NAME]
+    return tokens_for_highlight, [token[1] for token in calc_tokens], names, [calc_tokens[i][2] for i in names]
+
+def _lex(source_code: str) -> LexedSource:
+    """
+    词法分析并在同一遍中完成分类，高亮列表与标准库 tokenize 生成的Token（去掉换行与结束标记）完全相同。
+    逐行用 finditer 扫描，行首缩进、续行与跨行字符串的处理与 tokenize 的实现一一对应；
+    遇到错误Token或在文件末尾仍未闭合的结构时退回标准库，由它给出同样的Token或异常。
+    """
+    if not _FAST_LEXING:
+        return _lex_with_tokenize(source_code)
+    try:
+        return _lex_fast(source_code)
+    except _IrregularSource:
+        return _lex_with_tokenize(source_code)
+
+def _lex_fast(source_code: str) -> LexedSource:
+    new, TokenInfo = tuple.__new__, tokenize.TokenInfo
+    NAME, NUMBER, STRING, OP = tokenize.NAME, tokenize.NUMBER, tokenize.STRING, tokenize.OP
+    COMMENT, INDENT, DEDENT = tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT
+    tokens_for_highlight: List[tokenize.TokenInfo] = []
+    texts: List[str] = []
+    names: List[int] = []
+    starts: List[Tuple[int, int]] = []
+    highlight, keep = tokens_for_highlight.append, texts.append
+    add_name, add_start = names.append, starts.append
+    scan, leading_whitespace = _PSEUDO_TOKEN.finditer, _LEADING_WHITESPACE.match
+
+    # 与 StringIO.readline 一样只按 '\n' 分行
+    lines = source_code.split('\n')
+    last_line = lines.pop()
+    lines = [line + '\n' for line in lines]
+    if last_line:
+        lines.append(last_line)
+
+    indents = [0]
+    parenlev = continued = 0
+    contstr = None
+    lnum = 0
+    for line in lines:
+        lnum += 1
+        pos, line_end = 0, len(line)
+        if contstr is not None:
+            # 跨行的字符串
+            end_match = end_pattern.match(line)
+            if end_match is None:
+                if needcont and line[-2:] != '\\\n' and line[-3:] != '\\\r\n':
+                    raise _IrregularSource()
+                contstr += line
+                contline += line
+                continue
+            pos = end_match.end()
+            highlight(new(TokenInfo, (STRING, contstr + line[:pos], string_start, (lnum, pos), contline + line)))
+            contstr = None
+        elif parenlev == 0 and not continued:
+            # 新的语句：空行与注释行不影响缩进
+            pos = leading_whitespace(line).end()
+            if pos == line_end:
+                raise _IrregularSource()
+            char = line[pos]
+            if char in '#\r\n':
+                if char == '#':
+                    comment = line[pos:].rstrip('\r\n')
+                    highlight(new(TokenInfo, (COMMENT, comment, (lnum, pos), (lnum, pos + len(comment)), line)))
+                continue
+            column = pos
+            if pos and ('\t' in line[:pos] or '\f' in line[:pos]):
+                column = 0
+                for char in line[:pos]:
+                    if char == ' ':
+                        column += 1
+                    elif char == '\t':
+                        column = (column // tokenize.tabsize + 1) * tokenize.tabsize
+                    else:
+                        column = 0
+            if column > indents[-1]:
+                indents.append(column)
+                highlight(new(TokenInfo, (INDENT, line[:pos], (lnum, 0), (lnum, pos), line)))
+            while column < indents[-1]:
+                if column not in indents:
+                    raise _IrregularSource()
+                indents.pop()
+                highlight(new(TokenInfo, (DEDENT, '', (lnum, pos), (lnum, pos), line)))
+        else:
+            continued = 0
+
+        while pos < line_end:
+            for match in scan(line, pos):
+                kind = match.lastgroup
+                start, end = match.span(kind)
+                if kind == 'name':
+                    start_position = (lnum, start)
+                    token = line[start:end]
+                    add_name(len(texts))
+                    add_start(start_position)
+                    highlight(new(TokenInfo, (NAME, token, start_position, (lnum, end), line)))
+                    keep(token)
+                    continue
+                if kind == 'op':
+                    token = line[start:end]
+                    if token in '([{':
+                        parenlev += 1
+                    elif token in ')]}':
+                        parenlev -= 1
+                    highlight(new(TokenInfo, (OP, token, (lnum, start), (lnum, end), line)))
+                    keep(token)
+                    continue
+                if kind == 'newline' or start == end:
+                    continue
+                token = line[start:end]
+                if kind == 'number' or kind == 'other_number':
+                    highlight(new(TokenInfo, (NUMBER, token, (lnum, start), (lnum, end), line)))
+                    keep(token)
+                elif kind == 'funny':
+                    if token[0] in '\r\n':
+                        continue
+                    if token in '([{':
+                        parenlev += 1
+                    elif token in ')]}':
+                        parenlev -= 1
+                    highlight(new(TokenInfo, (OP, token, (lnum, start), (lnum, end), line)))
+                    keep(token)
+                elif kind == 'other_name':
+                    if token[0].isidentifier():
+                        start_position = (lnum, start)
+                        add_name(len(texts))
+                        add_start(start_position)
+                        highlight(new(TokenInfo, (NAME, token, start_position, (lnum, end), line)))
+                    else:
+                        highlight(new(TokenInfo, (OP, token, (lnum, start), (lnum, end), line)))
+                    keep(token)
+                elif kind == 'contstr':
+                    if token[-1] != '\n':
+                        highlight(new(TokenInfo, (STRING, token, (lnum, start), (lnum, end), line)))
+                        continue
+                    # 以反斜杠续行的单引号字符串
+                    string_start = (lnum, start)
+                    end_pattern = (_END_PATTERNS.get(token[0]) or _END_PATTERNS.get(token[1])
+                                   or _END_PATTERNS.get(token[2]))
+                    contstr, needcont, contline = line[start:], 1, line
+                    pos = line_end
+                    break
+                elif kind == 'extra':
+                    initial = token[0]
+                    if initial == '#':
+                        highlight(new(TokenInfo, (COMMENT, token, (lnum, start), (lnum, end), line)))
+                    elif initial == '\\':
+                        continued = 1
+                    else:
+                        # 三引号字符串：在本行结束时从其后继续扫描，否则跨行
+                        end_pattern = _END_PATTERNS[token]
+                        end_match = end_pattern.match(line, end)
+                        if end_match is None:
+                            string_start = (lnum, start)
+                            contstr, needcont, contline = line[start:], 0, line
+                            pos = line_end
+                            break
+                        pos = end_match.end()
+                        highlight(new(TokenInfo, (STRING, line[start:pos], (lnum, start), (lnum, pos), line)))
+                        break
+                else:
+                    raise _IrregularSource()
+            else:
+                pos = line_end
+
+    if contstr is not None or parenlev or continued:
+        raise _IrregularSource()
+    # 文件末尾补齐尚未闭合的缩进层级
+    lnum += 1
+    for _ in indents[1:]:
+        highlight(new(TokenInfo, (DEDENT, '', (lnum, 0), (lnum, 0), '')))
+    return tokens_for_highlight, texts, names, starts
+
+_SCOPE_TYPES = frozenset((ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+                          ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp))
+
+# 不可能包含 Name/函数/类节点的字段：上下文、运算符以及各种字符串/数值属性
+_NON_NODE_FIELDS = {'ctx', 'op', 'ops', 'id', 'name', 'arg', 'attr', 'asname', 'module', 'level',
+                    'kind', 'type_comment', 'conversion', 'is_async'}
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {ast.Constant: ()}
+
+def _children(node: ast.AST) -> List[ast.AST]:
+    """
+    按字段顺序返回子节点（比 ast.iter_child_nodes 少一层生成器开销）。
+    每种节点类型只需遍历的字段在首次遇到时计算并缓存，上下文和运算符这类叶子节点不会入栈。
+    """
+    node_type = type(node)
+    fields = _CHILD_FIELDS.get(node_type)
+    if fields is None:
+        fields = _CHILD_FIELDS[node_type] = tuple(f for f in node._fields if f not in _NON_NODE_FIELDS)
+    children = []
+    for field in fields:
+        value = getattr(node, field, None)
+        if value.__class__ is list:
+            children.extend(item for item in value if isinstance(item, ast.AST))
+        elif isinstance(value, ast.AST):
+            children.append(value)
+    return children
+
+def flat_roles(tree: ast.AST) -> Dict[str, str]:
+    """
+    与 AstProcessor 结果完全相同的全局角色表（兼容模式使用）：
+    函数/类名以遍历中最后一次定义为准，其余 Name 节点首次出现即记为 VAR。
+    用显式栈做先序遍历，避免 NodeVisitor 逐节点查找 visit_ 方法的开销。
+    """
+    roles: Dict[str, str] = {}
+    stack = [tree]
+    pop, extend = stack.pop, stack.extend
+    Name, FunctionDef, ClassDef = ast.Name, ast.FunctionDef, ast.ClassDef
+    while stack:
+        node = pop()
+        node_type = type(node)
+        if node_type is Name:
+            roles.setdefault(node.id, 'VAR')
+            continue
+        if node_type is FunctionDef:
+            roles[node.name] = 'FUNC'
+        elif node_type is ClassDef:
+            roles[node.name] = 'CLASS'
+        children = _children(node)
+        children.reverse()
+        extend(children)
+    return roles
+
+class _Scope:
+    """
+    一个作用域：源码中的位置范围、父作用域，以及在本作用域内绑定的名字及其角色。
+    与 Python 的规则一致，类体中绑定的名字只在类体本身可见，其中的方法、lambda 和推导式都跳过类作用域。
+    """
+    __slots__ = ('start', 'end', 'parent', 'is_class', 'bindings', 'references', 'resolved', 'enclosed')
+
+    def __init__(self, start: Tuple[int, int], end: Tuple[int, int], parent: Optional['_Scope'],
+                 is_class: bool = False):
+        self.start = start
+        self.end = end
+        self.parent = parent
+        self.is_class = is_class
+        self.bindings: Dict[str, str] = {}
+        self.references: Set[str] = set()
+        # 合并了所有可见外层作用域绑定的查找表，逐Token解析时只需一次字典查找
+        self.resolved: Dict[str, str] = {}
+        # 嵌套在本作用域中的函数作用域可见的查找表（类作用域即其外层的查找表）
+        self.enclosed: Dict[str, str] = {}
+
+    def lookup(self, name: str) -> Optional[str]:
+        role = self.bindings.get(name)
+        scope = self.parent
+        while role is None and scope is not None:
+            if not scope.is_class:
+                role = scope.bindings.get(name)
+            scope = scope.parent
+        return role
+
+def scoped_roles(tree: ast.AST, lines: List[str]) -> List[_Scope]:
+    """
+    一次AST遍历建立作用域树：函数/类名绑定在外层作用域，参数与赋值目标绑定在本作用域，
+    只被读取、在任何可见的外层都没有绑定的名字（内置函数、全局名）在读取它的作用域中记为 VAR。
+    返回按起始位置排序的作用域列表，第一个为模块作用域。
+    """
+    module = _Scope((0, 0), (len(lines) + 1, 0), None)
+    scopes = [module]
+    scope = module
+    # 栈中的 _Scope 对象是“离开作用域”的标记：弹出时恢复为外层作用域
+    stack = [tree]
+    pop, push, extend = stack.pop, stack.append, stack.extend
+    Name, Load, arg = ast.Name, ast.Load, ast.arg
+    while stack:
+        node = pop()
+        node_type = type(node)
+        if node_type is Name:
+            if type(node.ctx) is Load:
+                scope.references.add(node.id)
+            else:
+                scope.bindings.setdefault(node.id, 'VAR')
+            continue
+        if node_type is _Scope:
+            scope = node
+            continue
+        if node_type is arg:
+            scope.bindings.setdefault(node.arg, 'VAR')
+        elif node_type in _SCOPE_TYPES:
+            if node_type is ast.ClassDef:
+                scope.bindings[node.name] = 'CLASS'
+            elif node_type is ast.FunctionDef or node_type is ast.AsyncFunctionDef:
+                scope.bindings[node.name] = 'FUNC'
+            push(scope)
+            scope = _Scope(_char_position(lines, node.lineno, node.col_offset),
+                           _char_position(lines, node.end_lineno, node.end_col_offset), scope,
+                           node_type is ast.ClassDef)
+            scopes.append(scope)
+        children = _children(node)
+        children.reverse()
+        extend(children)
+
+    # 作用域按创建顺序（父作用域总在子作用域之前）补全引用并展开查找表
+    for scope in scopes:
+        for name in scope.references:
+            if scope.lookup(name) is None:
+                scope.bindings[name] = 'VAR'
+    for scope in scopes:
+        scope.resolved = {**scope.parent.enclosed, **scope.bindings} if scope.parent else dict(scope.bindings)
+        scope.enclosed = scope.parent.enclosed if scope.is_class else scope.resolved
+    scopes.sort(key=lambda s: s.start)
+    return scopes
+
+def _char_position(lines: List[str], lineno: int, col_offset: int) -> Tuple[int, int]:
+    """把AST的 (行号, UTF-8字节偏移) 转换为 tokenize 使用的 (行号, 字符偏移)。"""
+    if 0 < lineno <= len(lines):
+        line = lines[lineno - 1]
+        if not line.isascii():
+            return lineno, len(line.encode('utf-8')[:col_offset].decode('utf-8', errors='ignore'))
+    return lineno, col_offset
+
+class Tokenizer:
+    """
+    负责将源代码字符串转换为用于高亮和计算的Token序列。
+    Token类型按预先计算的动作表分类，NAME 的角色在一次AST遍历中按作用域确定，
+    计算序列直接以驻留后的整数流输出。
+    compat=True 时使用与旧实现相同的全局角色表，输出与 LegacyTokenizer 完全一致。
+    """
+    def __init__(self, compat: bool = False):
+        self.compat = compat
+        # 计算Token的驻留表：字符串 -> 整数ID
+        self.vocab: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def intern(self, tokens: List[str]) -> List[int]:
+        """把计算Token字符串序列转换为整数ID序列（磁盘中读回的预处理结果使用）。"""
+        vocab, words = self.vocab, self.words
+        ids = []
+        for token in tokens:
+            token_id = vocab.get(token)
+            if token_id is None:
+                token_id = vocab[token] = len(words)
+                words.append(token)
+            ids.append(token_id)
+        return ids
+
+    def normalize(self, source_code: str, tree: Optional[ast.AST] = None) -> Tuple[List[int], List[tokenize.TokenInfo]]:
+        """
+        处理源代码，返回 (计算Token的整数ID序列, 用于高亮的TokenInfo列表)。
+        tree 为调用方已解析好的AST，提供时不再重复解析。
+        """
+        roles: Dict[str, str] = {}
+        scopes: List[_Scope] = []
+        try:
+            if tree is None:
+                tree = ast.parse(source_code)
+            if self.compat:
+                roles = flat_roles(tree)
+            else:
+                scopes = scoped_roles(tree, source_code.splitlines())
+        except (SyntaxError, ValueError) as e:
+            print(f"AST处理失败: {e}. 将在不进行角色归一化的情况下继续。")
+
+        try:
+            tokens_for_highlight, texts, names, starts = _lex(source_code)
+        except (tokenize.TokenError, IndentationError) as e:
+            print(f"词法分析失败: {e}")
+            return [], []
+
+        if not scopes:
+            # 角色表的键都是标识符，只可能与 NAME 的文本相同，可以对全部文本整体查表
+            if roles:
+                texts = list(map(roles.get, texts, texts))
+        else:
+            # 只有 NAME 需要解析角色：按位置顺序遍历，用栈维护当前所在的最内层作用域，
+            # 只有越过当前作用域终点或下一个作用域起点时才需要调整栈
+            scope_starts = [scope.start for scope in scopes] + [(float('inf'), 0)]
+            active: List[_Scope] = scopes[:1]
+            next_scope = 1
+            current_end, next_start = active[-1].end, scope_starts[1]
+            resolved = active[-1].resolved
+            for index, position in zip(names, starts):
+                if position >= current_end or position >= next_start:
+                    while len(active) > 1 and active[-1].end <= position:
+                        active.pop()
+                    while scope_starts[next_scope] <= position:
+                        scope = scopes[next_scope]
+                        next_scope += 1
+                        while len(active) > 1 and active[-1].end <= scope.start:
+                            active.pop()
+                        # 其中没有任何 NAME 的作用域可能已经结束，不再入栈
+                        if scope.end > position:
+                            active.append(scope)
+                    current_end, next_start = active[-1].end, scope_starts[next_scope]
+                    resolved = active[-1].resolved
+                text = texts[index]
+                # def/class 后的名字绑定在外层作用域，而它已位于自身作用域的范围内（方法的外层是类作用域，不在查找表中）
+                keyword = texts[index - 1] if index else None
+                if keyword == 'def':
+                    texts[index] = 'FUNC'
+                elif keyword == 'class':
+                    texts[index] = 'CLASS'
+                else:
+                    texts[index] = resolved.get(text, text)
+
+        # 驻留为整数ID：新词按首次出现的顺序追加到词表末尾
+        vocab, words = self.vocab, self.words
+        new_words = [text for text in dict.fromkeys(texts) if text not in vocab]
+        if new_words:
+            vocab.update(zip(new_words, range(len(words), len(words) + len(new_words))))
+            words.extend(new_words)
+        token_ids = list(map(vocab.__getitem__, texts))
+
+        return token_ids, tokens_for_highlight
+
+    def process_source(self, source_code: str, tree: Optional[ast.AST] = None) -> Tuple[List[str], List[tokenize.TokenInfo]]:
+        """
+        处理源代码，返回一个元组：
+        1. 用于计算的归一化Token字符串列表。
+        2. 用于高亮的原始TokenInfo对象列表（不过滤任何东西）。
+        """
+        token_ids, tokens_for_highlight = self.normalize(source_code, tree)
+        words = self.words
+        return [words[token_id] for token_id in token_ids], tokens_for_highlight
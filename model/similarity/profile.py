@@ -0,0 +1,94 @@
+# model/similarity/profile.py
+
+import ast
+import hashlib
+import tokenize
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from .ast_handler import SubtreeHash, get_ast_histogram, subtree_hashes
+from .preprocessors import Tokenizer
+
+if TYPE_CHECKING:
+    from .units import CodeUnit
+
+class FileProfile:
+    """
+    单个文件的预处理结果（Token序列、高亮Token、AST），
+    在一次分析中每个文件只构建一次，供所有两两比较复用。
+    """
+    def __init__(self,
+                 path: str,
+                 content_hash: str,
+                 tokens_for_calc: List[str],
+                 tokens_for_highlight: List[tokenize.TokenInfo],
+                 tree: Optional[ast.AST],
+                 token_ids: Optional[List[int]] = None,
+                 subtrees: Optional[List[SubtreeHash]] = None,
+                 histogram: Optional[Dict[str, int]] = None):
+        self.path = path
+        self.content_hash = content_hash
+        self.tokens_for_calc = tokens_for_calc
+        self.tokens_for_highlight = tokens_for_highlight
+        self.tree = tree
+        # 计算Token驻留后的整数序列（ID只在同一个 Tokenizer 的词表内有效）
+        self.token_ids = token_ids
+        # 高亮Token驻留后的整数序列，由匹配片段引擎按需填充
+        self.highlight_ids: Optional[List[int]] = None
+        # 函数/方法级别的代码单元，由函数级比较模式按需填充
+        self.units: Optional[List["CodeUnit"]] = None
+        # 非平凡子树的结构哈希（随预处理结果保存），以及供结构指纹指标使用的哈希集合
+        self.subtrees = subtrees or []
+        self.fingerprints = frozenset(subtree.digest for subtree in self.subtrees)
+        # AST节点类型直方图（随预处理结果保存），供语法构成指标使用
+        self.histogram = histogram or {}
+        # 归一化Token序列的哈希，用于识别仅改名/改注释的完全复制
+        self.token_hash = hashlib.sha1('\0'.join(tokens_for_calc).encode('utf-8')).hexdigest()
+
+    @property
+    def has_ast(self) -> bool:
+        """AST是否解析成功（失败时不计算AST类指标）"""
+        return self.tree is not None
+
+    # 进程内词表相关的派生字段不参与序列化，从磁盘读回后由使用方重新生成
+    _TRANSIENT_FIELDS = ('token_ids', 'highlight_ids', 'units')
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in self._TRANSIENT_FIELDS:
+            state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        for name in self._TRANSIENT_FIELDS:
+            state.setdefault(name, None)
+        self.__dict__.update(state)
+
+def decode_source(data: bytes) -> str:
+    """
+    将原始字节解码为源码字符串，并与文本模式读取一样统一换行符。
+    """
+    text = data.decode('utf-8')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+def build_profile(tokenizer: Tokenizer, path: str, data: bytes) -> FileProfile:
+    """
+    对一份源码的原始字节执行词法分析和AST解析，生成 FileProfile。
+    """
+    source = decode_source(data)
+
+    tree = None
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        print(f"AST解析失败，跳过AST指标计算: {e}")
+
+    # AST只解析一次，同时供词法归一化、AST指标和函数级切分使用
+    token_ids, tokens_for_highlight = tokenizer.normalize(source, tree)
+    tokens_for_calc = [tokenizer.words[token_id] for token_id in token_ids]
+
+    subtrees = subtree_hashes(tree) if tree is not None else []
+    histogram = get_ast_histogram(tree) if tree is not None else {}
+
+    content_hash = hashlib.sha1(data).hexdigest()
+    return FileProfile(path, content_hash, tokens_for_calc, tokens_for_highlight, tree, token_ids,
+                       subtrees, histogram)
@@ -1,8 +1,15 @@
 # model/similarity/result.py
 
-from typing import List, Tuple, Dict
+from typing import Callable, List, Optional, Tuple, Dict, TYPE_CHECKING
 from datetime import datetime
+from pathlib import Path
 import json
+import os
+
+from .score_stats import SessionStatistics
+
+if TYPE_CHECKING:
+    from model.file_registry import FileRegistry
 
 class ComparisonResult:
     """
@@ -15,7 +22,8 @@ class ComparisonResult:
                  segments: List[Tuple[int, int, int, int]],
                  analysis_time: datetime = None,
                  is_plagiarism: bool = False,
-                 plagiarism_notes: str = ""):
+                 plagiarism_notes: str = "",
+                 unit_matches: List[Dict] = None):
         self.file_a = file_a
         self.file_b = file_b
         self.scores = scores
@@ -23,73 +31,262 @@ class ComparisonResult:
         self.analysis_time = analysis_time or datetime.now()
         self.is_plagiarism = is_plagiarism
         self.plagiarism_notes = plagiarism_notes
+        # 函数级比较模式下匹配到的函数对：{'a', 'b', 'lines_a', 'lines_b', 'similarity'}
+        self.unit_matches = unit_matches or []
 
-    def to_dict(self) -> Dict:
-        """转换为字典格式，用于JSON序列化"""
-        return {
-            'file_a': self.file_a,
-            'file_b': self.file_b,
+    def to_dict(self, file_refs: Dict[str, int] = None) -> Dict:
+        """
+        转换为字典格式，用于JSON序列化。
+        提供 file_refs 时，文件以会话文件表中的下标 'a'/'b' 表示，而不是完整路径。
+        """
+        if file_refs is not None:
+            files = {'a': file_refs[self.file_a], 'b': file_refs[self.file_b]}
+        else:
+            files = {'file_a': self.file_a, 'file_b': self.file_b}
+        data = {
+            **files,
             'scores': self.scores,
             'segments': self.segments,
             'analysis_time': self.analysis_time.isoformat(),
             'is_plagiarism': self.is_plagiarism,
             'plagiarism_notes': self.plagiarism_notes
         }
+        if self.unit_matches:
+            data['unit_matches'] = self.unit_matches
+        return data
 
     @classmethod
-    def from_dict(cls, data: Dict) -> 'ComparisonResult':
-        """从字典格式创建实例"""
+    def from_dict(cls, data: Dict, paths: List[str] = None) -> 'ComparisonResult':
+        """从字典格式创建实例，paths 为会话文件表还原出的路径列表"""
+        if 'a' in data:
+            file_a, file_b = paths[data['a']], paths[data['b']]
+        else:
+            file_a, file_b = data['file_a'], data['file_b']
         return cls(
-            file_a=data['file_a'],
-            file_b=data['file_b'],
+            file_a=file_a,
+            file_b=file_b,
             scores=data['scores'],
             segments=data['segments'],
             analysis_time=datetime.fromisoformat(data['analysis_time']),
             is_plagiarism=data.get('is_plagiarism', False),
-            plagiarism_notes=data.get('plagiarism_notes', "")
+            plagiarism_notes=data.get('plagiarism_notes', ""),
+            unit_matches=data.get('unit_matches')
         )
 
 class AnalysisSession:
     """
     表示一次完整的分析会话，包含所有比较结果和元数据。
+    分块分析的会话把结果保存在历史目录下单独的 JSON Lines 文件（results_file）中，
+    历史文件只记录被标记的结果；全部结果在首次访问 results 时才读入内存。
     """
+    STATUS_COMPLETED = "completed"
+    STATUS_IN_PROGRESS = "in_progress"
+
     def __init__(self, 
                  session_id: str,
                  directory: str,
                  analysis_time: datetime = None,
-                 login_time: datetime = None):
+                 login_time: datetime = None,
+                 status: str = STATUS_COMPLETED,
+                 analysis_files: List[str] = None):
         self.session_id = session_id
         self.directory = directory
         self.analysis_time = analysis_time or datetime.now()
         self.login_time = login_time or datetime.now()
-        self.results: List[ComparisonResult] = []
+        # None 表示结果保存在 results_file 中且尚未读入
+        self._results: Optional[List[ComparisonResult]] = []
+        self.results_file: Optional[Path] = None
+        # 最近一次与 results_file 同步的结果对象；结果集合没有变化时保存历史不必重写该文件
+        self._persisted: Optional[List[ComparisonResult]] = None
+        # 结果尚未读入时被标记的结果 {(文件A, 文件B): 结果}，读入时以这些对象代替文件中的同一代码对
+        self._marked: Dict[Tuple[str, str], ComparisonResult] = {}
+        # 下次访问 results 前才执行的更新，例如把按新权重重新计算的综合可疑度写回各结果并重新排序
+        self._deferred: Optional[Callable[[], None]] = None
+        # 调整过权重的会话所用的权重（None 表示综合可疑度仍是分析时的值），从结果文件读入时据此重新计算
+        self.weights: Optional[Dict[str, float]] = None
+        # 未完成的会话记录待分析的文件列表，用于从检查点继续
+        self.status = status
+        self.analysis_files = analysis_files or []
+        # 各指标分数分布的流式统计，随结果的产生维护并与会话一起保存
+        self.statistics: Optional[SessionStatistics] = None
+        # {路径: (文件ID, 别名下标)}：会话登记或加载时确定的文件身份。
+        # 同一路径之后在其他会话中登记为新内容时，本会话仍指向自己分析时的内容
+        self.file_refs: Dict[str, Tuple[str, int]] = {}
+
+    @property
+    def results(self) -> List[ComparisonResult]:
+        if self._results is None:
+            self._results = self._read_results_file()
+            self._persisted = list(self._results)
+        if self._deferred is not None:
+            deferred, self._deferred = self._deferred, None
+            deferred()
+        return self._results
+
+    @results.setter
+    def results(self, results: List[ComparisonResult]):
+        self._results = results
+
+    def results_loaded(self) -> bool:
+        """结果是否已在内存中（不在单独文件中的会话总是已读入）"""
+        return self._results is not None
+
+    def defer_update(self, update: Callable[[], None]):
+        """
+        推迟到下次访问 results 时再执行 update；之前尚未执行的更新被替换，
+        因此 update 应当包含之前更新的效果（如写回最新一次计算的分数）。
+        """
+        self._deferred = update
+
+    def attach_results_file(self, path: Path):
+        """改为从 path 读取结果（分块分析逐块写入该文件），之后首次访问 results 时才读入。"""
+        self.results_file = Path(path)
+        self._results = None
+        self._persisted = None
+        self._marked = {}
+        self._deferred = None
+
+    def _read_results_file(self) -> List[ComparisonResult]:
+        """
+        逐行读入结果文件，按综合可疑度降序排列；标记以历史文件中记录的为准。
+        调整过权重的会话按保存的权重重新计算综合可疑度（结果文件中是分析时的值）。
+        """
+        marked = self._marked
+        weights = self.weights
+        results = []
+        if self.results_file.exists():
+            with open(self.results_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    result = ComparisonResult.from_dict(json.loads(line))
+                    kept = marked.get((result.file_a, result.file_b))
+                    if kept is not None:
+                        result = kept
+                    else:
+                        result.is_plagiarism = False
+                        result.plagiarism_notes = ""
+                    if weights is not None:
+                        result.scores["综合可疑度"] = sum(score * weights.get(name, 0)
+                                                       for name, score in result.scores.items()
+                                                       if name != "综合可疑度")
+                    results.append(result)
+        results.sort(key=lambda x: x.scores.get("综合可疑度", 0), reverse=True)
+        self._marked = {}
+        return results
+
+    def save_results_file(self):
+        """
+        结果已读入且集合发生了变化（如监视模式增删了代码对）时重写结果文件；
+        只有标记变化时不重写，标记随历史文件保存。未完成的会话由分块调度器负责写入。
+        """
+        if self.results_file is None or self._results is None or self.is_in_progress():
+            return
+        results = self.results
+        persisted = self._persisted
+        if persisted is not None and len(persisted) == len(results) and \
+                {id(r) for r in persisted} == {id(r) for r in results}:
+            return
+        self.results_file.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.results_file.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            for result in results:
+                f.write(json.dumps(result.to_dict(), ensure_ascii=False) + '\n')
+        os.replace(temp, self.results_file)
+        self._persisted = list(results)
+
+    def is_in_progress(self) -> bool:
+        """会话是否仍在分析中（或上次分析被中断）"""
+        return self.status == self.STATUS_IN_PROGRESS
 
     def add_result(self, result: ComparisonResult):
         """添加一个比较结果"""
         self.results.append(result)
 
+    def get_statistics(self) -> SessionStatistics:
+        """分数分布统计；没有保存统计的旧会话在首次访问时从结果构建一次。"""
+        if self.statistics is None:
+            self.statistics = SessionStatistics.from_results(self.results)
+        return self.statistics
+
     def get_plagiarism_results(self) -> List[ComparisonResult]:
-        """获取所有被标记为抄袭的结果"""
+        """获取所有被标记为抄袭的结果（结果尚未读入时不读入）"""
+        if self._results is None:
+            return [r for r in self._marked.values() if r.is_plagiarism]
         return [r for r in self.results if r.is_plagiarism]
 
-    def to_dict(self) -> Dict:
-        """转换为字典格式"""
-        return {
+    def get_file_paths(self) -> List[str]:
+        """按首次出现顺序返回会话涉及的所有文件路径（结果尚未读入时取自加载时的文件表）"""
+        if self._results is None and self.file_refs:
+            return list(self.file_refs)
+        paths = {}
+        for r in self.results:
+            paths.setdefault(r.file_a, None)
+            paths.setdefault(r.file_b, None)
+        return list(paths)
+
+    def to_dict(self, registry: 'FileRegistry' = None) -> Dict:
+        """
+        转换为字典格式。
+        提供文件注册表时，会话只保存 (文件ID, 别名下标) 组成的文件表，结果中以下标引用文件。
+        """
+        data = {
             'session_id': self.session_id,
             'directory': self.directory,
             'analysis_time': self.analysis_time.isoformat(),
             'login_time': self.login_time.isoformat(),
-            'results': [r.to_dict() for r in self.results]
+            'status': self.status,
         }
+        if self.is_in_progress():
+            data['analysis_files'] = self.analysis_files
+        if self.statistics is not None:
+            data['statistics'] = self.statistics.to_dict()
+        if self.weights is not None:
+            data['weights'] = self.weights
+        if self.results_file is not None:
+            # 结果本身在单独的文件中，这里只记录被标记的结果
+            data['results_file'] = self.results_file.name
+            data['marked_results'] = [r.to_dict() for r in self.get_plagiarism_results()]
+        if registry is None:
+            if self.results_file is None:
+                data['results'] = [r.to_dict() for r in self.results]
+            return data
+
+        paths = self.get_file_paths()
+        index_of = {path: index for index, path in enumerate(paths)}
+        data['files'] = [list(self.file_refs.get(path) or registry.register(path)) for path in paths]
+        if self.results_file is None:
+            data['results'] = [r.to_dict(index_of) for r in self.results]
+        return data
 
     @classmethod
-    def from_dict(cls, data: Dict) -> 'AnalysisSession':
-        """从字典格式创建实例"""
+    def from_dict(cls, data: Dict, registry: 'FileRegistry' = None,
+                  results_directory: Path = None) -> 'AnalysisSession':
+        """
+        从字典格式创建实例，新格式的会话需要文件注册表来还原路径。
+        结果保存在单独文件中的会话从 results_directory 中按需读取，这里只还原被标记的结果。
+        """
         session = cls(
             session_id=data['session_id'],
             directory=data['directory'],
             analysis_time=datetime.fromisoformat(data['analysis_time']),
-            login_time=datetime.fromisoformat(data['login_time'])
+            login_time=datetime.fromisoformat(data['login_time']),
+            status=data.get('status', cls.STATUS_COMPLETED),
+            analysis_files=data.get('analysis_files')
         )
-        session.results = [ComparisonResult.from_dict(r) for r in data['results']]
+        session.weights = data.get('weights')
+        paths = None
+        if 'files' in data:
+            paths = [registry.resolve(file_id, alias_index) for file_id, alias_index in data['files']]
+            session.file_refs = {path: (file_id, alias_index)
+                                 for path, (file_id, alias_index) in zip(paths, data['files'])}
+        if 'results_file' in data:
+            session.attach_results_file(Path(results_directory or '.') / data['results_file'])
+            for r in data.get('marked_results', []):
+                result = ComparisonResult.from_dict(r)
+                session._marked[(result.file_a, result.file_b)] = result
+        else:
+            session.results = [ComparisonResult.from_dict(r, paths) for r in data['results']]
+        if 'statistics' in data:
+            session.statistics = SessionStatistics.from_dict(data['statistics'])
         return session
\ No newline at end of file
@@ -0,0 +1,263 @@
+# model/similarity/scheduler.py
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from .profile import FileProfile, build_profile
+from .result import ComparisonResult
+from .score_stats import SessionStatistics
+
+# 一个 FileProfile 在内存中大约占源码字节数的倍数（Token对象、高亮Token与AST）
+PROFILE_MEMORY_FACTOR = 120
+
+class ProfileStore:
+    """
+    磁盘上的预处理结果仓库：每个 FileProfile 以内容哈希为文件名序列化保存，
+    大规模分析时只在需要时读回内存。
+    """
+    # FileProfile 的字段或归一化规则发生变化时递增，旧格式的缓存文件随之失效
+    FORMAT_VERSION = 6
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory) / f"v{self.FORMAT_VERSION}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, content_hash: str) -> Path:
+        return self.directory / f"{content_hash}.pkl"
+
+    def __contains__(self, content_hash: str) -> bool:
+        return self._path(content_hash).exists()
+
+    def put(self, profile: FileProfile):
+        """写入一个预处理结果（先写临时文件再替换，避免中断时留下半个文件）。"""
+        target = self._path(profile.content_hash)
+        temp = target.with_suffix('.tmp')
+        with open(temp, 'wb') as f:
+            pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, target)
+
+    def get(self, content_hash: str) -> FileProfile:
+        with open(self._path(content_hash), 'rb') as f:
+            return pickle.load(f)
+
+class BlockScheduler:
+    """
+    分块的代码对调度器。
+    把 n×n 的代码对矩阵按内存预算切成若干块，任一时刻只在内存中保留两个文件块的预处理结果；
+    每完成一块就把结果追加到结果文件（默认为工作目录的 results.jsonl），并在 manifest.json 中记录进度，
+    中途崩溃后重新运行会从最后一个完成的块继续。
+    store 为 None 时（文件数不大的语料）预处理结果取自分析器的内存缓存并全部驻留内存，
+    与 run_analysis 一样按内容/归一化Token分组，进度清单只用于检查点。
+    """
+    def __init__(self, analyzer, store: Optional[ProfileStore], work_dir: str,
+                 memory_budget_mb: int = 256, min_score: float = 0.0,
+                 max_block_size: Optional[int] = None, results_path: Optional[str] = None):
+        self.analyzer = analyzer
+        self.store = store
+        self.work_dir = Path(work_dir)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        # 只落盘综合可疑度不低于该值的代码对，超大规模语料不可能保存全部 n² 个结果
+        self.min_score = min_score
+        # 每块文件数上限：块越小检查点越密，中断后损失的工作越少
+        self.max_block_size = max_block_size
+        # 全部已比较代码对（包括低于 min_score 而未落盘的）的分数分布统计，随进度清单一起保存
+        self.statistics = SessionStatistics()
+        # 内存模式下的全部预处理结果、分组，以及组代表之间的比较结果
+        self._profiles: List[FileProfile] = []
+        self._groups: List[List[int]] = []
+        self._group_of: Dict[int, int] = {}
+        self._rep_results: Dict[Tuple[int, int], Tuple[Dict[str, float], List]] = {}
+        self.manifest_path = self.work_dir / "manifest.json"
+        # 结果文件可以放在工作目录之外（例如直接作为历史记录中会话的结果文件），清单只记录其写入进度
+        self.results_path = Path(results_path) if results_path else self.work_dir / "results.jsonl"
+
+    def block_size(self, sizes: List[int]) -> int:
+        """按平均文件大小估算每块可容纳的文件数（两块同时驻留内存）。"""
+        if not sizes:
+            return 1
+        average = max(1, sum(sizes) // len(sizes))
+        size = max(1, self.memory_budget // (2 * average * PROFILE_MEMORY_FACTOR))
+        if self.max_block_size:
+            size = min(size, self.max_block_size)
+        return size
+
+    def prepare(self, files: List[str], read_source: Callable[[str], bytes] = None,
+                progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
+        """
+        逐个文件构建预处理结果并存入仓库（仓库中已有相同内容的直接跳过），返回与 files 对应的内容哈希列表。
+        启用样板过滤时顺带统计 k-gram 文档频率，结束后为分析器启用过滤器。
+        每次只在内存中保留一个文件的结果。
+        """
+        read_source = read_source or (lambda path: Path(path).read_bytes())
+        if self.store is None:
+            return self._prepare_in_memory(files, read_source, progress_callback)
+        boilerplate = self.analyzer.new_boilerplate_filter()
+        hashes = []
+        for done, path in enumerate(files, 1):
+            data = read_source(path)
+            content_hash = hashlib.sha1(data).hexdigest()
+            profile = None
+            if content_hash not in self.store:
+                profile = build_profile(self.analyzer.tokenizer, path, data)
+                self.store.put(profile)
+            if boilerplate is not None:
+                boilerplate.observe(profile or self.store.get(content_hash))
+            hashes.append(content_hash)
+            if progress_callback:
+                progress_callback(done, len(files))
+        if boilerplate is not None:
+            boilerplate.finish()
+        self.analyzer.use_boilerplate(boilerplate)
+        return hashes
+
+    def _prepare_in_memory(self, files: List[str], read_source: Callable[[str], bytes],
+                           progress_callback: Optional[Callable[[int, int], None]]) -> List[str]:
+        profiles = []
+        for done, path in enumerate(files, 1):
+            profiles.append(self.analyzer.build_profile(path, read_source(path)))
+            if progress_callback:
+                progress_callback(done, len(files))
+        self.analyzer._fit_boilerplate(profiles)
+        self._profiles = profiles
+        self._groups, self._group_of = self.analyzer._group_plan(profiles)
+        self._rep_results = {}
+        return [profile.content_hash for profile in profiles]
+
+    def _load_manifest(self, files: List[str], hashes: List[str], block_size: int) -> Dict:
+        """读取进度清单；文件列表或分块方式与本次不一致，或结果文件短于已记录的进度时从头开始。"""
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            written = self.results_path.stat().st_size if self.results_path.exists() else 0
+            if manifest.get('files') == files and manifest.get('hashes') == hashes and \
+               manifest.get('block_size') == block_size and manifest.get('min_score') == self.min_score and \
+               manifest.get('boilerplate') == self.analyzer.boilerplate_settings() and \
+               'statistics' in manifest and manifest.get('results_offset', 0) <= written:
+                return manifest
+        return {'files': files, 'hashes': hashes, 'block_size': block_size,
+                'min_score': self.min_score, 'boilerplate': self.analyzer.boilerplate_settings(),
+                'completed': [], 'results_offset': 0, 'statistics': {}}
+
+    def _save_manifest(self, manifest: Dict):
+        temp = self.manifest_path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp, self.manifest_path)
+
+    def blocks(self, n: int, block_size: int) -> List[Tuple[int, int]]:
+        """按行优先顺序列出上三角的所有块 (行块, 列块)。"""
+        count = (n + block_size - 1) // block_size
+        return [(bi, bj) for bi in range(count) for bj in range(bi, count)]
+
+    def run(self, files: List[str], hashes: List[str],
+            progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        执行（或继续执行）全部分块，返回本次新完成的块数。
+        progress_callback(已完成块数, 总块数) 在每块落盘后调用。
+        """
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0 for path in files]
+        block_size = self.block_size(sizes)
+        manifest = self._load_manifest(files, hashes, block_size)
+        completed = {tuple(block) for block in manifest['completed']}
+        self.statistics = SessionStatistics.from_dict(manifest['statistics'])
+        all_blocks = self.blocks(len(files), block_size)
+
+        # 丢弃上次崩溃时写了一半、尚未记入清单的结果
+        self.results_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.results_path, 'ab') as f:
+            f.truncate(manifest['results_offset'])
+
+        loaded: Dict[int, List[FileProfile]] = {}
+        newly_completed = 0
+        for bi, bj in all_blocks:
+            if (bi, bj) in completed:
+                continue
+            # 只保留当前需要的两个文件块
+            for key in [k for k in loaded if k not in (bi, bj)]:
+                del loaded[key]
+            for b in (bi, bj):
+                if b not in loaded:
+                    if self.store is None:
+                        loaded[b] = self._profiles[b * block_size:(b + 1) * block_size]
+                    else:
+                        loaded[b] = [self._load(h) for h in hashes[b * block_size:(b + 1) * block_size]]
+
+            block_results = self._run_block(files, bi, bj, block_size, loaded[bi], loaded[bj])
+            with open(self.results_path, 'a', encoding='utf-8') as f:
+                for result in block_results:
+                    f.write(json.dumps(result.to_dict(), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+                manifest['results_offset'] = f.tell()
+            manifest['completed'].append([bi, bj])
+            manifest['statistics'] = self.statistics.to_dict()
+            self._save_manifest(manifest)
+
+            newly_completed += 1
+            if progress_callback:
+                progress_callback(len(manifest['completed']), len(all_blocks))
+        return newly_completed
+
+    def _load(self, content_hash: str) -> FileProfile:
+        """从仓库读回预处理结果，并用本进程的词表重新生成整数Token序列。"""
+        profile = self.store.get(content_hash)
+        profile.token_ids = self.analyzer.tokenizer.intern(profile.tokens_for_calc)
+        return profile
+
+    def _run_block(self, files: List[str], bi: int, bj: int, block_size: int,
+                   profiles_i: List[FileProfile], profiles_j: List[FileProfile]) -> List[ComparisonResult]:
+        base_i, base_j = bi * block_size, bj * block_size
+        # 对角块只计算上三角部分
+        coords = [(x, y) for x in range(len(profiles_i))
+                  for y in range(x + 1 if bi == bj else 0, len(profiles_j))]
+        if self.store is None:
+            compared = self.analyzer._compare_grouped(self._profiles, self._groups, self._group_of,
+                                                      [(base_i + x, base_j + y) for x, y in coords],
+                                                      self._rep_results)
+        else:
+            compared = self.analyzer._compare_pairs([(profiles_i[x], profiles_j[y]) for x, y in coords])
+
+        results = []
+        for (x, y), (scores, segments) in zip(coords, compared):
+            self.statistics.add(scores)
+            if scores.get("综合可疑度", 0) < self.min_score:
+                continue
+            results.append(ComparisonResult(
+                file_a=files[base_i + x],
+                file_b=files[base_j + y],
+                scores=scores,
+                segments=segments
+            ))
+        return results
+
+    def iter_results(self) -> Iterator[ComparisonResult]:
+        """逐条读回已落盘的结果。"""
+        if not self.results_path.exists():
+            return
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield ComparisonResult.from_dict(json.loads(line))
+
+    def is_complete(self, files: List[str]) -> bool:
+        """工作目录中的进度是否已覆盖给定文件列表的全部分块。"""
+        if not self.manifest_path.exists():
+            return False
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('files') != files:
+            return False
+        return len(manifest['completed']) == len(self.blocks(len(files), manifest['block_size']))
+
+    def clear(self):
+        """删除工作目录中的进度与结果文件。"""
+        for path in (self.manifest_path, self.results_path):
+            if path.exists():
+                path.unlink()
+        if self.work_dir.exists() and not any(self.work_dir.iterdir()):
+            self.work_dir.rmdir()
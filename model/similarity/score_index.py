@@ -0,0 +1,73 @@
+# model/similarity/score_index.py
+
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .result import ComparisonResult
+from .score_table import ScoreTable
+
+class ScoreIndex:
+    """
+    会话级的分数索引：每个指标保存一份按分数升序排列的结果下标数组（numpy 数组），
+    “超过阈值 t 的代码对/文件有哪些”因此只需一次二分查找。
+    分数取自按列存储的 ScoreTable；表中某列被重新计算后用 reindex 只重排这一列。
+    """
+    def __init__(self, results: List[ComparisonResult]):
+        # 复制一份结果列表，调用方对会话结果重新排序不会打乱行号
+        self.results = list(results)
+        self.table = ScoreTable(self.results)
+        self._order: Dict[str, np.ndarray] = {}
+        self._sorted_scores: Dict[str, np.ndarray] = {}
+        # {id(结果): 行号}，首次按结果查询分数时才建立
+        self._rows: Optional[Dict[int, int]] = None
+        for name in self.table.names:
+            self.reindex(name)
+
+    def reindex(self, metric: str):
+        """重新排列某个指标的索引。"""
+        self._order[metric], self._sorted_scores[metric] = self.table.argsort(metric)
+
+    def ranking(self, metric: str) -> Tuple[np.ndarray, np.ndarray]:
+        """按分数降序排列的行号（对应 self.results）及对应的分数。"""
+        if metric not in self._order:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        return self._order[metric][::-1], self._sorted_scores[metric][::-1]
+
+    def score(self, result: ComparisonResult, metric: str) -> float:
+        """表中该结果的分数（重新计算后尚未写回 result.scores 时也是新值）。"""
+        if self._rows is None:
+            self._rows = {id(r): i for i, r in enumerate(self.results)}
+        return self.table.value(self._rows[id(result)], metric)
+
+    def _position(self, metric: str, threshold: float) -> int:
+        if metric not in self._sorted_scores:
+            return 0
+        return int(np.searchsorted(self._sorted_scores[metric], threshold, side='left'))
+
+    def count_above(self, metric: str, threshold: float) -> int:
+        """分数 >= threshold 的代码对数量。"""
+        return len(self._sorted_scores.get(metric, ())) - self._position(metric, threshold)
+
+    def results_above(self, metric: str, threshold: float) -> List[ComparisonResult]:
+        """分数 >= threshold 的结果，按分数降序排列。"""
+        if metric not in self._order:
+            return []
+        results = self.results
+        return [results[i] for i in self._order[metric][self._position(metric, threshold):][::-1].tolist()]
+
+    def results_between(self, metric: str, low: float, high: float) -> List[ComparisonResult]:
+        """分数落在 [low, high) 区间内的结果。"""
+        if metric not in self._order:
+            return []
+        results = self.results
+        return [results[i] for i in
+                self._order[metric][self._position(metric, low):self._position(metric, high)].tolist()]
+
+    def files_above(self, metric: str, threshold: float) -> Set[str]:
+        """至少参与了一个分数 >= threshold 的代码对的文件。"""
+        files = set()
+        for r in self.results_above(metric, threshold):
+            files.add(r.file_a)
+            files.add(r.file_b)
+        return files
@@ -0,0 +1,184 @@
+# model/similarity/score_stats.py
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+class ScoreStatistics:
+    """
+    单个指标分数的流式统计：数量、均值与方差（Welford 算法），以及 [0, 1] 上的细粒度直方图。
+    分数有界，细粒度直方图同时充当分位数草图：任意分位数的误差不超过一个区间宽度（默认 0.005）。
+    支持逐个加入、撤销（结果过期时）和合并，都不需要再次遍历结果。
+    """
+    def __init__(self, bins: int = 200):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.bins = [0] * bins
+
+    def _bin(self, value: float) -> int:
+        return min(int(value * len(self.bins)), len(self.bins) - 1)
+
+    @staticmethod
+    def _clamp(value: float) -> float:
+        return min(max(value, 0.0), 1.0)
+
+    def add(self, value: float):
+        value = self._clamp(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.bins[self._bin(value)] += 1
+
+    def remove(self, value: float):
+        """撤销一次 add(value)。"""
+        value = self._clamp(value)
+        if self.count <= 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+        else:
+            mean = (self.count * self.mean - value) / (self.count - 1)
+            self._m2 = max(0.0, self._m2 - (value - mean) * (value - self.mean))
+            self.mean = mean
+            self.count -= 1
+        self.bins[self._bin(value)] = max(0, self.bins[self._bin(value)] - 1)
+
+    @classmethod
+    def from_values(cls, values: Iterable[float], bins: int = 200) -> "ScoreStatistics":
+        """对一整列分数一次性构建（向量化计算，结果与逐个 add 相同，仅有浮点舍入差异）。"""
+        values = np.clip(np.asarray(values, dtype=float), 0.0, 1.0)
+        stats = cls(bins)
+        if not len(values):
+            return stats
+        stats.count = len(values)
+        stats.mean = float(values.mean())
+        stats._m2 = float(np.square(values - stats.mean).sum())
+        indices = np.minimum((values * bins).astype(np.intp), bins - 1)
+        stats.bins = np.bincount(indices, minlength=bins).tolist()
+        return stats
+
+    def merge(self, other: "ScoreStatistics"):
+        """并入另一份统计（两份统计的区间数必须相同）。"""
+        if not other.count:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.bins = [a + b for a, b in zip(self.bins, other.bins)]
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def z_score(self, value: float) -> float:
+        std = self.std
+        return (value - self.mean) / std if std > 0 else 0.0
+
+    def quantile(self, q: float) -> float:
+        """q 分位数（0 <= q <= 1），在所在区间内线性插值。"""
+        if not self.count:
+            return 0.0
+        width = 1.0 / len(self.bins)
+        target = min(max(q, 0.0), 1.0) * self.count
+        seen = 0
+        for idx, n in enumerate(self.bins):
+            if n and seen + n >= target:
+                return min(1.0, (idx + (target - seen) / n) * width)
+            seen += n
+        return 1.0
+
+    def percentile_rank(self, value: float) -> float:
+        """不超过 value 的分数所占比例（区间内按均匀分布估计）。"""
+        if not self.count:
+            return 0.0
+        value = self._clamp(value)
+        idx = self._bin(value)
+        below = sum(self.bins[:idx])
+        within = value * len(self.bins) - idx
+        return (below + self.bins[idx] * min(within, 1.0)) / self.count
+
+    def histogram(self, buckets: int = 20) -> List[int]:
+        """把细粒度直方图合并为 buckets 个等宽区间的计数（buckets 应能整除区间数）。"""
+        step = max(1, len(self.bins) // buckets)
+        return [sum(self.bins[i:i + step]) for i in range(0, len(self.bins), step)]
+
+    def to_dict(self) -> Dict:
+        # 直方图以稀疏形式保存
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self._m2,
+            'bins': len(self.bins),
+            'histogram': [[idx, n] for idx, n in enumerate(self.bins) if n]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ScoreStatistics":
+        stats = cls(data.get('bins', 200))
+        stats.count = data['count']
+        stats.mean = data['mean']
+        stats._m2 = data['m2']
+        for idx, n in data.get('histogram', []):
+            stats.bins[idx] = n
+        return stats
+
+class SessionStatistics:
+    """
+    一个会话全部指标的流式统计，随结果的产生逐条更新，并与会话一起保存。
+    """
+    def __init__(self):
+        self.metrics: Dict[str, ScoreStatistics] = {}
+
+    def add(self, scores: Dict[str, float]):
+        for name, value in scores.items():
+            stats = self.metrics.get(name)
+            if stats is None:
+                stats = self.metrics[name] = ScoreStatistics()
+            stats.add(value)
+
+    def remove(self, scores: Dict[str, float]):
+        for name, value in scores.items():
+            if name in self.metrics:
+                self.metrics[name].remove(value)
+
+    def merge(self, other: "SessionStatistics"):
+        for name, stats in other.metrics.items():
+            if name in self.metrics:
+                self.metrics[name].merge(stats)
+            else:
+                self.metrics[name] = ScoreStatistics.from_dict(stats.to_dict())
+
+    def get(self, name: str) -> Optional[ScoreStatistics]:
+        return self.metrics.get(name)
+
+    def rebuild(self, name: str, values: Iterable[float]):
+        """整体替换某个指标的统计（例如修改权重后重新计算了综合可疑度）。"""
+        self.metrics[name] = ScoreStatistics.from_values(values)
+
+    def discard(self, name: str):
+        """丢弃某个指标的统计（无法再覆盖全部已比较的代码对时，宁可没有也不给出有偏的分布）。"""
+        self.metrics.pop(name, None)
+
+    @classmethod
+    def from_results(cls, results) -> "SessionStatistics":
+        """从已有结果一次性构建（用于没有保存统计的旧会话）。"""
+        statistics = cls()
+        for result in results:
+            statistics.add(result.scores)
+        return statistics
+
+    def to_dict(self) -> Dict:
+        return {name: stats.to_dict() for name, stats in self.metrics.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SessionStatistics":
+        statistics = cls()
+        statistics.metrics = {name: ScoreStatistics.from_dict(stats) for name, stats in data.items()}
+        return statistics
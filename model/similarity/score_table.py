@@ -0,0 +1,71 @@
+# model/similarity/score_table.py
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .result import ComparisonResult
+
+COMPOSITE_KEY = "综合可疑度"
+
+class ScoreTable:
+    """
+    按列存储的会话分数：每个指标一列（numpy 数组），第 i 行对应 results[i]。
+    综合可疑度由权重向量与单项指标矩阵的一次点积得到，修改权重后无需重新查重。
+    重新计算的列先只保存在表中，调用 write_back 时才写回各结果的 scores。
+    """
+    def __init__(self, results: List[ComparisonResult]):
+        self.results = results
+        names: Dict[str, None] = {}
+        for r in results:
+            for name in r.scores:
+                names.setdefault(name)
+        self.names = list(names)
+        # 参与加权的单项指标（综合可疑度本身除外）
+        self.metric_names = [name for name in self.names if name != COMPOSITE_KEY]
+        self._columns = {name: np.fromiter((r.scores.get(name, 0) for r in results), dtype=float, count=len(results))
+                         for name in self.names}
+        self._matrix = None
+        # 已重新计算但尚未写回结果 scores 的列
+        self._pending: Dict[str, None] = {}
+
+    def column(self, name: str) -> np.ndarray:
+        column = self._columns.get(name)
+        return column if column is not None else np.zeros(len(self.results))
+
+    def value(self, row: int, name: str) -> float:
+        return float(self.column(name)[row])
+
+    def argsort(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """返回该列按分数升序的行号及对应的分数。"""
+        column = self.column(name)
+        order = np.argsort(column, kind='stable')
+        return order, column[order]
+
+    def has_weighted_metrics(self, weights: Dict[str, float]) -> bool:
+        """权重中是否有本表包含的指标（函数级比较的会话没有可加权的单项指标）。"""
+        return any(name in self._columns for name in weights if name != COMPOSITE_KEY)
+
+    def composite(self, weights: Dict[str, float]) -> np.ndarray:
+        """按给定权重计算每一行的综合可疑度。"""
+        if self._matrix is None:
+            self._matrix = np.vstack([self._columns[name] for name in self.metric_names]) \
+                if self.metric_names else np.zeros((0, len(self.results)))
+        vector = np.array([weights.get(name, 0) for name in self.metric_names], dtype=float)
+        return vector @ self._matrix
+
+    def apply(self, weights: Dict[str, float]) -> np.ndarray:
+        """用新权重重新计算综合可疑度并更新本表的列；各结果的 scores 在 write_back 时才更新。"""
+        values = self.composite(weights)
+        self._columns[COMPOSITE_KEY] = values
+        if COMPOSITE_KEY not in self.names:
+            self.names.append(COMPOSITE_KEY)
+        self._pending[COMPOSITE_KEY] = None
+        return values
+
+    def write_back(self):
+        """把重新计算过的列写回每个结果的 scores。"""
+        for name in self._pending:
+            for result, value in zip(self.results, self._columns[name].tolist()):
+                result.scores[name] = value
+        self._pending = {}
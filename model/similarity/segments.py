@@ -0,0 +1,227 @@
+# model/similarity/segments.py
+
+import heapq
+import tokenize
+from typing import Dict, List, Tuple
+
+from .profile import FileProfile
+
+class SuffixAutomaton:
+    """
+    基于整数Token序列构建的后缀自动机，线性时间构建。
+    每个状态记录首次出现的结束位置；沿后缀链接树汇总子树中各非克隆状态的首次位置，
+    即可得到该状态所有出现位置的结束下标，用于将匹配映射回原序列。
+    """
+    def __init__(self, sequence: List[int]):
+        self.next: List[Dict[int, int]] = [{}]
+        self.link: List[int] = [-1]
+        self.length: List[int] = [0]
+        self.firstpos: List[int] = [-1]
+        self.is_clone: List[bool] = [True]
+        self._children: List[List[int]] = None
+        self._endpos: Dict[int, List[int]] = {}
+        self._last = 0
+        for c in sequence:
+            self._extend(c)
+
+    def _new_state(self, length: int, link: int, transitions: Dict[int, int], firstpos: int,
+                   is_clone: bool = False) -> int:
+        self.next.append(transitions)
+        self.link.append(link)
+        self.length.append(length)
+        self.firstpos.append(firstpos)
+        self.is_clone.append(is_clone)
+        return len(self.length) - 1
+
+    def _extend(self, c: int):
+        nxt, link, length = self.next, self.link, self.length
+        cur = self._new_state(length[self._last] + 1, -1, {}, length[self._last])
+        p = self._last
+        while p != -1 and c not in nxt[p]:
+            nxt[p][c] = cur
+            p = link[p]
+        if p == -1:
+            link[cur] = 0
+        else:
+            q = nxt[p][c]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                clone = self._new_state(length[p] + 1, link[q], dict(nxt[q]), self.firstpos[q], True)
+                while p != -1 and nxt[p].get(c) == q:
+                    nxt[p][c] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+        self._last = cur
+
+    def matching_statistics(self, sequence: List[int]) -> List[Tuple[int, int]]:
+        """
+        对 sequence 的每个位置 i，返回以 i 结尾、在自动机原序列中出现过的最长匹配
+        (匹配长度, 匹配所在的状态)。更短的后缀沿该状态的后缀链接依次得到。
+        """
+        nxt, link, length = self.next, self.link, self.length
+        stats = []
+        v, l = 0, 0
+        for c in sequence:
+            while v and c not in nxt[v]:
+                v = link[v]
+                l = length[v]
+            if c in nxt[v]:
+                v = nxt[v][c]
+                l += 1
+            else:
+                v, l = 0, 0
+            stats.append((l, v))
+        return stats
+
+    def endpos(self, state: int) -> List[int]:
+        """状态所代表子串在原序列中全部出现位置的结束下标（升序），查询过的状态会被缓存。"""
+        positions = self._endpos.get(state)
+        if positions is not None:
+            return positions
+        if self._children is None:
+            self._children = [[] for _ in self.link]
+            for v in range(1, len(self.link)):
+                self._children[self.link[v]].append(v)
+        children, firstpos, is_clone = self._children, self.firstpos, self.is_clone
+        positions = []
+        stack = [state]
+        while stack:
+            v = stack.pop()
+            if not is_clone[v]:
+                positions.append(firstpos[v])
+            stack.extend(children[v])
+        positions.sort()
+        self._endpos[state] = positions
+        return positions
+
+class SegmentFinder:
+    """
+    匹配片段查找引擎（Greedy String Tiling 风格）。
+    在驻留为整数的高亮Token上，借助后缀自动机找出所有不短于 min_match_length 的
+    极大公共子串，并按长度从长到短贪心地铺设互不重叠的“瓦片”。
+    与单调对齐不同，调换顺序的函数同样能被找到。
+    """
+    def __init__(self, min_match_length: int = 5):
+        self.min_match_length = min_match_length
+        self._vocab: Dict[str, int] = {}
+        # 仅缓存最近一次使用的自动机：调度按行进行时，同一文件会连续作为索引侧
+        self._cached_profile: FileProfile = None
+        self._cached_automaton: SuffixAutomaton = None
+        # 样板代码过滤器（见 BoilerplateFilter），启用时模板部分不参与匹配
+        self.boilerplate = None
+
+    def set_boilerplate(self, boilerplate):
+        """切换样板过滤器；高亮序列随之改变，已缓存的自动机作废。"""
+        if boilerplate is not self.boilerplate:
+            self.boilerplate = boilerplate
+            self._cached_profile = None
+            self._cached_automaton = None
+
+    def intern(self, tokens: List[tokenize.TokenInfo]) -> List[int]:
+        """将Token字符串驻留为整数ID。"""
+        vocab = self._vocab
+        return [vocab.setdefault(tok.string, len(vocab)) for tok in tokens]
+
+    def _token_ids(self, profile: FileProfile) -> List[int]:
+        if profile.highlight_ids is None:
+            profile.highlight_ids = self.intern(profile.tokens_for_highlight)
+        if self.boilerplate is not None:
+            return self.boilerplate.highlight_ids(profile, profile.highlight_ids)
+        return profile.highlight_ids
+
+    def _automaton_for(self, profile: FileProfile) -> SuffixAutomaton:
+        if self._cached_profile is not profile:
+            self._cached_automaton = SuffixAutomaton(self._token_ids(profile))
+            self._cached_profile = profile
+        return self._cached_automaton
+
+    def find_tiles(self, profile_a: FileProfile, profile_b: FileProfile) -> List[Tuple[int, int, int]]:
+        """
+        返回互不重叠的匹配瓦片 (A起始下标, B起始下标, 长度)，按A中位置排序。
+        结果与经典 Greedy String Tiling 相同：每次铺设当前两侧都未覆盖的最长匹配，
+        长度相同时按 (B起始下标, A起始下标) 的顺序。
+        """
+        ids_a = self._token_ids(profile_a)
+        ids_b = self._token_ids(profile_b)
+        min_len = self.min_match_length
+        if len(ids_a) < min_len or len(ids_b) < min_len:
+            return []
+
+        automaton = self._automaton_for(profile_a)
+        stats = automaton.matching_statistics(ids_b)
+        link, length, firstpos = automaton.link, automaton.length, automaton.firstpos
+
+        marked_a = bytearray(len(ids_a))
+        marked_b = bytearray(len(ids_b))
+
+        def longest_free(j: int, bound: int) -> Tuple[int, int]:
+            """
+            以 B[j] 结尾、两侧都未被覆盖的最长匹配 (长度, A结束下标)，长度不超过 bound。
+            沿后缀链接从长到短检查各状态的全部出现位置，找不到不短于 min_len 的匹配时返回 (0, -1)。
+            """
+            covered = marked_b.rfind(1, max(0, j - bound + 1), j + 1)
+            if covered >= 0:
+                bound = j - covered
+            v = stats[j][1]
+            while bound >= min_len and v > 0:
+                if length[link[v]] >= bound:
+                    v = link[v]
+                    continue
+                # 首次出现位置即最靠前的结束位置：它完全未被覆盖时不必列出其余出现位置
+                e = firstpos[v]
+                if marked_a.rfind(1, max(0, e - bound + 1), e + 1) < 0:
+                    return bound, e
+                best, best_end = 0, -1
+                for e in automaton.endpos(v):
+                    covered = marked_a.rfind(1, max(0, e - bound + 1), e + 1)
+                    free = bound if covered < 0 else e - covered
+                    if free > best:
+                        best, best_end = free, e
+                        if free == bound:
+                            break
+                if best > length[link[v]]:
+                    return (best, best_end) if best >= min_len else (0, -1)
+                bound = length[link[v]]
+                v = link[v]
+            return 0, -1
+
+        # 候选为B中的结束位置，键为 (-长度上界, 结束位置)；上界随覆盖而失效时重新计算后再入队。
+        # 起初只登记右极大匹配的结束位置；某个位置首次未能铺设时，再登记它左侧被同一匹配延伸覆盖的位置，
+        # 因为覆盖一旦切断了延伸，以左侧位置结尾的较短匹配就可能成为新的最长匹配
+        candidates = [(-l, j) for j, (l, _) in enumerate(stats)
+                      if l >= min_len and not (j + 1 < len(stats) and stats[j + 1][0] == l + 1)]
+        heapq.heapify(candidates)
+        tiles = []
+        while candidates:
+            neg_len, j = heapq.heappop(candidates)
+            bound = -neg_len
+            found, a_end = longest_free(j, bound)
+            if found < bound:
+                if found:
+                    heapq.heappush(candidates, (-found, j))
+                if bound == stats[j][0] and j and stats[j - 1][0] == bound - 1 and bound - 1 >= min_len:
+                    heapq.heappush(candidates, (1 - bound, j - 1))
+                continue
+            a_start, b_start = a_end - found + 1, j - found + 1
+            marked_a[a_start:a_end + 1] = b'\x01' * found
+            marked_b[b_start:j + 1] = b'\x01' * found
+            tiles.append((a_start, b_start, found))
+
+        tiles.sort()
+        return tiles
+
+    def find_segments(self, profile_a: FileProfile, profile_b: FileProfile) -> List[Tuple]:
+        """
+        返回用于高亮的 (A起点, A终点, B起点, B终点) 坐标列表。
+        """
+        tokens_a = profile_a.tokens_for_highlight
+        tokens_b = profile_b.tokens_for_highlight
+        segments = []
+        for a_start, b_start, length in self.find_tiles(profile_a, profile_b):
+            segments.append((
+                tokens_a[a_start].start, tokens_a[a_start + length - 1].end,
+                tokens_b[b_start].start, tokens_b[b_start + length - 1].end
+            ))
+        return segments
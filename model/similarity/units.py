@@ -0,0 +1,165 @@
+# model/similarity/units.py
+
+import ast
+import hashlib
+import math
+import tokenize
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .profile import FileProfile
+
+# 计算Token相对高亮Token额外过滤掉的类型（与 Tokenizer.process_source 保持一致）
+_CALC_EXCLUDED = (tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT, tokenize.STRING)
+
+class CodeUnit:
+    """
+    一个函数或方法级别的代码单元：归一化Token序列、所在位置以及用于检索的哈希。
+    单元随 FileProfile 一起缓存，内容相同的文件共享同一组单元，因此不记录文件路径。
+    """
+    def __init__(self,
+                 name: str,
+                 tokens: List[str],
+                 start: Tuple[int, int],
+                 end: Tuple[int, int],
+                 kgram_size: int):
+        self.name = name
+        self.tokens = tokens
+        self.start = start
+        self.end = end
+        self.token_hash = hashlib.sha1('\0'.join(tokens).encode('utf-8')).hexdigest()
+        # 归一化Token的 k-gram 哈希集合，用于近似匹配的候选检索
+        self.kgrams = {hash(tuple(tokens[i:i + kgram_size]))
+                       for i in range(len(tokens) - kgram_size + 1)}
+
+    @property
+    def lines(self) -> Tuple[int, int]:
+        return self.start[0], self.end[0]
+
+def _unit_nodes(tree: ast.AST) -> Iterator[Tuple[str, ast.AST]]:
+    """
+    遍历模块中的函数和方法（不深入函数内部的嵌套函数），产出 (限定名, 节点)。
+    类本身不单独成为代码单元，而是由它的方法表示。
+    """
+    stack = [("", node) for node in reversed(getattr(tree, 'body', []))]
+    while stack:
+        prefix, node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield prefix + node.name, node
+        elif isinstance(node, ast.ClassDef):
+            stack.extend((f"{prefix}{node.name}.", child) for child in reversed(node.body))
+
+def extract_units(profile: FileProfile, min_tokens: int, kgram_size: int) -> List[CodeUnit]:
+    """
+    利用 FileProfile 中已解析的AST把文件切分为函数/方法级别的代码单元。
+    归一化Token数少于 min_tokens 的单元（如简单的 getter）被忽略。
+    """
+    if profile.tree is None:
+        return []
+
+    # 计算Token与高亮Token一一对应的子序列，借此得到每个计算Token的位置
+    calc_positions = [(t.start, t.end) for t in profile.tokens_for_highlight
+                      if t.type not in _CALC_EXCLUDED]
+    if len(calc_positions) != len(profile.tokens_for_calc):
+        return []
+    start_lines = [start[0] for start, _ in calc_positions]
+
+    units = []
+    for name, node in _unit_nodes(profile.tree):
+        first_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        last_line = getattr(node, 'end_lineno', None) or first_line
+        lo = bisect_left(start_lines, first_line)
+        hi = bisect_right(start_lines, last_line)
+        if hi - lo < min_tokens:
+            continue
+        units.append(CodeUnit(name, profile.tokens_for_calc[lo:hi],
+                              calc_positions[lo][0], calc_positions[hi - 1][1], kgram_size))
+    return units
+
+class UnitIndex:
+    """
+    代码单元的倒排索引。
+    归一化Token完全相同的单元按哈希直接分组；近似相同的单元通过共享 k-gram 检索候选，
+    再用序列匹配确认，因此不需要对所有单元两两比较。
+    候选检索采用前缀过滤：共享 k-gram 达到较小单元的 candidate_ratio 的两个单元，
+    必然在较小单元最罕见的若干 k-gram 中至少共享一个，所以每个单元只需查这些 k-gram 的倒排表。
+    常见写法只会排在前缀之后而不被查询；但单元的 k-gram 全都常见时（许多文件共享的近似函数）
+    仍会查询其中最罕见的部分，不会漏掉匹配。
+    """
+    def __init__(self, match_threshold: float = 0.8, candidate_ratio: float = 0.5,
+                 stop_kgrams: Optional[Set[int]] = None):
+        self.match_threshold = match_threshold
+        # 共享 k-gram 占较小单元 k-gram 数的比例达到该值才进入确认阶段
+        self.candidate_ratio = candidate_ratio
+        # 样板代码的 k-gram（见 BoilerplateFilter）不建立倒排表
+        self.stop_kgrams = stop_kgrams or set()
+        self.units: List[Tuple[str, CodeUnit]] = []
+        self._by_hash: Dict[str, List[int]] = defaultdict(list)
+        self._postings: Dict[int, List[int]] = defaultdict(list)
+
+    def add(self, path: str, unit: CodeUnit):
+        """登记某个文件中的一个代码单元。"""
+        idx = len(self.units)
+        self.units.append((path, unit))
+        self._by_hash[unit.token_hash].append(idx)
+        for kgram in unit.kgrams:
+            if kgram not in self.stop_kgrams:
+                self._postings[kgram].append(idx)
+
+    def _probe_kgrams(self, unit: CodeUnit) -> List[int]:
+        """
+        单元作为较小一方时需要查询的 k-gram：按倒排表长度从短到长排列的非样板 k-gram 中，
+        去掉最常见的 (共享下限 - 1) 个。共享下限为单元自身 k-gram 数的 candidate_ratio。
+        """
+        postings = self._postings
+        indexed = sorted((kgram for kgram in unit.kgrams if kgram not in self.stop_kgrams),
+                         key=lambda kgram: (len(postings[kgram]), kgram))
+        required = max(1, math.ceil(self.candidate_ratio * len(unit.kgrams)))
+        return indexed[:len(indexed) - required + 1]
+
+    def matches(self) -> Iterator[Tuple[str, CodeUnit, str, CodeUnit, float]]:
+        """
+        产出所有来自不同文件的匹配单元对 (路径A, 单元A, 路径B, 单元B, 相似度)，每对只产出一次。
+        """
+        units = self.units
+        seen = set()
+
+        # 完全相同（忽略命名和注释）的单元
+        for members in self._by_hash.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    i, j = members[x], members[y]
+                    if units[i][0] != units[j][0]:
+                        seen.add((i, j))
+                        yield units[i] + units[j] + (1.0,)
+
+        # 近似相同的单元：从较小一方的前缀 k-gram 检索候选，再按实际共享的 k-gram 数筛选
+        stop_kgrams = self.stop_kgrams
+        for i, (path, unit) in enumerate(units):
+            size = len(unit.kgrams)
+            candidates = set()
+            for kgram in self._probe_kgrams(unit):
+                candidates.update(self._postings[kgram])
+            for j in sorted(candidates):
+                if j == i:
+                    continue
+                other_path, other = units[j]
+                # 每对由较小的一方负责检索（一样大时由下标较小的一方）
+                other_size = len(other.kgrams)
+                if other_size < size or (other_size == size and j < i):
+                    continue
+                pair = (i, j) if i < j else (j, i)
+                if other_path == path or pair in seen:
+                    continue
+                seen.add(pair)
+                shared = unit.kgrams & other.kgrams
+                if stop_kgrams:
+                    shared -= stop_kgrams
+                if len(shared) / (size or 1) < self.candidate_ratio:
+                    continue
+                similarity = SequenceMatcher(None, unit.tokens, other.tokens, autojunk=False).ratio()
+                if similarity >= self.match_threshold:
+                    a, b = pair
+                    yield units[a] + units[b] + (similarity,)
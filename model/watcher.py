@@ -0,0 +1,92 @@
+# model/watcher.py
+
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from .file_manager import FileManager
+from .similarity import CodeAnalyzer, ComparisonResult
+
+class DirectoryWatcher:
+    """
+    基于轮询和修改时间索引的目录监视器。
+    检测到变化后先进入防抖期，直到连续 debounce_seconds 秒内没有新的变化才报告，
+    避免把仍在写入中的文件拿去分析。
+    """
+    def __init__(self, directory: str, file_manager: FileManager, debounce_seconds: float = 2.0):
+        self.directory = Path(directory)
+        if not self.directory.is_dir():
+            raise NotADirectoryError(f"{directory} 不是有效目录")
+        self.file_manager = file_manager
+        self.debounce_seconds = debounce_seconds
+        # 已报告过的文件状态：{路径: (修改时间ns, 大小)}
+        self._index: Dict[Path, Tuple[int, int]] = {}
+        self._pending: Optional[Dict[Path, Tuple[int, int]]] = None
+        self._pending_since = 0.0
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for path in self.file_manager.scan_directory(self.directory):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self) -> Optional[Tuple[List[Path], List[Path], List[Path]]]:
+        """
+        扫描一次目录。变化稳定后返回 (新增, 修改, 删除) 三个列表，否则返回 None。
+        """
+        snapshot = self._snapshot()
+        now = time.monotonic()
+        if snapshot == self._index:
+            self._pending = None
+            return None
+        if snapshot != self._pending:
+            # 出现新的变化，重新开始防抖计时
+            self._pending = snapshot
+            self._pending_since = now
+            return None
+        if now - self._pending_since < self.debounce_seconds:
+            return None
+
+        added = sorted(p for p in snapshot if p not in self._index)
+        modified = sorted(p for p in snapshot if p in self._index and snapshot[p] != self._index[p])
+        removed = sorted(p for p in self._index if p not in snapshot)
+        self._index = snapshot
+        self._pending = None
+        return added, modified, removed
+
+class WatchSession:
+    """
+    监视模式的增量分析流程（不依赖界面，GUI 与命令行共用）：
+    只读取新增/修改的文件，并只比较涉及这些文件的代码对。
+    """
+    def __init__(self, directory: str, file_manager: FileManager, analyzer: CodeAnalyzer,
+                 debounce_seconds: float = 2.0):
+        self.file_manager = file_manager
+        self.analyzer = analyzer
+        self.watcher = DirectoryWatcher(directory, file_manager, debounce_seconds)
+
+    def poll(self) -> Optional[Tuple[List[ComparisonResult], Set[str]]]:
+        """
+        轮询一次。有稳定的变化时返回 (新的比较结果, 结果已过期的文件路径集合)，否则返回 None。
+        """
+        changes = self.watcher.poll()
+        if changes is None:
+            return None
+        added, modified, removed = changes
+
+        for path in modified + removed:
+            self.file_manager.remove_file(path)
+        self.file_manager.load_files([str(p) for p in added + modified])
+
+        changed = {str(p) for p in added + modified}
+        stale = changed | {str(p) for p in removed}
+        new_files = sorted(p for p in changed if Path(p) in self.file_manager.files)
+        existing_files = [str(p) for p in self.file_manager.sorted_files if str(p) not in changed]
+
+        results = self.analyzer.run_incremental(new_files, existing_files, self.file_manager.get_sources())
+        return results, stale
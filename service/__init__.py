@@ -0,0 +1,6 @@
+# service/__init__.py
+
+# 本地查重服务：供课程提交系统等外部程序调用
+from .jobs import AnalysisService, Job
+from .server import ServiceServer
+from .client import ServiceClient
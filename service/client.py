@@ -0,0 +1,83 @@
+# service/client.py
+
+import asyncio
+import json
+from urllib.parse import quote
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+class ServiceClient:
+    """
+    本地查重服务的异步客户端（与 ServiceServer 配套，供提交系统集成与本地测试使用）。
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, unix_socket: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+
+    async def submit(self, assignment: str, files: Dict[str, str]) -> Dict:
+        """提交 {文件名: 源码}，返回作业信息（含 job_id）。"""
+        body = json.dumps({"files": files}, ensure_ascii=False).encode('utf-8')
+        return await self._request_json("POST", f"/assignments/{quote(assignment, safe='')}/jobs", body)
+
+    async def job(self, job_id: str) -> Dict:
+        """查询作业状态，完成后包含比较结果。"""
+        return await self._request_json("GET", f"/jobs/{job_id}")
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict]:
+        """依次产出作业的进度事件，作业结束后停止。"""
+        reader, writer = await self._send("GET", f"/jobs/{job_id}/events")
+        try:
+            status, headers = await self._read_head(reader)
+            if status != 200:
+                raise RuntimeError(json.loads(await reader.read()).get("error", status))
+            buffer = b""
+            while True:
+                size = int((await reader.readline()).strip(), 16)
+                if size == 0:
+                    break
+                buffer += await reader.readexactly(size)
+                await reader.readexactly(2)
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    yield json.loads(line)
+        finally:
+            writer.close()
+
+    async def wait(self, job_id: str) -> Dict:
+        """等待作业结束并返回最终的作业信息。"""
+        async for _ in self.events(job_id):
+            pass
+        return await self.job(job_id)
+
+    async def _request_json(self, method: str, path: str, body: bytes = b"") -> Dict:
+        reader, writer = await self._send(method, path, body)
+        try:
+            status, headers = await self._read_head(reader)
+            payload = json.loads(await reader.readexactly(int(headers.get('content-length', 0))))
+        finally:
+            writer.close()
+        if status >= 400:
+            raise RuntimeError(payload.get("error", status))
+        return payload
+
+    async def _send(self, method: str, path: str, body: bytes = b"") -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self.unix_socket:
+            reader, writer = await asyncio.open_unix_connection(self.unix_socket)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nConnection: close\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        writer.write(head.encode('utf-8') + body)
+        await writer.drain()
+        return reader, writer
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                return status, headers
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
@@ -0,0 +1,269 @@
+# service/jobs.py
+
+import asyncio
+import multiprocessing
+import re
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from model.file_manager import FileManager
+from model.history_manager import HistoryManager
+from model.similarity import CodeAnalyzer
+from model.similarity.result import AnalysisSession, ComparisonResult
+
+# 作业名只允许字母、数字、下划线、点和连字符，直接用作上传目录名（不能只由点组成）
+_ASSIGNMENT_PATTERN = re.compile(r'^(?!\.+$)[\w.-]+$')
+
+class Job:
+    """
+    一次“上传并比较”的提交。进度以事件列表的形式记录，任意数量的订阅者都可以从头流式读取。
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    def __init__(self, job_id: str, assignment: str, files: List[str]):
+        self.job_id = job_id
+        self.assignment = assignment
+        self.files = files
+        self.status = self.QUEUED
+        self.error = ""
+        self.submitted_time = datetime.now()
+        self.results: List[ComparisonResult] = []
+        self.events: List[Dict] = []
+        self._changed = asyncio.Event()
+        self._emit(self.QUEUED, files=len(files))
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (self.COMPLETED, self.FAILED)
+
+    def _emit(self, kind: str, **data):
+        self.events.append({"event": kind, "job_id": self.job_id, "time": datetime.now().isoformat(), **data})
+        # 唤醒当前所有订阅者，之后的订阅者等待新的事件对象
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def start(self, batch_jobs: int, batch_files: int):
+        self.status = self.RUNNING
+        self._emit(self.RUNNING, batch_jobs=batch_jobs, batch_files=batch_files)
+
+    def progress(self, done: int, total: int):
+        self._emit("progress", done=done, total=total)
+
+    def complete(self, results: List[ComparisonResult]):
+        self.results = results
+        self.status = self.COMPLETED
+        self._emit(self.COMPLETED, results=len(results))
+
+    def fail(self, error: str):
+        self.error = error
+        self.status = self.FAILED
+        self._emit(self.FAILED, error=error)
+
+    async def stream(self) -> AsyncIterator[Dict]:
+        """从第一个事件开始依次产出进度事件，作业结束后停止。"""
+        position = 0
+        while True:
+            changed = self._changed
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+    def to_dict(self, include_results: bool = False) -> Dict:
+        data = {
+            "job_id": self.job_id,
+            "assignment": self.assignment,
+            "status": self.status,
+            "files": self.files,
+            "submitted_time": self.submitted_time.isoformat(),
+        }
+        if self.error:
+            data["error"] = self.error
+        if include_results and self.status == self.COMPLETED:
+            data["results"] = [r.to_dict() for r in self.results]
+        return data
+
+class Assignment:
+    """
+    一个作业的累积状态：已经比较过的文件、对应的历史会话，以及尚未开始的提交。
+    """
+    def __init__(self, name: str, directory: Path):
+        self.name = name
+        self.directory = directory
+        self.file_manager = FileManager()
+        self.files: List[str] = []
+        self.session: Optional[AnalysisSession] = None
+        self.pending: List[Job] = []
+        self.worker: Optional[asyncio.Task] = None
+
+    @property
+    def label(self) -> str:
+        return f"服务作业：{self.name}"
+
+# ---- 工作进程 ----
+
+_worker_analyzer: Optional[CodeAnalyzer] = None
+
+def _compare_file(path: str, others: List[str], template_files: List[str]) -> List[ComparisonResult]:
+    """
+    在工作进程中比较一个新文件与其余文件。预处理缓存在同一进程处理的各批次之间复用。
+    样板过滤只使用服务配置的模板文件：每个任务只看到语料的一部分，按文档频率统计会让停用表逐对变化。
+    """
+    global _worker_analyzer
+    if _worker_analyzer is None:
+        _worker_analyzer = CodeAnalyzer()
+        # 作业之间已经在进程池中并行，分析器内部不再另开进程
+        _worker_analyzer.workers = 1
+        _worker_analyzer.boilerplate_max_df = None
+    _worker_analyzer.template_files = template_files
+    return _worker_analyzer.run_incremental([path], others)
+
+# ---- 服务 ----
+
+class AnalysisService:
+    """
+    本地查重服务：接收“上传并比较”的提交，按作业排队到进程池中执行，结果写入历史记录。
+    同一作业在上一批比较进行期间到达的多个提交会合并为下一个增量批次：
+    新文件之间、新文件与该作业已有文件之间各比较一次，已有文件之间不再重复比较。
+    template_files 为学生共用的起始代码文件，其中的代码在所有作业中都不计入相似度。
+    所有方法都应在同一个事件循环中调用。
+    """
+    def __init__(self, history_manager: HistoryManager, upload_root: str = "history/uploads",
+                 workers: Optional[int] = None, template_files: Optional[List[str]] = None,
+                 max_finished_jobs: int = 1000):
+        self.history_manager = history_manager
+        self.upload_root = Path(upload_root)
+        self.template_files = [str(path) for path in template_files or []]
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self._jobs: Dict[str, Job] = {}
+        # 已结束的作业只保留最近 max_finished_jobs 个供查询，结果本身已写入历史记录
+        self.max_finished_jobs = max_finished_jobs
+        self._finished: deque = deque()
+        self._assignments: Dict[str, Assignment] = {}
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def submit(self, assignment_name: str, files: Dict[str, bytes]) -> Job:
+        """
+        保存一次提交的文件并排队比较，立即返回作业对象。
+        files 为 {文件名: 源码字节}，文件名只保留最后一级并且必须是 .py 文件。
+        """
+        if not _ASSIGNMENT_PATTERN.match(assignment_name) or \
+                not (self.upload_root / assignment_name).resolve().is_relative_to(self.upload_root.resolve()):
+            raise ValueError(f"无效的作业名: {assignment_name}")
+        if not files:
+            raise ValueError("提交中没有文件")
+        names = {}
+        for name in files:
+            safe_name = Path(name).name
+            if Path(safe_name).suffix != '.py':
+                raise ValueError(f"只接受 .py 文件: {name}")
+            if safe_name in names.values():
+                raise ValueError(f"提交中有重名文件: {safe_name}")
+            names[name] = safe_name
+
+        assignment = self._assignment(assignment_name)
+        job_id = str(uuid.uuid4())
+        # 每个提交的文件单独存放，不同提交中的同名文件互不覆盖
+        job_directory = assignment.directory / job_id
+        job_directory.mkdir(parents=True)
+        paths = []
+        for name, data in files.items():
+            path = job_directory / names[name]
+            path.write_bytes(data)
+            paths.append(str(path))
+
+        job = Job(job_id, assignment_name, paths)
+        self._jobs[job_id] = job
+        assignment.pending.append(job)
+        if assignment.worker is None or assignment.worker.done():
+            assignment.worker = asyncio.get_running_loop().create_task(self._drain(assignment))
+        return job
+
+    def _assignment(self, name: str) -> Assignment:
+        """取得作业状态；服务重启后从历史记录中同名的会话恢复已比较过的文件。"""
+        assignment = self._assignments.get(name)
+        if assignment is None:
+            assignment = Assignment(name, self.upload_root / name)
+            for session in self.history_manager.get_all_sessions():
+                if session.directory == assignment.label:
+                    assignment.session = session
+                    assignment.files = [path for path in session.get_file_paths() if Path(path).exists()]
+                    assignment.file_manager.load_files(assignment.files)
+            self._assignments[name] = assignment
+        return assignment
+
+    async def _drain(self, assignment: Assignment):
+        """依次处理作业中排队的提交，每次把当时排队的全部提交合并为一个批次。"""
+        while assignment.pending:
+            batch, assignment.pending = assignment.pending, []
+            try:
+                await self._run_batch(assignment, batch)
+            except Exception as e:
+                for job in batch:
+                    if not job.finished:
+                        job.fail(f"{type(e).__name__}: {e}")
+            self._retire(batch)
+
+    def _retire(self, jobs: List[Job]):
+        """登记已结束的作业，超出保留数量时丢弃最早结束的作业。"""
+        self._finished.extend(job.job_id for job in jobs)
+        while len(self._finished) > self.max_finished_jobs:
+            self._jobs.pop(self._finished.popleft(), None)
+
+    async def _run_batch(self, assignment: Assignment, batch: List[Job]):
+        new_files = [path for job in batch for path in job.files]
+        for job in batch:
+            job.start(len(batch), len(new_files))
+
+        # 每个新文件与排在它之后的新文件及全部已有文件比较，作为一个任务提交到进程池
+        loop = asyncio.get_running_loop()
+        tasks = [loop.run_in_executor(self._executor, _compare_file, path, new_files[idx + 1:] + assignment.files,
+                                      self.template_files)
+                 for idx, path in enumerate(new_files)]
+        results: List[ComparisonResult] = []
+        for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+            results.extend(await task)
+            for job in batch:
+                job.progress(done, len(tasks))
+
+        assignment.files.extend(new_files)
+        self._record(assignment, new_files, results)
+        for job in batch:
+            own = set(job.files)
+            job.complete([r for r in results if r.file_a in own or r.file_b in own])
+
+    def _record(self, assignment: Assignment, new_files: List[str], results: List[ComparisonResult]):
+        """把一个批次的结果追加到作业对应的历史会话中。"""
+        assignment.file_manager.load_files(new_files)
+        batch_files = set(new_files)
+        file_info = {path: info for path, info in assignment.file_manager.get_file_info().items()
+                     if path in batch_files}
+        session = assignment.session
+        if session is None:
+            session = AnalysisSession(session_id=str(uuid.uuid4()), directory=assignment.label)
+            session.results = sorted(results, key=lambda x: x.scores.get("综合可疑度", 0), reverse=True)
+            assignment.session = session
+            self.history_manager.add_session(session, file_info)
+        else:
+            session.results.extend(results)
+            session.results.sort(key=lambda x: x.scores.get("综合可疑度", 0), reverse=True)
+            session.analysis_time = datetime.now()
+            self.history_manager.add_session_files(session, file_info)
+
+    async def close(self):
+        """等待正在进行的批次结束并关闭进程池。"""
+        workers = [a.worker for a in self._assignments.values() if a.worker is not None]
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+        self._executor.shutdown()
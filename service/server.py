@@ -0,0 +1,146 @@
+# service/server.py
+
+import asyncio
+import json
+import re
+from urllib.parse import unquote
+from typing import Dict, Optional, Tuple
+
+from .jobs import AnalysisService
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large"}
+
+class ServiceServer:
+    """
+    基于 asyncio 的最小 HTTP/1.1 接口（TCP 或 Unix 套接字，每个连接处理一个请求）：
+    - POST /assignments/<作业名>/jobs  提交文件，请求体为 {"files": {"文件名": "源码"}}，返回作业信息；
+    - GET  /jobs/<作业ID>              查询作业状态，完成后附带比较结果；
+    - GET  /jobs/<作业ID>/events       以分块传输的 JSON Lines 流式返回进度事件，直到作业结束。
+    """
+    def __init__(self, service: AnalysisService, host: str = "127.0.0.1", port: int = 8765,
+                 unix_socket: Optional[str] = None, max_body_mb: int = 64):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.max_body = max_body_mb * 1024 * 1024
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def address(self) -> str:
+        if self.unix_socket:
+            return self.unix_socket
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        if self.unix_socket:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_socket)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            # 端口为 0 时由系统分配，记录实际端口
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await self._read_request(reader)
+            await self._dispatch(method, path, body, writer)
+        except _HttpError as e:
+            await self._send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise _HttpError(400, "无效的请求行")
+        method, path, _ = request_line
+        headers: Dict[str, str] = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise _HttpError(400, "无效的 Content-Length")
+        if length > self.max_body:
+            raise _HttpError(413, "请求体过大")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        match = re.fullmatch(r'/assignments/([^/]+)/jobs', path)
+        if match:
+            if method != "POST":
+                raise _HttpError(405, "只支持 POST")
+            try:
+                job = self.service.submit(unquote(match.group(1)), self._parse_files(body))
+            except ValueError as e:
+                raise _HttpError(400, str(e))
+            await self._send_json(writer, 202, job.to_dict())
+            return
+
+        match = re.fullmatch(r'/jobs/([^/]+)(/events)?', path)
+        if match:
+            if method != "GET":
+                raise _HttpError(405, "只支持 GET")
+            job = self.service.get_job(match.group(1))
+            if job is None:
+                raise _HttpError(404, "作业不存在")
+            if match.group(2):
+                await self._stream_events(writer, job)
+            else:
+                await self._send_json(writer, 200, job.to_dict(include_results=True))
+            return
+
+        raise _HttpError(404, "路径不存在")
+
+    @staticmethod
+    def _parse_files(body: bytes) -> Dict[str, bytes]:
+        try:
+            files = json.loads(body.decode('utf-8'))["files"]
+            return {str(name): source.encode('utf-8') for name, source in files.items()}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise _HttpError(400, '请求体应为 {"files": {"文件名": "源码"}}')
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(self._head(status, {"Content-Type": "application/json; charset=utf-8",
+                                         "Content-Length": str(len(body))}) + body)
+        await writer.drain()
+
+    async def _stream_events(self, writer: asyncio.StreamWriter, job):
+        writer.write(self._head(200, {"Content-Type": "application/x-ndjson; charset=utf-8",
+                                      "Transfer-Encoding": "chunked"}))
+        async for event in job.stream():
+            line = json.dumps(event, ensure_ascii=False).encode('utf-8') + b"\n"
+            writer.write(f"{len(line):X}\r\n".encode('ascii') + line + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _head(status: int, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", "Connection: close"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('utf-8')
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
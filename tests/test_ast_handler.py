@@ -0,0 +1,28 @@
+# tests/test_ast_handler.py
+
+import ast
+import unittest
+
+from model.similarity.ast_handler import subtree_hashes
+
+class SubtreeHashesTest(unittest.TestCase):
+    def test_nested_same_operator(self):
+        # 运算符节点在 CPython 中是共享单例，嵌套使用同一运算符时不能互相覆盖
+        for source in ["a - (b - c)", "-(-x)", "not (a and (b and c))", "x = [a + (b + (c + d))]"]:
+            with self.subTest(source=source):
+                hashes = subtree_hashes(ast.parse(source), min_size=1)
+                self.assertTrue(hashes)
+
+    def test_same_structure_same_digest(self):
+        # 只有标识符不同的表达式得到相同的结构哈希
+        a = subtree_hashes(ast.parse("x - (y - z)"), min_size=1)
+        b = subtree_hashes(ast.parse("p - (q - r)"), min_size=1)
+        self.assertEqual([h.digest for h in a], [h.digest for h in b])
+
+    def test_nested_subtree_size(self):
+        outer = max(subtree_hashes(ast.parse("a - (b - c)"), min_size=1), key=lambda h: h.size)
+        # Expr, 外层 BinOp, a, Sub, 内层 BinOp, b, Sub, c（Module 没有行号，不计入）
+        self.assertEqual(outer.size, 8)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# tests/test_cluster_service.py
+
+import random
+import unittest
+
+from model.cluster_service import ClusterService
+from model.similarity.result import ComparisonResult
+
+def make_results(pairs):
+    return [ComparisonResult(file_a=a, file_b=b, scores={"综合可疑度": score}, segments=[])
+            for a, b, score in pairs]
+
+def reference_groups(pairs, threshold):
+    """朴素地求分数不低于阈值的边构成的连通分量（规模不少于 2）。"""
+    groups = []
+    for a, b, score in pairs:
+        if score < threshold:
+            continue
+        touching = [g for g in groups if a in g or b in g]
+        merged = {a, b}.union(*touching)
+        groups = [g for g in groups if g not in touching] + [merged]
+    return sorted(sorted(g) for g in groups)
+
+def random_pairs(rng, files=12, edges=25):
+    names = [f"f{i}.py" for i in range(files)]
+    pairs = []
+    for _ in range(edges):
+        a, b = rng.sample(names, 2)
+        pairs.append((a, b, round(rng.random(), 2)))
+    return pairs
+
+class ClusterServiceTest(unittest.TestCase):
+    def assert_matches(self, service, pairs, threshold):
+        expected = reference_groups(pairs, threshold)
+        self.assertEqual(service.cluster_count(threshold), len(expected))
+        service.set_threshold(threshold)
+        self.assertEqual(sorted(sorted(c.members) for c in service.clusters()), expected)
+        self.assertEqual(service.edge_count(), sum(1 for _, _, score in pairs if score >= threshold))
+
+    def test_merge_and_cut(self):
+        # a-b-c 在 0.8 合并为一个小组，d-e 在 0.6 才出现，0.9 时只剩 a-b
+        pairs = [("a", "b", 0.95), ("b", "c", 0.85), ("d", "e", 0.6), ("a", "d", 0.3)]
+        service = ClusterService(make_results(pairs))
+        self.assertEqual(service.cluster_count(0.9), 1)
+        self.assertEqual(service.cluster_count(0.8), 1)
+        self.assertEqual(service.cluster_count(0.6), 2)
+        self.assertEqual(service.cluster_count(0.3), 1)
+        self.assertEqual(service.cluster_count(0.99), 0)
+        service.set_threshold(0.8)
+        self.assertEqual([c.members for c in service.clusters()], [["a", "b", "c"]])
+        # 阈值升高（切断边）后重新从头合并
+        service.set_threshold(0.9)
+        self.assertEqual([c.members for c in service.clusters()], [["a", "b"]])
+
+    def test_thresholds_up_and_down(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            pairs = random_pairs(rng)
+            service = ClusterService(make_results(pairs))
+            for threshold in [rng.choice([0.0, 0.25, 0.5, 0.75, 0.9, 1.0]) for _ in range(8)]:
+                with self.subTest(pairs=pairs, threshold=threshold):
+                    self.assert_matches(service, pairs, threshold)
+
+    def test_rescore(self):
+        rng = random.Random(1)
+        for _ in range(20):
+            pairs = random_pairs(rng)
+            service = ClusterService(make_results(pairs))
+            service.set_threshold(0.5)
+            # 换一组分数（例如调整了权重），按新分数降序传入行号
+            rescored = [(a, b, round(rng.random(), 2)) for a, b, _ in pairs]
+            rows = sorted(range(len(rescored)), key=lambda i: rescored[i][2], reverse=True)
+            service.rescore(rows, [rescored[i][2] for i in rows])
+            self.assertEqual(service.threshold, 0.5)
+            for threshold in (0.5, 0.8, 0.2):
+                with self.subTest(pairs=rescored, threshold=threshold):
+                    self.assert_matches(service, rescored, threshold)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# tests/test_history_manager.py
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from model.history_manager import HistoryManager
+from model.similarity.result import AnalysisSession, ComparisonResult
+
+def make_result(file_a: str, file_b: str, score: float) -> ComparisonResult:
+    return ComparisonResult(file_a, file_b, {"综合可疑度": score}, [])
+
+class SpilledSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.history_file = Path(self.temp.name) / "analysis_history.json"
+        self.manager = HistoryManager(str(self.history_file))
+        self.results = [make_result(f"/code/{i}.py", f"/code/{i + 1}.py", i / 10) for i in range(5)]
+        # 分块分析逐块追加写入的结果文件，顺序与分数无关
+        results_path = self.manager.results_path("s1")
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(results_path, 'w', encoding='utf-8') as f:
+            for result in self.results:
+                f.write(json.dumps(result.to_dict(), ensure_ascii=False) + '\n')
+        session = AnalysisSession("s1", "/code")
+        session.attach_results_file(results_path)
+        self.manager.add_session(session)
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def reload(self) -> AnalysisSession:
+        self.manager = HistoryManager(str(self.history_file))
+        return self.manager.get_session_by_id("s1")
+
+    def test_history_file_does_not_contain_results(self):
+        data = json.loads(self.history_file.read_text(encoding='utf-8'))
+        stored = data['sessions'][0]
+        self.assertNotIn('results', stored)
+        self.assertEqual(stored['results_file'], "s1.jsonl")
+        self.assertEqual(stored['marked_results'], [])
+
+    def test_results_are_loaded_lazily_in_score_order(self):
+        session = self.reload()
+        self.assertFalse(session.results_loaded())
+        self.assertEqual(len(session.get_file_paths()), 6)
+        self.assertFalse(session.results_loaded())
+        self.assertEqual([r.scores["综合可疑度"] for r in session.results], [0.4, 0.3, 0.2, 0.1, 0.0])
+        self.assertTrue(session.results_loaded())
+
+    def test_marks_persist_without_loading_results(self):
+        self.manager.update_result_plagiarism_status("s1", "/code/2.py", "/code/3.py", True, "相同")
+        results_file = self.manager.results_path("s1")
+        written = results_file.stat().st_mtime_ns
+
+        session = self.reload()
+        self.assertEqual(self.manager.marked_count("s1"), 1)
+        self.assertFalse(session.results_loaded())
+        # 取消标记同样不需要读入全部结果
+        self.manager.update_result_plagiarism_status("s1", "/code/3.py", "/code/2.py", False)
+        self.assertFalse(session.results_loaded())
+        self.assertEqual(self.manager.marked_count("s1"), 0)
+        self.assertEqual(results_file.stat().st_mtime_ns, written)
+
+        session = self.reload()
+        self.assertEqual(self.manager.marked_count("s1"), 0)
+        self.assertFalse(any(r.is_plagiarism for r in session.results))
+
+    def test_loaded_results_use_stored_marks(self):
+        self.manager.update_result_plagiarism_status("s1", "/code/2.py", "/code/3.py", True, "相同")
+        session = self.reload()
+        marked = [r for r in session.results if r.is_plagiarism]
+        self.assertEqual([(r.file_a, r.plagiarism_notes) for r in marked], [("/code/2.py", "相同")])
+        self.assertIs(marked[0], self.manager.marked_results("s1")[0])
+
+    def test_results_file_rewritten_when_result_set_changes(self):
+        session = self.reload()
+        session.results.pop()
+        session.add_result(make_result("/code/a.py", "/code/b.py", 0.9))
+        self.manager.add_session_files(session)
+
+        session = self.reload()
+        pairs = [(r.file_a, r.file_b) for r in session.results]
+        self.assertEqual(pairs[0], ("/code/a.py", "/code/b.py"))
+        self.assertNotIn(("/code/0.py", "/code/1.py"), pairs)
+        self.assertEqual(len(pairs), 5)
+
+    def test_marks_changed_without_saving(self):
+        session = self.manager.get_session_by_id("s1")
+        result = next(r for r in session.results if r.file_a == "/code/4.py")
+        result.is_plagiarism = True
+        written = self.history_file.read_text(encoding='utf-8')
+        self.manager.session_marks_changed(session, [result], save=False)
+        self.assertEqual(self.manager.marked_results("s1"), [result])
+        self.assertEqual(self.history_file.read_text(encoding='utf-8'), written)
+
+        self.manager.save_if_dirty()
+        self.reload()
+        self.assertEqual([r.file_a for r in self.manager.marked_results("s1")], ["/code/4.py"])
+
+    def test_clear_history_removes_results(self):
+        self.manager.clear_history()
+        self.assertFalse(self.manager.results_directory().exists())
+
+if __name__ == '__main__':
+    unittest.main()
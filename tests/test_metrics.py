@@ -0,0 +1,72 @@
+# tests/test_metrics.py
+
+import random
+import unittest
+
+from model.similarity.metrics import DPLevenshteinMetric, LevenshteinMetric, build_peq, myers_distance
+
+def dp_distance(a, b) -> int:
+    """由旧的动态规划实现的相似度换算回编辑距离。"""
+    if not a or not b:
+        return max(len(a), len(b))
+    return round((1.0 - DPLevenshteinMetric().calculate(a, b)) * max(len(a), len(b)))
+
+class MyersDistanceTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(0)
+        self.cases = [([], []), ([], [1, 2, 3]), ([1, 2], []), ([1], [1]), ([1], [2])]
+        for _ in range(300):
+            alphabet = rng.choice([2, 4, 20])
+            a = [rng.randrange(alphabet) for _ in range(rng.randrange(0, 90))]
+            if rng.random() < 0.5:
+                # 近似副本：少量随机编辑，距离较小
+                b = list(a)
+                for _ in range(rng.randrange(0, 6)):
+                    pos = rng.randrange(len(b) + 1)
+                    op = rng.randrange(3)
+                    if op == 0 or not b or pos == len(b):
+                        b.insert(pos, rng.randrange(alphabet))
+                    elif op == 1:
+                        del b[pos]
+                    else:
+                        b[pos] = rng.randrange(alphabet)
+            else:
+                b = [rng.randrange(alphabet) for _ in range(rng.randrange(0, 90))]
+            self.cases.append((a, b))
+
+    def test_matches_dynamic_programming(self):
+        for a, b in self.cases:
+            with self.subTest(a=a, b=b):
+                self.assertEqual(myers_distance(a, b), dp_distance(a, b))
+                self.assertEqual(myers_distance(a, b, build_peq(b)), dp_distance(a, b))
+
+    def test_similarity_matches_dynamic_programming(self):
+        metric, reference = LevenshteinMetric(), DPLevenshteinMetric()
+        for a, b in self.cases:
+            with self.subTest(a=a, b=b):
+                self.assertAlmostEqual(metric.calculate(a, b), reference.calculate(a, b))
+
+    def test_max_distance_cutoff(self):
+        # 距离不超过 k 时返回准确距离，超过 k 时返回 k + 1
+        for a, b in self.cases:
+            distance = dp_distance(a, b)
+            for k in {0, 1, max(0, distance - 1), distance, distance + 1, abs(len(a) - len(b))}:
+                with self.subTest(a=a, b=b, k=k):
+                    expected = distance if distance <= k else k + 1
+                    self.assertEqual(myers_distance(a, b, max_distance=k), expected)
+                    self.assertEqual(LevenshteinMetric().is_within(a, b, k), distance <= k)
+
+    def test_cutoff_edge_cases(self):
+        # 长度差超过 k：不扫描即判定超出
+        self.assertEqual(myers_distance([1, 2, 3, 4], [1], max_distance=2), 3)
+        # 空序列：距离为另一侧的长度
+        self.assertEqual(myers_distance([], [1, 2], max_distance=2), 2)
+        self.assertEqual(myers_distance([], [1, 2], max_distance=1), 2)
+        self.assertEqual(myers_distance([], [], max_distance=0), 0)
+        # 距离恰好等于 k
+        self.assertEqual(myers_distance([1, 2, 3], [1, 9, 3], max_distance=1), 1)
+        self.assertEqual(myers_distance([1, 2, 3], [3, 2, 1], max_distance=2), 2)
+        self.assertEqual(myers_distance([1, 2, 3], [3, 2, 1], max_distance=1), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+# tests/test_preprocessors.py
+
+import ast
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from model.similarity.preprocessors import LegacyTokenizer, Tokenizer, _lex, _lex_with_tokenize
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+SNIPPETS = {
+    "续行与括号跨行": "x = 1 + \\\n    2\nf(a,\n  b)[\n0]\n",
+    "三引号字符串": 'a = """one\ntwo"""; b = \'\'\'x\'\'\' + "y"\nc = r"""\\d""" if a else b\n',
+    "反斜杠续行的字符串": "s = 'abc\\\ndef'\nt = 1\n",
+    "制表符缩进": "if x:\n\tif y:\n\t\tpass\n\telse:\n\t  z = 1\n",
+    "注释与空行": "# 头部注释\n\nclass A:\n    # 缩进的注释\n\n    def f(self):  # 行尾注释\n        return 1\n",
+    "无结尾换行": "def f():\n    return 1",
+    "非ASCII标识符": "变量 = 1\nx² = 2\nprint(变量)\n",
+    "字符串前缀": "a = rb'x' + Rb\"y\" + f'{a}' + u'z'\nrb = br = 1\n",
+    "数字": "a = 0x1F + 1_000 + 3.14e-2 + 2j + .5 + 1.\n",
+    "分号与多语句": "import os; x = os.sep\nwhile x: break\n",
+    "最后一行只有空白": "x = 1\n   ",
+    "未闭合的括号": "f(1,\n",
+    "未闭合的字符串": "s = '''abc\n",
+    "错误Token": "a = 1 $ 2\nb = ?\n",
+    "缩进不一致": "if x:\n        a = 1\n    b = 2\n",
+}
+
+def lex_or_error(lexer, source):
+    try:
+        return lexer(source)
+    except Exception as e:
+        return type(e)
+
+class LexerTest(unittest.TestCase):
+    def test_matches_tokenize_on_snippets(self):
+        for name, source in SNIPPETS.items():
+            with self.subTest(name):
+                self.assertEqual(lex_or_error(_lex, source), lex_or_error(_lex_with_tokenize, source))
+
+    def test_matches_tokenize_on_repository(self):
+        for path in sorted(REPO_ROOT.rglob("*.py")):
+            source = path.read_text(encoding="utf-8")
+            with self.subTest(str(path.relative_to(REPO_ROOT))):
+                self.assertEqual(_lex(source), _lex_with_tokenize(source))
+
+class TokenizerTest(unittest.TestCase):
+    def test_compat_matches_legacy(self):
+        legacy, compat = LegacyTokenizer(), Tokenizer(compat=True)
+        sources = dict(SNIPPETS)
+        sources.update((str(path), path.read_text(encoding="utf-8")) for path in sorted(REPO_ROOT.rglob("*.py")))
+        for name, source in sources.items():
+            try:
+                tree = ast.parse(source)
+            except SyntaxError:
+                tree = None
+            with self.subTest(name), redirect_stdout(StringIO()):
+                self.assertEqual(compat.process_source(source, tree), legacy.process_source(source, tree))
+
+    def test_interned_ids_follow_first_occurrence(self):
+        tokenizer = Tokenizer(compat=True)
+        token_ids, _ = tokenizer.normalize("a = b\nb = a\n")
+        self.assertEqual([tokenizer.words[token_id] for token_id in token_ids],
+                         ["VAR", "=", "VAR", "VAR", "=", "VAR"])
+        self.assertEqual(token_ids, [0, 1, 0, 0, 1, 0])
+        self.assertEqual(tokenizer.vocab, {"VAR": 0, "=": 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+# tests/test_scheduler.py
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from model.similarity import CodeAnalyzer
+from model.similarity.scheduler import BlockScheduler
+
+TEST_CODE = Path(__file__).resolve().parent.parent / "test_code"
+
+class Interrupted(Exception):
+    pass
+
+class BlockSchedulerResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.files = sorted(str(path) for path in TEST_CODE.rglob("*.py"))[:8]
+        self.temp = tempfile.TemporaryDirectory()
+        self.work_dir = Path(self.temp.name) / "blocks"
+        self.results_path = Path(self.temp.name) / "results" / "session.jsonl"
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def scheduler(self, **options) -> BlockScheduler:
+        options.setdefault('max_block_size', 3)
+        return BlockScheduler(CodeAnalyzer(), None, str(self.work_dir),
+                              results_path=str(self.results_path), **options)
+
+    def run_all(self, scheduler: BlockScheduler, stop_after: int = None) -> int:
+        hashes = scheduler.prepare(self.files)
+
+        def progress(done, total):
+            if stop_after is not None and done >= stop_after:
+                raise Interrupted()
+        return scheduler.run(self.files, hashes, progress)
+
+    def pairs(self, scheduler: BlockScheduler):
+        return sorted((r.file_a, r.file_b, round(r.scores["综合可疑度"], 12)) for r in scheduler.iter_results())
+
+    def reference(self):
+        results = CodeAnalyzer().run_analysis(self.files)
+        return sorted((r.file_a, r.file_b, round(r.scores["综合可疑度"], 12)) for r in results)
+
+    def test_resume_discards_partial_block(self):
+        with self.assertRaises(Interrupted):
+            self.run_all(self.scheduler(), stop_after=2)
+        manifest = json.loads((self.work_dir / "manifest.json").read_text(encoding='utf-8'))
+        self.assertEqual(len(manifest['completed']), 2)
+        self.assertEqual(self.results_path.stat().st_size, manifest['results_offset'])
+        # 模拟崩溃时写了一半、尚未记入清单的一块结果
+        with open(self.results_path, 'a', encoding='utf-8') as f:
+            f.write('{"file_a": "half')
+
+        scheduler = self.scheduler()
+        newly_completed = self.run_all(scheduler)
+        self.assertEqual(newly_completed, len(scheduler.blocks(len(self.files), 3)) - 2)
+        self.assertEqual(self.pairs(scheduler), self.reference())
+        self.assertEqual(scheduler.statistics.get("综合可疑度").count, len(self.reference()))
+        self.assertTrue(scheduler.is_complete(self.files))
+
+    def test_completed_run_is_not_repeated(self):
+        self.run_all(self.scheduler())
+        scheduler = self.scheduler()
+        self.assertEqual(self.run_all(scheduler), 0)
+        self.assertEqual(self.pairs(scheduler), self.reference())
+
+    def test_manifest_mismatch_starts_over(self):
+        with self.assertRaises(Interrupted):
+            self.run_all(self.scheduler(), stop_after=2)
+        # 分块方式改变后，已完成的块不能复用
+        scheduler = self.scheduler(max_block_size=4)
+        self.assertEqual(self.run_all(scheduler), len(scheduler.blocks(len(self.files), 4)))
+        self.assertEqual(self.pairs(scheduler), self.reference())
+
+    def test_file_list_change_starts_over(self):
+        with self.assertRaises(Interrupted):
+            self.run_all(self.scheduler(), stop_after=2)
+        self.files = self.files[:-1]
+        scheduler = self.scheduler()
+        self.assertEqual(self.run_all(scheduler), len(scheduler.blocks(len(self.files), 3)))
+        self.assertEqual(self.pairs(scheduler), self.reference())
+
+    def test_truncated_results_file_starts_over(self):
+        with self.assertRaises(Interrupted):
+            self.run_all(self.scheduler(), stop_after=2)
+        # 结果文件比清单记录的进度短（例如被删除）时不能在其后补零续写
+        self.results_path.unlink()
+        scheduler = self.scheduler()
+        self.assertEqual(self.run_all(scheduler), len(scheduler.blocks(len(self.files), 3)))
+        self.assertNotIn(b'\0', self.results_path.read_bytes())
+        self.assertEqual(self.pairs(scheduler), self.reference())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# tests/test_score_index.py
+
+import json
+import random
+import tempfile
+import unittest
+from pathlib import Path
+
+from model.similarity.result import AnalysisSession, ComparisonResult
+from model.similarity.score_index import ScoreIndex
+from model.similarity.score_stats import ScoreStatistics
+
+METRICS = ["AST结构相似度", "Token序列相似度", "文本相似度"]
+
+def random_results(rng, count=200):
+    results = []
+    for i in range(count):
+        scores = {name: round(rng.random(), 3) for name in METRICS}
+        scores["综合可疑度"] = sum(scores.values()) / len(METRICS)
+        results.append(ComparisonResult(f"a{i}.py", f"b{i}.py", scores, []))
+    return results
+
+def weighted(result, weights):
+    return sum(result.scores[name] * weights.get(name, 0) for name in METRICS)
+
+class ScoreIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.results = random_results(self.rng)
+        self.index = ScoreIndex(self.results)
+
+    def test_threshold_queries(self):
+        for threshold in (0.0, 0.25, 0.5, 0.731, 1.0):
+            expected = [r for r in self.results if r.scores["综合可疑度"] >= threshold]
+            with self.subTest(threshold=threshold):
+                self.assertEqual(self.index.count_above("综合可疑度", threshold), len(expected))
+                above = self.index.results_above("综合可疑度", threshold)
+                self.assertEqual({id(r) for r in above}, {id(r) for r in expected})
+                scores = [r.scores["综合可疑度"] for r in above]
+                self.assertEqual(scores, sorted(scores, reverse=True))
+        between = self.index.results_between("文本相似度", 0.2, 0.6)
+        self.assertEqual({id(r) for r in between},
+                         {id(r) for r in self.results if 0.2 <= r.scores["文本相似度"] < 0.6})
+        self.assertEqual(self.index.count_above("不存在的指标", 0.5), 0)
+        self.assertEqual(self.index.results_above("不存在的指标", 0.5), [])
+
+    def test_apply_defers_write_back(self):
+        weights = {"AST结构相似度": 0.6, "Token序列相似度": 0.1, "文本相似度": 0.3}
+        before = [r.scores["综合可疑度"] for r in self.results]
+        self.index.table.apply(weights)
+        self.index.reindex("综合可疑度")
+        # 写回之前结果的 scores 不变，索引和按结果查询已经使用新分数
+        self.assertEqual([r.scores["综合可疑度"] for r in self.results], before)
+        for r in self.results[:20]:
+            self.assertAlmostEqual(self.index.score(r, "综合可疑度"), weighted(r, weights))
+        rows, scores = self.index.ranking("综合可疑度")
+        expected = sorted((weighted(r, weights) for r in self.results), reverse=True)
+        for score, value in zip(scores.tolist(), expected):
+            self.assertAlmostEqual(score, value)
+
+        self.index.table.write_back()
+        for r in self.results:
+            self.assertAlmostEqual(r.scores["综合可疑度"], weighted(r, weights))
+
+class ScoreStatisticsTest(unittest.TestCase):
+    def test_from_values_matches_add(self):
+        rng = random.Random(3)
+        values = [rng.random() for _ in range(1000)] + [0.0, 1.0, 1.2, -0.1]
+        incremental = ScoreStatistics()
+        for value in values:
+            incremental.add(value)
+        bulk = ScoreStatistics.from_values(values)
+        self.assertEqual(bulk.count, incremental.count)
+        self.assertEqual(bulk.bins, incremental.bins)
+        self.assertAlmostEqual(bulk.mean, incremental.mean)
+        self.assertAlmostEqual(bulk.variance, incremental.variance)
+        self.assertEqual(ScoreStatistics.from_values([]).count, 0)
+
+class SessionWeightsTest(unittest.TestCase):
+    def test_deferred_update_runs_on_next_access(self):
+        session = AnalysisSession("s1", "/code")
+        session.results = random_results(random.Random(1), 5)
+        calls = []
+        session.defer_update(lambda: calls.append(len(session.results)))
+        self.assertEqual(calls, [])
+        self.assertEqual(len(session.results), 5)
+        session.results
+        self.assertEqual(calls, [5])
+
+    def test_spilled_results_are_rescored_with_saved_weights(self):
+        results = random_results(random.Random(5), 20)
+        weights = {"AST结构相似度": 0.0, "Token序列相似度": 0.2, "文本相似度": 0.8}
+        with tempfile.TemporaryDirectory() as temp:
+            results_path = Path(temp) / "s1.jsonl"
+            with open(results_path, 'w', encoding='utf-8') as f:
+                for result in results:
+                    f.write(json.dumps(result.to_dict(), ensure_ascii=False) + '\n')
+            session = AnalysisSession("s1", "/code")
+            session.attach_results_file(results_path)
+            session.weights = weights
+            data = session.to_dict()
+            self.assertEqual(data['weights'], weights)
+
+            loaded = AnalysisSession.from_dict(data, results_directory=Path(temp))
+            scores = [r.scores["综合可疑度"] for r in loaded.results]
+            expected = sorted((weighted(r, weights) for r in results), reverse=True)
+            for score, value in zip(scores, expected):
+                self.assertAlmostEqual(score, value)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# tests/test_segments.py
+
+import random
+import unittest
+from types import SimpleNamespace
+
+from model.similarity.segments import SegmentFinder
+
+def reference_tiles(a, b, min_len):
+    """逐对扫描的经典 Greedy String Tiling，长度相同的匹配按 (B起始下标, A起始下标) 铺设。"""
+    marked_a, marked_b = [False] * len(a), [False] * len(b)
+    tiles = []
+    while True:
+        longest, matches = min_len, []
+        for j in range(len(b)):
+            for i in range(len(a)):
+                k = 0
+                while i + k < len(a) and j + k < len(b) and a[i + k] == b[j + k] \
+                        and not marked_a[i + k] and not marked_b[j + k]:
+                    k += 1
+                if k > longest:
+                    longest, matches = k, []
+                if k == longest:
+                    matches.append((j, i))
+        if not matches:
+            return sorted(tiles)
+        for j, i in sorted(matches):
+            if not any(marked_a[i:i + longest]) and not any(marked_b[j:j + longest]):
+                marked_a[i:i + longest] = [True] * longest
+                marked_b[j:j + longest] = [True] * longest
+                tiles.append((i, j, longest))
+
+def profile(ids):
+    return SimpleNamespace(highlight_ids=ids)
+
+class FindTilesTest(unittest.TestCase):
+    def test_later_occurrence_in_a(self):
+        # B 中的 [1..5] 在 A 中第一次出现的位置已被更长的瓦片覆盖，应铺设到第二次出现的位置
+        a = [1, 2, 3, 4, 5, 6, 7, 9, 1, 2, 3, 4, 5]
+        b = [1, 2, 3, 4, 5, 6, 7, 8, 1, 2, 3, 4, 5]
+        tiles = SegmentFinder(min_match_length=3).find_tiles(profile(a), profile(b))
+        self.assertEqual(tiles, [(0, 0, 7), (8, 8, 5)])
+
+    def test_matches_reference_tiling(self):
+        rng = random.Random(0)
+        for trial in range(300):
+            alphabet, min_len = rng.choice([2, 3, 5]), rng.choice([2, 3, 4])
+            a = [rng.randrange(alphabet) for _ in range(rng.randrange(1, 40))]
+            b = [rng.randrange(alphabet) for _ in range(rng.randrange(1, 40))]
+            with self.subTest(a=a, b=b, min_len=min_len):
+                tiles = SegmentFinder(min_match_length=min_len).find_tiles(profile(a), profile(b))
+                self.assertEqual(tiles, reference_tiles(a, b, min_len))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+# tests/test_units.py
+
+import unittest
+
+from model.similarity.units import CodeUnit, UnitIndex
+
+BODY = ("def FUNC ( VAR , VAR ) : VAR = [ ] for VAR in VAR : if VAR > VAR : "
+        "VAR . append ( VAR * 2 ) else : VAR . append ( VAR + 1 ) return VAR").split()
+
+def near_copy(variant: int) -> CodeUnit:
+    # 每份只改动一个常量：彼此近似相同，但归一化Token并不完全相同
+    tokens = BODY + ["+", str(variant)]
+    return CodeUnit("f", tokens, (1, 0), (10, 0), kgram_size=5)
+
+class UnitIndexTest(unittest.TestCase):
+    def test_near_duplicate_shared_by_many_files(self):
+        # 所有 k-gram 都出现在上百个单元中时仍要检索到近似匹配
+        count = 120
+        index = UnitIndex()
+        for variant in range(count):
+            index.add(f"file{variant}.py", near_copy(variant))
+        pairs = {(a, b) for a, _, b, _, _ in index.matches()}
+        self.assertEqual(len(pairs), count * (count - 1) // 2)
+
+    def test_unrelated_units_not_matched(self):
+        index = UnitIndex()
+        index.add("a.py", near_copy(0))
+        index.add("b.py", CodeUnit("g", ("while VAR : VAR = VAR - 1 " * 8).split(), (1, 0), (5, 0), kgram_size=5))
+        self.assertEqual(list(index.matches()), [])
+
+if __name__ == '__main__':
+    unittest.main()
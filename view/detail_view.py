@@ -2,41 +2,161 @@
 
 from PyQt5.QtWidgets import QWidget, QPlainTextEdit, QHBoxLayout
 from PyQt5.QtGui import QTextCharFormat, QSyntaxHighlighter, QColor
+from PyQt5.QtCore import QTimer
 from model.similarity import ComparisonResult
+from model.similarity.profile import decode_source
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+
+# 超过该行数的文件分块写入编辑器，避免一次性 setPlainText 阻塞界面
+LARGE_FILE_LINES = 2000
+LOAD_CHUNK_LINES = 500
+
+def build_line_spans(segments, is_file_a: bool) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    将匹配片段预先按行展开为 {行号(1-based): [(起始列, 结束列), ...]}。
+    结束列为 -1 表示一直高亮到行尾。
+    """
+    line_spans: Dict[int, List[Tuple[int, int]]] = {}
+    for segment in segments:
+        # 根据当前是文件A还是文件B，选择对应的坐标
+        start_pos, end_pos = (segment[0], segment[1]) if is_file_a else (segment[2], segment[3])
+        start_line, start_col = start_pos
+        end_line, end_col = end_pos
+
+        for line in range(start_line, end_line + 1):
+            span_start = start_col if line == start_line else 0
+            span_end = end_col if line == end_line else -1
+            line_spans.setdefault(line, []).append((span_start, span_end))
+    return line_spans
+
+class DetailCache:
+    """
+    详细对比视图的数据缓存：解码后的源码和按行展开的高亮片段各自保存在一个 LRU 中，
+    并可在后台线程中预取，双击时不必再读盘和重新计算高亮。
+    本类不涉及 Qt 对象，预取线程只填充缓存。
+    """
+    def __init__(self, max_sources: int = 64, max_pairs: int = 128, prefetch_workers: int = 2):
+        self.max_sources = max_sources
+        self.max_pairs = max_pairs
+        # 可选的源码来源（例如已导入文件的内存内容），返回 None 时从磁盘读取
+        self.source_lookup: Optional[Callable[[str], Optional[bytes]]] = None
+        self._sources: "OrderedDict[str, str]" = OrderedDict()
+        # (文件A, 文件B) -> (片段列表, A 的行高亮, B 的行高亮)；片段列表对象变化时视为失效
+        self._spans: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次 invalidate 递增；读取期间缓存被作废时，读到的旧内容不再写入缓存
+        self._epoch = 0
+        self._prefetch_workers = prefetch_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # 每次 prefetch 递增，排队中的旧预取任务直接放弃
+        self._prefetch_generation = 0
+
+    def source(self, path: str) -> str:
+        """返回文件的文本内容；读取失败时抛出异常且不缓存。"""
+        with self._lock:
+            text = self._sources.get(path)
+            if text is not None:
+                self._sources.move_to_end(path)
+                return text
+            epoch = self._epoch
+        data = self.source_lookup(path) if self.source_lookup else None
+        # 与预处理阶段相同的解码与换行处理，匹配片段的坐标才能对上
+        text = decode_source(data if data is not None else Path(path).read_bytes())
+        with self._lock:
+            if epoch == self._epoch:
+                self._sources[path] = text
+                while len(self._sources) > self.max_sources:
+                    self._sources.popitem(last=False)
+        return text
+
+    def line_spans(self, comparison: ComparisonResult) -> Tuple[Dict, Dict]:
+        """返回代码对两侧按行展开的高亮片段。"""
+        key = (comparison.file_a, comparison.file_b)
+        with self._lock:
+            entry = self._spans.get(key)
+            if entry is not None and entry[0] is comparison.segments:
+                self._spans.move_to_end(key)
+                return entry[1], entry[2]
+        spans_a = build_line_spans(comparison.segments, is_file_a=True)
+        spans_b = build_line_spans(comparison.segments, is_file_a=False)
+        with self._lock:
+            self._spans[key] = (comparison.segments, spans_a, spans_b)
+            self._spans.move_to_end(key)
+            while len(self._spans) > self.max_pairs:
+                self._spans.popitem(last=False)
+        return spans_a, spans_b
+
+    def prefetch(self, comparisons: Iterable[ComparisonResult]):
+        """在后台线程中预先读取并缓存这些代码对（放弃之前尚未开始的预取）。"""
+        comparisons = list(comparisons)
+        if not comparisons:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._prefetch_workers,
+                                                thread_name_prefix="detail-prefetch")
+        self._prefetch_generation += 1
+        generation = self._prefetch_generation
+        for comparison in comparisons:
+            self._executor.submit(self._warm, comparison, generation)
+
+    def _warm(self, comparison: ComparisonResult, generation: int):
+        if generation != self._prefetch_generation:
+            return
+        try:
+            self.source(comparison.file_a)
+            self.source(comparison.file_b)
+        except Exception:
+            # 读取失败留给 show 时再报告
+            return
+        self.line_spans(comparison)
+
+    def invalidate(self, paths: Iterable[str] = None):
+        """丢弃指定文件（为 None 时全部）的缓存，文件内容变化后调用。"""
+        self._prefetch_generation += 1
+        with self._lock:
+            self._epoch += 1
+            if paths is None:
+                self._sources.clear()
+                self._spans.clear()
+                return
+            paths = set(paths)
+            for path in paths:
+                self._sources.pop(path, None)
+            for key in [key for key in self._spans if key[0] in paths or key[1] in paths]:
+                del self._spans[key]
+
+    def shutdown(self):
+        self._prefetch_generation += 1
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
 class CodeHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent, segments, is_file_a: bool):
+    def __init__(self, parent, line_spans: Dict[int, List[Tuple[int, int]]]):
         super().__init__(parent.document())
-        self.segments = segments
-        self.is_file_a = is_file_a
+        self.line_spans = line_spans
         self.format = QTextCharFormat()
         self.format.setBackground(QColor('#FFFF99'))  # 换了个柔和的黄色
 
     def highlightBlock(self, text: str):
         """
-        在给定的文本块（一行代码）上应用高亮。
+        在给定的文本块（一行代码）上应用高亮，只处理该行自己的片段。
         """
         # 获取当前行的行号（1-based）
         current_line_num = self.currentBlock().blockNumber() + 1
 
-        for segment in self.segments:
-            # 根据当前是文件A还是文件B，选择对应的坐标
-            start_pos, end_pos = (segment[0], segment[1]) if self.is_file_a else (segment[2], segment[3])
-            
-            start_line, start_col = start_pos
-            end_line, end_col = end_pos
-
-            # 检查当前行是否在需要高亮的范围之内
-            if start_line <= current_line_num <= end_line:
-                # 计算在当前行内高亮的起始列和结束列
-                highlight_start_col = start_col if current_line_num == start_line else 0
-                highlight_end_col = end_col if current_line_num == end_line else len(text)
-                
-                # 应用高亮
-                length = highlight_end_col - highlight_start_col
-                if length > 0:
-                    self.setFormat(highlight_start_col, length, self.format)
+        for highlight_start_col, highlight_end_col in self.line_spans.get(current_line_num, ()):
+            if highlight_end_col < 0:
+                highlight_end_col = len(text)
+
+            # 应用高亮
+            length = highlight_end_col - highlight_start_col
+            if length > 0:
+                self.setFormat(highlight_start_col, length, self.format)
 
 class DetailView(QWidget):
     def __init__(self):
@@ -49,26 +169,50 @@ class DetailView(QWidget):
         self.editor_b.setReadOnly(True)
         layout.addWidget(self.editor_a)
         layout.addWidget(self.editor_b)
-        self._highlighters = []
+        self.cache = DetailCache()
+        # 高亮器常驻，切换代码对时只替换按行索引的片段，文本重设时自动重新着色
+        self._highlighter_a = CodeHighlighter(self.editor_a, {})
+        self._highlighter_b = CodeHighlighter(self.editor_b, {})
+        # 每次 show 递增，用于丢弃上一次尚未完成的分块加载
+        self._load_generation = 0
 
     def show(self, comparison: ComparisonResult):
         """根据 ComparisonResult 更新左右编辑器，并高亮相似代码段。"""
-        # 读取并设置文本
+        # 读取文本（优先取缓存或预取结果）
         try:
-            code_a = Path(comparison.file_a).read_text(encoding='utf-8')
-            code_b = Path(comparison.file_b).read_text(encoding='utf-8')
+            code_a = self.cache.source(comparison.file_a)
+            code_b = self.cache.source(comparison.file_b)
+            spans_a, spans_b = self.cache.line_spans(comparison)
         except Exception as e:
             code_a = f"无法读取文件: {comparison.file_a}\n错误: {e}"
             code_b = f"无法读取文件: {comparison.file_b}\n错误: {e}"
-        self.editor_a.setPlainText(code_a)
-        self.editor_b.setPlainText(code_b)
-
-        # 清除旧高亮器
-        for hl in self._highlighters:
-            hl.setDocument(None) # 解除与文档的关联
-        self._highlighters.clear()
-
-        # 创建并应用新高亮器
-        hl_a = CodeHighlighter(self.editor_a, comparison.segments, is_file_a=True)
-        hl_b = CodeHighlighter(self.editor_b, comparison.segments, is_file_a=False)
-        self._highlighters.extend([hl_a, hl_b])
\ No newline at end of file
+            spans_a, spans_b = {}, {}
+
+        # 片段已按行索引，先替换再设置文本，每行只着色一次
+        self._highlighter_a.line_spans = spans_a
+        self._highlighter_b.line_spans = spans_b
+
+        self._load_generation += 1
+        self._set_text(self.editor_a, code_a)
+        self._set_text(self.editor_b, code_b)
+
+    def prefetch(self, comparisons: Iterable[ComparisonResult]):
+        """后台预取接下来可能打开的代码对。"""
+        self.cache.prefetch(comparisons)
+
+    def _set_text(self, editor: QPlainTextEdit, code: str):
+        """小文件直接设置文本；大文件先显示开头部分，其余在事件循环中分块追加。"""
+        lines = code.split('\n')
+        if len(lines) <= LARGE_FILE_LINES:
+            editor.setPlainText(code)
+            return
+
+        editor.setPlainText('\n'.join(lines[:LOAD_CHUNK_LINES]))
+        self._append_chunk(editor, lines, LOAD_CHUNK_LINES, self._load_generation)
+
+    def _append_chunk(self, editor: QPlainTextEdit, lines: List[str], start: int, generation: int):
+        if generation != self._load_generation or start >= len(lines):
+            return
+        end = start + LOAD_CHUNK_LINES
+        editor.appendPlainText('\n'.join(lines[start:end]))
+        QTimer.singleShot(0, lambda: self._append_chunk(editor, lines, end, generation))
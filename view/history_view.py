@@ -8,6 +8,8 @@ from PyQt5.QtCore import Qt, pyqtSignal
 from datetime import datetime
 from pathlib import Path
 
+from model.history_manager import HistoryEvent
+
 class PlagiarismMarkDialog(QDialog):
     """抄袭标记对话框"""
     def __init__(self, file_a: str, file_b: str, parent=None):
@@ -54,6 +56,8 @@ class HistoryView(QWidget):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        # 会话ID -> 列表项，用于按事件单独更新某个会话
+        self._items = {}
         self.setup_ui()
         
     def setup_ui(self):
@@ -96,28 +100,44 @@ class HistoryView(QWidget):
         
         layout.addLayout(button_layout_above)
         layout.addLayout(button_layout_behind)
-        
-        # 初始加载
-        self.refresh_sessions()
+        # 列表内容在主窗口首次绘制后由 MainWindow 填充
     
     def refresh_sessions(self):
         """刷新历史会话列表"""
         self.session_list.clear()
-        sessions = self.controller.get_all_sessions()
-        
-        for session in sessions:
-            # 创建会话项
-            session_text = f"{session.analysis_time.strftime('%Y-%m-%d %H:%M')} - {Path(session.directory).name}"
-            if session.get_plagiarism_results():
-                session_text += " [包含抄袭判定]"
-            
-            item = QListWidgetItem(session_text)
-            item.setData(Qt.UserRole, session.session_id)
-            self.session_list.addItem(item)
+        self._items = {}
+        for session in self.controller.get_all_sessions():
+            self._add_session_item(session)
+
+    def _session_text(self, session) -> str:
+        session_text = f"{session.analysis_time.strftime('%Y-%m-%d %H:%M')} - {Path(session.directory).name}"
+        marked_count = self.controller.get_marked_count(session.session_id)
+        if session.is_in_progress():
+            session_text += " [未完成，双击继续]"
+        elif marked_count:
+            session_text += f" [包含抄袭判定 {marked_count} 条]"
+        return session_text
+
+    def _add_session_item(self, session):
+        item = QListWidgetItem(self._session_text(session))
+        item.setData(Qt.UserRole, session.session_id)
+        self.session_list.addItem(item)
+        self._items[session.session_id] = item
+
+    def apply_history_event(self, event: HistoryEvent):
+        """按历史变化事件只更新受影响的会话项，不重建整个列表"""
+        if event.kind == HistoryEvent.CLEARED:
+            self.session_list.clear()
+            self._items = {}
+            return
+        item = self._items.get(event.session.session_id)
+        if item is None:
+            self._add_session_item(event.session)
+        else:
+            item.setText(self._session_text(event.session))
     
     def clear_history(self):
         """清除历史会话列表"""
-        self.session_list.clear()
         self.controller.clear_all_histories()
 
     def on_session_selected(self, item):
@@ -127,13 +147,17 @@ class HistoryView(QWidget):
     
     def export_plagiarism_report(self):
         """导出抄袭报告"""
-        file_path, _ = QFileDialog.getSaveFileName(
+        file_path, selected_filter = QFileDialog.getSaveFileName(
             self, "保存抄袭报告", 
             f"plagiarism_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            "JSON文件 (*.json)"
+            "JSON文件 (*.json);;JSON Lines文件 (*.jsonl);;CSV文件 (*.csv)"
         )
         
         if file_path:
+            # 以所选过滤器决定导出格式
+            for suffix in ('.jsonl', '.csv'):
+                if f"*{suffix}" in selected_filter and not file_path.lower().endswith(suffix):
+                    file_path = str(Path(file_path).with_suffix(suffix))
             if self.controller.export_plagiarism_report(file_path):
                 QMessageBox.information(self, "成功", "抄袭报告导出成功！")
             else:
@@ -144,7 +168,11 @@ class HistoryView(QWidget):
         dir_path = QFileDialog.getExistingDirectory(self, "选择导出目录")
         
         if dir_path:
-            if self.controller.export_plagiarism_files(dir_path):
+            as_zip = QMessageBox.question(
+                self, "导出方式", "是否将抄袭文件打包为单个 zip 文件？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            ) == QMessageBox.Yes
+            if self.controller.export_plagiarism_files(dir_path, as_zip=as_zip):
                 QMessageBox.information(self, "成功", "抄袭文件导出成功！")
             else:
                 QMessageBox.warning(self, "错误", "抄袭文件导出失败！")
@@ -154,6 +182,8 @@ class PlagiarismManagementView(QWidget):
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        # (会话ID, 文件A, 文件B) -> 列表项
+        self._items = {}
         self.setup_ui()
     
     def setup_ui(self):
@@ -173,28 +203,62 @@ class PlagiarismManagementView(QWidget):
         self.refresh_btn = QPushButton("刷新抄袭记录")
         self.refresh_btn.clicked.connect(self.refresh_plagiarism_sessions)
         layout.addWidget(self.refresh_btn)
-        
-        # 初始加载
-        self.refresh_plagiarism_sessions()
+        # 列表内容在主窗口首次绘制后由 MainWindow 填充
     
     def refresh_plagiarism_sessions(self):
         """刷新抄袭会话列表"""
         self.plagiarism_list.clear()
-        sessions = self.controller.get_plagiarism_sessions()
-        
-        for session in sessions:
-            for result in session.get_plagiarism_results():
-                item_text = f"{session.analysis_time.strftime('%Y-%m-%d %H:%M')} - {Path(result.file_a).name} vs {Path(result.file_b).name}"
-                if result.plagiarism_notes:
-                    item_text += f" (备注: {result.plagiarism_notes[:20]}...)"
-                
-                item = QListWidgetItem(item_text)
-                item.setData(Qt.UserRole, {
-                    'session_id': session.session_id,
-                    'file_a': result.file_a,
-                    'file_b': result.file_b
-                })
-                self.plagiarism_list.addItem(item)
+        self._items = {}
+        for session in self.controller.get_plagiarism_sessions():
+            for result in self.controller.get_marked_results(session.session_id):
+                self._set_result_item(session, result)
+
+    @staticmethod
+    def _result_text(session, result) -> str:
+        item_text = f"{session.analysis_time.strftime('%Y-%m-%d %H:%M')} - {Path(result.file_a).name} vs {Path(result.file_b).name}"
+        if result.plagiarism_notes:
+            item_text += f" (备注: {result.plagiarism_notes[:20]}...)"
+        return item_text
+
+    def _set_result_item(self, session, result):
+        """添加或更新一个抄袭结果项"""
+        key = (session.session_id, result.file_a, result.file_b)
+        item = self._items.get(key)
+        if item is not None:
+            item.setText(self._result_text(session, result))
+            return
+        item = QListWidgetItem(self._result_text(session, result))
+        item.setData(Qt.UserRole, {
+            'session_id': session.session_id,
+            'file_a': result.file_a,
+            'file_b': result.file_b
+        })
+        self.plagiarism_list.addItem(item)
+        self._items[key] = item
+
+    def _remove_item(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.plagiarism_list.takeItem(self.plagiarism_list.row(item))
+
+    def apply_history_event(self, event: HistoryEvent):
+        """按历史变化事件只增删受影响的结果项，不重建整个列表"""
+        if event.kind == HistoryEvent.CLEARED:
+            self.plagiarism_list.clear()
+            self._items = {}
+        elif event.kind == HistoryEvent.RESULT_MARKED:
+            self._set_result_item(event.session, event.result)
+        elif event.kind == HistoryEvent.RESULT_UNMARKED:
+            self._remove_item((event.session.session_id, event.result.file_a, event.result.file_b))
+        else:
+            # 会话新增或一批标记变化：只重排这个会话的结果项
+            session_id = event.session.session_id
+            marked = {(session_id, r.file_a, r.file_b): r
+                      for r in self.controller.get_marked_results(session_id)}
+            for key in [key for key in self._items if key[0] == session_id and key not in marked]:
+                self._remove_item(key)
+            for result in marked.values():
+                self._set_result_item(event.session, result)
     
     def on_plagiarism_item_selected(self, item):
         """抄袭项被选中"""
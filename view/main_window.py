@@ -1,9 +1,10 @@
 # view/main_window.py
 
 from PyQt5.QtWidgets import QMainWindow, QSplitter, QFileDialog, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from pathlib import Path
 from datetime import datetime
+from contextlib import contextmanager
 
 # 导入新的面板类
 from view.panels.left_panel import LeftPanel
@@ -14,10 +15,12 @@ from view.dialog_view import AutoMarkDialog
 METRIC_DESCRIPTIONS = {
     "综合可疑度": "综合所有单一指标的加权平均分，作为评估整体抄袭可能性的主要依据。",
     "逻辑顺序相似度": "衡量两份代码是否存在大量逻辑顺序相同的代码片段。此指标越高，说明一份代码很可能是从另一份直接复制并稍加修改得来的。",
-    "结构指纹相似度": "通过提取代码中的核心逻辑结构（如循环、判断分支等）并生成'指纹'，来比较两份代码在架构上的相似性。此指标越高，说明代码的'骨架'越相似。",
+    "结构指纹相似度": "自底向上为代码中每一棵较大的语法子树（如整个循环、分支或函数）计算忽略命名和常量取值的结构哈希，比较两份代码共有的子树比例。此指标越高，说明代码的'骨架'越相似；右键“查看相同结构”可列出具体位置。",
     "词汇重合度": "衡量两份代码使用了多少相同的'词汇'（如变量名、函数名等），不考虑代码顺序。此指标越高，说明两份代码的'用词'越相似。",
     "序列匹配度": "通过寻找两份代码中最长的连续匹配块，并递归地处理剩余部分，来计算总体的匹配程度。此指标越高，说明两份代码中可以找到的相同代码片段越多、越长。",
-    "语法构成相似度": "通过统计代码中各类语法元素（赋值、函数调用、算术运算等）的使用频率，来比较两份代码在编程风格和语法构成上的相似性。"
+    "编辑距离相似度": "计算把一份代码的归一化Token序列改写成另一份所需的最少插入、删除、替换次数，并换算为相似度。此指标越高，说明两份代码在整体上只有零星改动。",
+    "语法构成相似度": "通过统计代码中各类语法元素（赋值、函数调用、算术运算等）的使用频率，来比较两份代码在编程风格和语法构成上的相似性。",
+    "函数级匹配度": "仅在函数级比较模式下计算。把代码切分为函数/方法后检索相同或高度相似的函数，按被匹配函数占全部函数代码的比例评分。即使只从大文件中抄袭了一个函数，此指标也会很高。"
 }
 
 class MainWindow(QMainWindow):
@@ -29,8 +32,10 @@ class MainWindow(QMainWindow):
 
         # 状态管理
         base_metrics = list(self.controller.analyzer.metrics.keys())
-        self.all_metrics = ["综合可疑度"] + base_metrics
+        self.all_metrics = ["综合可疑度"] + base_metrics + ["函数级匹配度"]
         self.active_metrics = self.all_metrics[:]
+        # 后台导入完成后显示的状态文字
+        self._import_status = ""
 
         # 创建核心UI面板
         self.left_panel = LeftPanel(controller)
@@ -49,19 +54,51 @@ class MainWindow(QMainWindow):
         # 控制器注入视图
         self.controller.result_view = self.center_panel
         self.controller.detail_view = self.right_panel.detail_view
+        self.right_panel.detail_view.cache.source_lookup = self.controller.detail_source
         self.center_panel.update_view(self.active_metrics)
         self.center_panel.clear_markings_requested.connect(self.on_clear_markings)
+        self._deferred_populated = False
+
+    def showEvent(self, event):
+        """首次显示后再填充历史与抄袭管理列表，避免阻塞首次绘制。"""
+        super().showEvent(event)
+        if not self._deferred_populated:
+            self._deferred_populated = True
+            QTimer.singleShot(0, self._populate_deferred_views)
+
+    def _populate_deferred_views(self):
+        """等待后台历史加载完成后填充相关视图，期间不阻塞事件循环。"""
+        if not self.controller.history_manager.is_loaded():
+            self.right_panel.log_label.setText("状态：正在加载历史记录...")
+            QTimer.singleShot(20, self._populate_deferred_views)
+            return
+        self.left_panel.history_view.refresh_sessions()
+        self.right_panel.plagiarism_view.refresh_plagiarism_sessions()
+        self.right_panel.log_label.setText("状态：就绪")
 
     def _connect_signals(self):
         """集中管理所有信号和槽的连接。"""
         # 弹窗信号连接
         self.controller.show_auto_mark_dialog_requested.connect(self._show_auto_mark_dialog)
+        self.controller.import_progress.connect(self.left_panel.set_import_progress)
+        self.controller.import_finished.connect(self.on_import_finished)
+        self.controller.analysis_progress.connect(self.left_panel.set_analysis_progress)
+        self.controller.watch_pairs_found.connect(self.on_watch_pairs_found)
+        # 历史记录变化时两个列表只更新受影响的条目
+        self.controller.history_changed.connect(self.left_panel.history_view.apply_history_event)
+        self.controller.history_changed.connect(self.right_panel.plagiarism_view.apply_history_event)
 
         # 右侧面板信号 -> MainWindow槽函数
         self.right_panel.import_directory_clicked.connect(self.open_directory)
         self.right_panel.import_files_clicked.connect(self.open_files)
         self.right_panel.analyze_clicked.connect(self.run_analysis)
+        self.right_panel.watch_toggled.connect(self.on_watch_toggled)
+        self.right_panel.function_mode_toggled.connect(self.on_function_mode_toggled)
+        self.right_panel.template_select_clicked.connect(self.on_select_templates)
+        self.right_panel.template_clear_clicked.connect(self.on_clear_templates)
+        self.right_panel.frequency_filter_toggled.connect(self.on_frequency_filter_toggled)
         self.right_panel.metric_toggled.connect(self.on_metric_toggled)
+        self.right_panel.weights_changed.connect(self.on_weights_changed)
 
         # 左侧面板信号 -> MainWindow槽函数
         self.left_panel.reset_files_clicked.connect(self.on_reset_files)
@@ -75,6 +112,13 @@ class MainWindow(QMainWindow):
         self.center_panel.auto_marking_toggled.connect(self.on_auto_marking_toggled)
         self.center_panel.clear_markings_requested.connect(self.on_clear_markings)
         self.center_panel.export_graph_requested.connect(self.on_export_graph)
+        self.center_panel.export_graph_lod_requested.connect(self.on_export_graph_lod)
+        self.center_panel.threshold_changed.connect(self.on_threshold_changed)
+        self.center_panel.threshold_committed.connect(self.on_threshold_committed)
+        self.center_panel.structure_clones_requested.connect(self.on_structure_clones_requested)
+        self.center_panel.view_distribution_requested.connect(self.on_view_distribution)
+        self.center_panel.distribution_threshold_requested.connect(self.on_distribution_threshold)
+        self.center_panel.prefetch_requested.connect(self.controller.prefetch_details)
 
     def _show_auto_mark_dialog(self):
         """显示自动标记提示框，并根据结果更新Controller状态"""
@@ -90,24 +134,113 @@ class MainWindow(QMainWindow):
             # 同步更新CenterPanel中的复选框状态
             self.center_panel.auto_mark_checkbox.setChecked(not settings['stop_auto_marking'])
         
+    def _set_panels_enabled(self, enabled: bool):
+        for panel in (self.left_panel, self.center_panel, self.right_panel):
+            panel.setEnabled(enabled)
+
+    @contextmanager
+    def _busy(self):
+        """
+        分析在GUI线程上执行（导入在后台线程中进行，见 _start_import）。
+        期间禁用各面板（监视轮询与关闭窗口由控制器的 busy 标志拦截），避免操作中途被再次触发。
+        """
+        self._set_panels_enabled(False)
+        self.controller.busy = True
+        try:
+            yield
+        finally:
+            self.controller.busy = False
+            self._set_panels_enabled(True)
+
+    def _start_import(self, status: str, start):
+        """禁用各面板并启动后台导入；导入结束时由 on_import_finished 恢复界面。"""
+        self._import_status = status
+        self._set_panels_enabled(False)
+        start()
+
+    def on_import_finished(self, succeeded: bool):
+        self._set_panels_enabled(True)
+        self.right_panel.log_label.setText(self._import_status if succeeded else "状态：导入失败")
+        self._update_file_list_ui()
+
+    def closeEvent(self, event):
+        """导入或分析进行中时不关闭窗口"""
+        if self.controller.busy:
+            event.ignore()
+            return
+        super().closeEvent(event)
+
     def run_analysis(self):
         """执行分析并使用当前激活的指标更新视图"""
         self.right_panel.log_label.setText("状态：正在分析中...")
-        response = self.controller.trigger_analysis()
+        with self._busy():
+            response = self.controller.trigger_analysis()
         if response:
             self.right_panel.log_label.setText("状态：分析完成")
-            self.center_panel.set_data(self.controller.current_session.results)
+            self.center_panel.set_data(self.controller.current_session.results,
+                                     self.controller.current_session.get_statistics())
             self.center_panel.update_view(self.active_metrics)
-            self.left_panel.history_view.refresh_sessions()
         else:
             self.right_panel.log_label.setText("状态：无文件可查重")
 
+    def on_function_mode_toggled(self, checked: bool):
+        """切换整文件比较与函数级比较"""
+        self.controller.set_granularity("function" if checked else "file")
+        mode = "函数级" if checked else "整文件"
+        self.right_panel.log_label.setText(f"状态：已切换为{mode}比较，下次查重时生效")
+
+    def on_select_templates(self):
+        """选择模板（起始代码）文件"""
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "选择模板/起始代码文件", "", "Python 文件 (*.py)")
+        if file_paths:
+            self.controller.set_template_files(file_paths)
+            self.right_panel.set_template_count(len(file_paths))
+            self.right_panel.log_label.setText(f"状态：已设置 {len(file_paths)} 个模板文件，下次查重时生效")
+
+    def on_frequency_filter_toggled(self, enabled: bool):
+        """开启/关闭按出现频率识别样板代码"""
+        self.controller.set_frequency_filter(enabled)
+        state = "开启" if enabled else "关闭"
+        self.right_panel.log_label.setText(f"状态：已{state}按出现频率识别样板代码，下次查重时生效")
+
+    def on_clear_templates(self):
+        """清除模板文件"""
+        self.controller.set_template_files([])
+        self.right_panel.set_template_count(0)
+        self.right_panel.log_label.setText("状态：已清除模板文件，下次查重时生效")
+
+    def on_watch_toggled(self, checked: bool):
+        """开始或停止监视目录"""
+        if not checked:
+            self.controller.stop_watch()
+            self.right_panel.watch_btn.setText("监视目录")
+            self.right_panel.log_label.setText("状态：已停止监视")
+            return
+
+        directory = QFileDialog.getExistingDirectory(self, "选择要监视的提交目录")
+        if not directory:
+            self.right_panel.watch_btn.setChecked(False)
+            return
+        self.controller.start_watch(directory)
+        self.right_panel.watch_btn.setText("停止监视")
+        self.right_panel.log_label.setText(f"状态：正在监视 {Path(directory).name}")
+        self.center_panel.update_view(self.active_metrics)
+
+    def on_watch_pairs_found(self, pairs: list):
+        """监视模式完成一次增量分析"""
+        self._update_file_list_ui()
+        self.center_panel.update_view(self.active_metrics)
+        if pairs:
+            self.right_panel.log_label.setText(f"状态：监视中，发现 {len(pairs)} 对新的高可疑度代码对")
+        else:
+            self.right_panel.log_label.setText("状态：监视中，新文件已分析，未发现高可疑度代码对")
+
     def open_directory(self):
         directory = QFileDialog.getExistingDirectory(self, "选择代码目录")
         if directory:
-            self.right_panel.log_label.setText(f"状态：已从目录 {Path(directory).name} 添加文件")
-            self.controller.import_directory(directory)
-            self._update_file_list_ui()
+            self.right_panel.log_label.setText(f"状态：正在从目录 {Path(directory).name} 导入...")
+            self._start_import(f"状态：已从目录 {Path(directory).name} 添加文件",
+                               lambda: self.controller.import_directory(directory))
 
     def open_files(self):
         """打开文件对话框以选择一个或多个文件"""
@@ -118,9 +251,9 @@ class MainWindow(QMainWindow):
             "Python 文件 (*.py)"
         )
         if file_paths:
-            self.right_panel.log_label.setText(f"状态：已添加 {len(file_paths)} 个文件")
-            self.controller.import_files(file_paths)
-            self._update_file_list_ui()
+            self.right_panel.log_label.setText(f"状态：正在导入 {len(file_paths)} 个文件...")
+            self._start_import(f"状态：已添加 {len(file_paths)} 个文件",
+                               lambda: self.controller.import_files(file_paths))
 
     def _update_file_list_ui(self):
         """刷新文件列表UI"""
@@ -147,32 +280,89 @@ class MainWindow(QMainWindow):
         self.controller.show_detail(comparison)
 
     def on_history_session_selected(self, session_id):
-        """历史会话被选中"""
+        """历史会话被选中；未完成的会话询问是否从检查点继续分析"""
+        if self.controller.is_session_in_progress(session_id):
+            reply = QMessageBox.question(self, "继续分析", "该会话的分析尚未完成，是否从上次的进度继续？",
+                                         QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+            self.right_panel.log_label.setText("状态：正在继续分析...")
+            with self._busy():
+                resumed = self.controller.resume_session(session_id)
+            if resumed:
+                self.right_panel.log_label.setText("状态：分析完成")
+                self.center_panel.set_data(self.controller.current_session.results,
+                                     self.controller.current_session.get_statistics())
+                self.center_panel.update_view(self.active_metrics)
+            else:
+                self.right_panel.log_label.setText("状态：会话涉及的文件已不存在，无法继续")
+            return
+
         session = self.controller.load_session(session_id)
         if session:
             self.right_panel.log_label.setText(f"状态：加载历史会话 {session.session_id[:8]}...")
-            self.center_panel.set_data(session.results)
+            self.center_panel.set_data(session.results, session.get_statistics())
             self.center_panel.update_view(self.active_metrics)
 
     def on_plagiarism_marked(self, file_a, file_b, is_plagiarism, notes):
         """抄袭标记事件"""
         self.controller.mark_plagiarism(file_a, file_b, is_plagiarism, notes)
-        self.right_panel.plagiarism_view.refresh_plagiarism_sessions()
-        self.left_panel.history_view.refresh_sessions()
 
     def on_clear_markings(self):
         """处理清除所有标记的请求。"""
         self.controller.clear_all_markings()
         # 刷新视图以显示变化
         self.center_panel.update_view(self.active_metrics)
-        self.right_panel.plagiarism_view.refresh_plagiarism_sessions()
-        self.left_panel.history_view.refresh_sessions()
         self.right_panel.log_label.setText("状态：已清除当前会话的所有标记。")
 
     def on_auto_marking_toggled(self, is_enabled: bool):
         """响应CenterPanel中的复选框状态改变"""
         self.controller.set_auto_marking_enabled(is_enabled)
 
+    def on_threshold_changed(self, threshold: float):
+        """拖动阈值滑块时，通过分数索引和预先计算的小组数量实时更新统计。"""
+        pair_count = self.controller.count_pairs_above(threshold)
+        cluster_count = self.controller.count_clusters_above(threshold)
+        self.center_panel.set_threshold_summary(threshold, pair_count, cluster_count)
+
+    def on_threshold_committed(self, threshold: float):
+        """阈值确定后重新应用自动标记，关系图也将使用新阈值。"""
+        changed = self.controller.set_auto_mark_threshold(threshold)
+        self.on_threshold_changed(threshold)
+        if changed:
+            self.center_panel.update_view(self.active_metrics)
+        self.right_panel.log_label.setText(f"状态：可疑度阈值已设为 {threshold:.0%}，{changed} 条标记发生变化")
+
+    def on_weights_changed(self, weights: dict):
+        """权重修改后在当前结果上重新计算综合可疑度、重新排序并重新应用自动标记。"""
+        if sum(weights.values()) <= 0:
+            self.right_panel.log_label.setText("状态：权重之和必须大于 0")
+            return
+        changed = self.controller.set_weights(weights)
+        self.right_panel.set_weights(self.controller.analyzer.weights)
+        if self.controller.current_session:
+            self.center_panel.set_data(self.controller.current_session.results,
+                                     self.controller.current_session.get_statistics())
+            self.center_panel.update_view(self.active_metrics)
+            self.on_threshold_changed(self.controller.auto_mark_threshold)
+        self.right_panel.log_label.setText(f"状态：权重已更新，综合可疑度已重新计算，{changed} 条标记发生变化")
+
+    def on_structure_clones_requested(self, comparison):
+        """列出代码对共享的相同结构（忽略命名与常量取值的相同子树）。"""
+        clones = self.controller.get_structural_clones(comparison)
+        if not clones:
+            QMessageBox.information(self, "相同结构", "两份代码之间没有共享的非平凡结构。")
+            return
+        lines = [f"第{a.first_line}-{a.last_line}行  <->  第{b.first_line}-{b.last_line}行  "
+                 f"({a.size} 个节点，本次会话中 {count} 个文件含此结构)"
+                 for a, b, count in clones[:30]]
+        if len(clones) > 30:
+            lines.append(f"…… 共 {len(clones)} 处")
+        QMessageBox.information(
+            self, "相同结构",
+            f"{Path(comparison.file_a).name}  <->  {Path(comparison.file_b).name}\n\n" + "\n".join(lines)
+        )
+
     def on_metric_toggled(self, metric_name, state):
         """处理指标复选框状态改变"""
         if state:
@@ -193,6 +383,19 @@ class MainWindow(QMainWindow):
         self.controller.view_plagiarism_graph()
         self.right_panel.log_label.setText("状态：就绪")
 
+    def on_view_distribution(self):
+        """显示当前会话综合可疑度的分数分布。"""
+        if not self.controller.view_score_distribution():
+            self.right_panel.log_label.setText("状态：当前没有可用的分数统计")
+
+    def on_distribution_threshold(self, kind: str, value: float):
+        """按当前会话的分数分布（z 分数或排名比例）设置可疑度阈值。"""
+        threshold = self.controller.threshold_from_distribution(kind, value)
+        if threshold is None:
+            self.right_panel.log_label.setText("状态：当前没有可用的分数统计")
+            return
+        self.center_panel.set_threshold(threshold)
+
     def on_export_graph(self):
         """处理导出关系图的请求。"""
         file_path, _ = QFileDialog.getSaveFileName(
@@ -208,4 +411,17 @@ class MainWindow(QMainWindow):
                 self.right_panel.log_label.setText("状态：关系图导出成功")
             else:
                 QMessageBox.warning(self, "失败", "关系图导出失败，请查看终端输出。")
-                self.right_panel.log_label.setText("状态：关系图导出失败")
\ No newline at end of file
+                self.right_panel.log_label.setText("状态：关系图导出失败")
+
+    def on_export_graph_lod(self):
+        """处理分层导出关系图的请求。"""
+        dir_path = QFileDialog.getExistingDirectory(self, "选择关系图导出目录")
+        if dir_path:
+            self.right_panel.log_label.setText("状态：正在分层导出关系图...")
+            success = self.controller.export_plagiarism_graph_lod(dir_path)
+            if success:
+                QMessageBox.information(self, "成功", f"关系图已分层导出到:\n{dir_path}")
+                self.right_panel.log_label.setText("状态：关系图导出成功")
+            else:
+                QMessageBox.warning(self, "失败", "关系图导出失败，请查看终端输出。")
+                self.right_panel.log_label.setText("状态：关系图导出失败")
@@ -3,7 +3,7 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QTableWidget, 
                              QTableWidgetItem, QHeaderView, QMenu, 
                              QAction, QMessageBox, QCheckBox, 
-                             QHBoxLayout, QPushButton)
+                             QHBoxLayout, QPushButton, QSlider, QLabel, QComboBox)
 from PyQt5.QtCore import pyqtSignal, Qt
 from pathlib import Path
 from view.history_view import PlagiarismMarkDialog
@@ -15,12 +15,27 @@ class CenterPanel(QWidget):
     clear_markings_requested = pyqtSignal()
     view_graph_requested = pyqtSignal()
     export_graph_requested = pyqtSignal()
+    export_graph_lod_requested = pyqtSignal()
+    threshold_changed = pyqtSignal(float)    # 拖动过程中实时发出，用于预览
+    threshold_committed = pyqtSignal(float)  # 松开滑块后发出，用于重新应用标记
+    structure_clones_requested = pyqtSignal(object)
+    view_distribution_requested = pyqtSignal()
+    distribution_threshold_requested = pyqtSignal(str, float)  # ("z", 标准差倍数) 或 ("top", 比例)
+    prefetch_requested = pyqtSignal(list)  # 接下来可能打开的代码对，供详细视图后台预取
+
+    # 排序后表格的前若干行、以及双击行之后的若干行会被预取
+    PREFETCH_ROWS = 10
+
+    # 按分数分布设阈值的选项：(显示文本, 类型, 参数)
+    DISTRIBUTION_THRESHOLDS = [("均值+2σ", "z", 2.0), ("均值+3σ", "z", 3.0),
+                               ("前5%", "top", 0.05), ("前1%", "top", 0.01)]
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self._full_results = []
         self._current_results = []
         self._active_metrics = []
+        self._statistics = None
         self._setup_ui()
 
     def _setup_ui(self):
@@ -41,8 +56,33 @@ class CenterPanel(QWidget):
         self.auto_mark_checkbox.stateChanged.connect(lambda state: self.auto_marking_toggled.emit(bool(state)))
         layout.addWidget(self.auto_mark_checkbox)
 
+        # 阈值滑块：拖动时实时显示超过阈值的代码对数量和小组数量
+        threshold_layout = QHBoxLayout()
+        threshold_layout.addWidget(QLabel("可疑度阈值"))
+        self.threshold_slider = QSlider(Qt.Horizontal)
+        self.threshold_slider.setRange(50, 100)
+        self.threshold_slider.setValue(80)
+        self.threshold_slider.valueChanged.connect(self._on_threshold_value_changed)
+        self.threshold_slider.sliderReleased.connect(
+            lambda: self.threshold_committed.emit(self.threshold_slider.value() / 100)
+        )
+        threshold_layout.addWidget(self.threshold_slider, 1)
+        self.threshold_label = QLabel("80%")
+        threshold_layout.addWidget(self.threshold_label)
+        self.distribution_combo = QComboBox()
+        self.distribution_combo.addItem("按分布设阈值")
+        for text, _, _ in self.DISTRIBUTION_THRESHOLDS:
+            self.distribution_combo.addItem(text)
+        self.distribution_combo.activated.connect(self._on_distribution_threshold)
+        threshold_layout.addWidget(self.distribution_combo)
+        layout.addLayout(threshold_layout)
+
         bottom_layout.addStretch()
 
+        self.view_distribution_btn = QPushButton("查看分数分布")
+        self.view_distribution_btn.clicked.connect(self.view_distribution_requested)
+        bottom_layout.addWidget(self.view_distribution_btn)
+
         self.view_graph_btn = QPushButton("查看抄袭关系图")
         self.view_graph_btn.clicked.connect(self.view_graph_requested)
         bottom_layout.addWidget(self.view_graph_btn)
@@ -51,14 +91,46 @@ class CenterPanel(QWidget):
         self.export_graph_btn.clicked.connect(self.export_graph_requested)
         bottom_layout.addWidget(self.export_graph_btn)
 
+        self.export_graph_lod_btn = QPushButton("分层导出关系图")
+        self.export_graph_lod_btn.clicked.connect(self.export_graph_lod_requested)
+        bottom_layout.addWidget(self.export_graph_lod_btn)
+
         self.clear_marks_btn = QPushButton("清除所有标记")
         self.clear_marks_btn.clicked.connect(self.clear_markings_requested) # 连接到面板信号
         bottom_layout.addWidget(self.clear_marks_btn)
         
         layout.addLayout(bottom_layout)
     
-    def set_data(self, results):
+    def _on_threshold_value_changed(self, value: int):
+        self.threshold_label.setText(f"{value}%")
+        self.threshold_changed.emit(value / 100)
+        # 键盘或点击滑槽调整时没有“松开”事件，直接提交
+        if not self.threshold_slider.isSliderDown():
+            self.threshold_committed.emit(value / 100)
+
+    def _on_distribution_threshold(self, index: int):
+        if index > 0:
+            _, kind, value = self.DISTRIBUTION_THRESHOLDS[index - 1]
+            self.distribution_threshold_requested.emit(kind, value)
+        self.distribution_combo.setCurrentIndex(0)
+
+    def set_threshold(self, threshold: float):
+        """把滑块移到给定阈值（限制在滑块范围内），并按键盘调整的方式提交。"""
+        value = min(max(round(threshold * 100), self.threshold_slider.minimum()), self.threshold_slider.maximum())
+        if value == self.threshold_slider.value():
+            self.threshold_committed.emit(value / 100)
+        else:
+            self.threshold_slider.setValue(value)
+
+    def set_threshold_summary(self, threshold: float, pair_count: int, cluster_count: int):
+        """显示当前阈值下的统计信息。"""
+        self.threshold_label.setText(f"{threshold:.0%} · {pair_count} 对 · {cluster_count} 个小组")
+
+    def set_data(self, results, statistics=None):
         self._full_results = results
+        self._statistics = statistics
+        # 没有综合可疑度的完整分布时（例如大规模语料调整权重后）不能按分布设阈值
+        self.distribution_combo.setEnabled(bool(statistics and statistics.get("综合可疑度")))
         self._current_results = [] # 重置当前结果以便重新排序
 
     def update_view(self, active_metrics: list):
@@ -87,7 +159,12 @@ class CenterPanel(QWidget):
             for col_idx, metric_name in enumerate(active_metrics):
                 score = item.scores.get(metric_name, 0)
                 score_text = f"{score * 100:.2f}%"
-                self.table.setItem(row, 2 + col_idx, QTableWidgetItem(score_text))
+                score_item = QTableWidgetItem(score_text)
+                stats = self._statistics.get(metric_name) if self._statistics else None
+                if stats and stats.count:
+                    score_item.setToolTip(f"z = {stats.z_score(score):.2f}，"
+                                          f"高于本次会话 {stats.percentile_rank(score):.1%} 的代码对")
+                self.table.setItem(row, 2 + col_idx, score_item)
             
             status_col_idx = 2 + len(active_metrics)
             plagiarism_status = "已标记" if item.is_plagiarism else "未标记"
@@ -97,9 +174,12 @@ class CenterPanel(QWidget):
                 status_item.setForeground(Qt.white)
             self.table.setItem(row, status_col_idx, status_item)
 
+        self.prefetch_requested.emit(self._current_results[:self.PREFETCH_ROWS])
+
     def _on_double_click(self, row, column):
         if 0 <= row < len(self._current_results):
             self.item_clicked.emit(self._current_results[row])
+            self.prefetch_requested.emit(self._current_results[row + 1:row + 1 + self.PREFETCH_ROWS])
 
     def _show_context_menu(self, position):
         row = self.table.rowAt(position.y())
@@ -124,6 +204,15 @@ class CenterPanel(QWidget):
             show_notes_action.triggered.connect(lambda: self._show_notes(result))
             menu.addAction(show_notes_action)
         
+        if result.unit_matches:
+            show_units_action = QAction("查看匹配函数", self)
+            show_units_action.triggered.connect(lambda: self._show_unit_matches(result))
+            menu.addAction(show_units_action)
+
+        show_clones_action = QAction("查看相同结构", self)
+        show_clones_action.triggered.connect(lambda: self.structure_clones_requested.emit(result))
+        menu.addAction(show_clones_action)
+        
         menu.exec_(self.table.mapToGlobal(position))
 
     def _unmark_plagiarism(self, result):
@@ -149,3 +238,9 @@ class CenterPanel(QWidget):
 
     def _show_notes(self, result):
         QMessageBox.information(self, "备注信息", f"备注: {result.plagiarism_notes}")
+
+    def _show_unit_matches(self, result):
+        lines = [f"{m['a']} (第{m['lines_a'][0]}-{m['lines_a'][1]}行)  <->  "
+                 f"{m['b']} (第{m['lines_b'][0]}-{m['lines_b'][1]}行)  {m['similarity']:.0%}"
+                 for m in result.unit_matches]
+        QMessageBox.information(self, "匹配函数", "\n".join(lines))
@@ -1,7 +1,7 @@
 # view/panels/left_panel.py
 
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QPushButton, 
-                             QLabel, QListWidget, QListWidgetItem)
+                             QLabel, QListWidget, QListWidgetItem, QProgressBar)
 from PyQt5.QtCore import Qt, pyqtSignal
 from pathlib import Path
 
@@ -45,6 +45,10 @@ class LeftPanel(QWidget):
         
         file_list_label = QLabel("导入的文件列表")
         self.file_list_widget = QListWidget()
+
+        # 导入与分块分析共用的进度条，仅在执行过程中显示
+        self.import_progress_bar = QProgressBar()
+        self.import_progress_bar.hide()
         
         self.reset_btn = QPushButton("重置所有导入")
         self.reset_btn.clicked.connect(self.reset_files_clicked) # 连接到面板信号
@@ -55,10 +59,33 @@ class LeftPanel(QWidget):
         
         layout.addWidget(file_list_label)
         layout.addWidget(self.file_list_widget, 1)
+        layout.addWidget(self.import_progress_bar)
         layout.addWidget(self.reset_btn)
         layout.addWidget(history_label)
         layout.addWidget(self.history_view, 1)
     
+    def set_import_progress(self, stage: str, done: int, total: int):
+        """
+        增量更新后台导入的进度（经排队连接在GUI线程中调用），导入完成后自动隐藏进度条。
+        扫描阶段以目录计，总数随遍历增长；读取阶段以文件计。
+        """
+        self._set_progress("正在扫描目录 %v/%m" if stage == "scan" else "正在导入 %v/%m", done, total)
+
+    def set_analysis_progress(self, done: int, total: int):
+        """增量更新分块分析的进度（以块计），分析完成后自动隐藏进度条。"""
+        self._set_progress("正在分析 %v/%m 块", done, total)
+        # 分析在GUI线程上同步执行，事件循环此时不会处理绘制事件，直接重绘进度条
+        self.import_progress_bar.repaint()
+
+    def _set_progress(self, bar_format: str, done: int, total: int):
+        if total <= 0 or done >= total:
+            self.import_progress_bar.hide()
+            return
+        self.import_progress_bar.setFormat(bar_format)
+        self.import_progress_bar.setMaximum(total)
+        self.import_progress_bar.setValue(done)
+        self.import_progress_bar.show()
+
     def update_file_list(self, files: list):
         """使用自定义Widget刷新文件列表，并连接信号。"""
         self.file_list_widget.clear()
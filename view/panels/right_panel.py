@@ -1,7 +1,8 @@
 # view/panels/right_panel.py
 
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QPushButton, 
-                             QLabel, QGroupBox, QCheckBox, QTabWidget)
+                             QLabel, QGroupBox, QCheckBox, QTabWidget,
+                             QGridLayout, QDoubleSpinBox, QMenu)
 from PyQt5.QtCore import pyqtSignal
 
 from view.detail_view import DetailView
@@ -13,7 +14,13 @@ class RightPanel(QWidget):
     import_directory_clicked = pyqtSignal()
     import_files_clicked = pyqtSignal()
     analyze_clicked = pyqtSignal()
+    watch_toggled = pyqtSignal(bool)
+    function_mode_toggled = pyqtSignal(bool)
+    template_select_clicked = pyqtSignal()
+    template_clear_clicked = pyqtSignal()
+    frequency_filter_toggled = pyqtSignal(bool)
     metric_toggled = pyqtSignal(str, bool) # name, state
+    weights_changed = pyqtSignal(dict)     # {指标名: 权重}
 
     def __init__(self, controller, all_metrics, metric_descriptions, parent=None):
         super().__init__(parent)
@@ -21,6 +28,7 @@ class RightPanel(QWidget):
         self.all_metrics = all_metrics
         self.metric_descriptions = metric_descriptions
         self.metric_checkboxes = {}
+        self.weight_spinboxes = {}
         self._setup_ui()
 
     def _setup_ui(self):
@@ -37,11 +45,33 @@ class RightPanel(QWidget):
         self.analyze_btn.clicked.connect(self.analyze_clicked)
         top_buttons_layout.addWidget(self.import_dir_btn)
         top_buttons_layout.addWidget(self.import_files_btn)
+        self.watch_btn = QPushButton("监视目录")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.toggled.connect(self.watch_toggled)
         top_buttons_layout.addWidget(self.analyze_btn)
+        top_buttons_layout.addWidget(self.watch_btn)
+        self.function_mode_checkbox = QCheckBox("函数级比较")
+        self.function_mode_checkbox.setToolTip("按函数/方法切分代码并检索相似函数，只列出存在匹配函数的代码对")
+        self.function_mode_checkbox.toggled.connect(self.function_mode_toggled)
+        top_buttons_layout.addWidget(self.function_mode_checkbox)
+        self.template_btn = QPushButton("模板代码")
+        self.template_btn.setToolTip("学生共用的起始代码不计入相似度")
+        template_menu = QMenu(self.template_btn)
+        template_menu.addAction("选择模板文件...", self.template_select_clicked.emit)
+        template_menu.addAction("清除模板", self.template_clear_clicked.emit)
+        template_menu.addSeparator()
+        # 默认关闭：多数学生互相抄袭时，抄袭的代码同样会出现在大多数文件中
+        self.frequency_filter_action = template_menu.addAction("忽略出现在大多数文件中的代码")
+        self.frequency_filter_action.setCheckable(True)
+        self.frequency_filter_action.toggled.connect(self.frequency_filter_toggled)
+        self.template_btn.setMenu(template_menu)
+        top_buttons_layout.addWidget(self.template_btn)
         layout.addLayout(top_buttons_layout)
         
         # 指标选择器
         self._create_metrics_selector(layout)
+        # 权重编辑器
+        self._create_weights_editor(layout)
         
         # 详情标签页
         detail_tabs = QTabWidget()
@@ -55,6 +85,10 @@ class RightPanel(QWidget):
         self.log_label = QLabel("状态：就绪")
         layout.addWidget(self.log_label)
 
+    def set_template_count(self, count: int):
+        """在按钮上显示已设置的模板文件数。"""
+        self.template_btn.setText(f"模板代码 ({count})" if count else "模板代码")
+
     def _create_metrics_selector(self, parent_layout):
         group_box = QGroupBox("指标显示/排序控制")
         layout = QHBoxLayout()
@@ -74,3 +108,49 @@ class RightPanel(QWidget):
         
         group_box.setLayout(layout)
         parent_layout.addWidget(group_box)
+
+    def _create_weights_editor(self, parent_layout):
+        group_box = QGroupBox("综合可疑度权重")
+        layout = QVBoxLayout()
+        grid = QGridLayout()
+
+        weights = self.controller.analyzer.weights
+        for idx, metric_name in enumerate(weights):
+            spinbox = QDoubleSpinBox()
+            spinbox.setRange(0.0, 1.0)
+            spinbox.setSingleStep(0.05)
+            spinbox.setDecimals(2)
+            spinbox.setValue(weights[metric_name])
+            label = QLabel(metric_name)
+            label.setToolTip(self.metric_descriptions.get(metric_name, "暂无简介"))
+            row, col = divmod(idx, 3)
+            grid.addWidget(label, row, col * 2)
+            grid.addWidget(spinbox, row, col * 2 + 1)
+            self.weight_spinboxes[metric_name] = spinbox
+        layout.addLayout(grid)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(QLabel("权重会自动归一化，应用后直接重新计算当前结果，无需重新查重"))
+        buttons_layout.addStretch()
+        reset_btn = QPushButton("恢复默认")
+        reset_btn.clicked.connect(self._reset_weights)
+        apply_btn = QPushButton("应用权重")
+        apply_btn.clicked.connect(
+            lambda: self.weights_changed.emit({name: box.value() for name, box in self.weight_spinboxes.items()})
+        )
+        buttons_layout.addWidget(reset_btn)
+        buttons_layout.addWidget(apply_btn)
+        layout.addLayout(buttons_layout)
+
+        group_box.setLayout(layout)
+        parent_layout.addWidget(group_box)
+
+    def set_weights(self, weights: dict):
+        """把权重（通常是归一化后的结果）显示到编辑器中。"""
+        for name, value in weights.items():
+            if name in self.weight_spinboxes:
+                self.weight_spinboxes[name].setValue(value)
+
+    def _reset_weights(self):
+        self.set_weights(self.controller.analyzer.DEFAULT_WEIGHTS)
+        self.weights_changed.emit(dict(self.controller.analyzer.DEFAULT_WEIGHTS))